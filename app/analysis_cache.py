@@ -0,0 +1,67 @@
+"""
+CACHE VERSIONADO DE RESULTADOS DE ANÁLISE
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from app.metrics import METRICS
+
+
+class AnalysisCache:
+    """
+    Último resultado de cada parte da análise ('spectra', 'analysis',
+    'state'), guardado junto com a chave de versão que o produziu.
+
+    A chave combina a versão do buffer com as gerações de configuração das
+    quais a parte depende; enquanto ela não muda, todos os consumidores
+    (gravador, emissão, /api/status, zoom) recebem o mesmo objeto. Uma
+    entrada por parte basta: versões antigas nunca são pedidas de novo.
+    O acesso é feito sob o lock do dono (DevicePipeline.lock).
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[Hashable, Any]] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def peek(self, part: str, key: Hashable) -> Optional[Any]:
+        """Resultado em cache para a chave, sem calcular (None se ausente/velho)"""
+        entry = self.entries.get(part)
+        if entry is not None and entry[0] == key:
+            self.hits[part] = self.hits.get(part, 0) + 1
+            METRICS.inc('analysis_cache', part=part, result='hit')
+            return entry[1]
+        return None
+
+    def put(self, part: str, key: Hashable, value: Any):
+        self.misses[part] = self.misses.get(part, 0) + 1
+        METRICS.inc('analysis_cache', part=part, result='miss')
+        self.entries[part] = (key, value)
+
+    def get(self, part: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Resultado da chave, calculado uma única vez por `compute`"""
+        value = self.peek(part, key)
+        if value is None:
+            value = compute()
+            self.put(part, key, value)
+        return value
+
+    def latest(self, part: str) -> Optional[Any]:
+        """Último resultado calculado, qualquer que seja a versão"""
+        entry = self.entries.get(part)
+        return entry[1] if entry is not None else None
+
+    def invalidate(self, part: str = None):
+        if part is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(part, None)
+
+    def get_stats(self) -> Dict:
+        parts = sorted(set(self.hits) | set(self.misses))
+        return {
+            part: {'hits': self.hits.get(part, 0), 'misses': self.misses.get(part, 0)}
+            for part in parts
+        }
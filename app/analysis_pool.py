@@ -0,0 +1,142 @@
+"""
+ANÁLISE ESPECTRAL EM PROCESSOS SEPARADOS (BUFFER EM MEMÓRIA COMPARTILHADA)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import logging
+import threading
+import multiprocessing
+from dataclasses import asdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from app.ring_buffer import SharedSampleRingBuffer
+from app.data_processor import DataProcessor, SystemConfig
+from app.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Estado de cada processo de análise: chave do dispositivo → (buffer anexado, processador)
+_WORKER_STATE: Dict[str, Tuple[SharedSampleRingBuffer, DataProcessor]] = {}
+
+# Campos que exigem recriar o processador do worker (motor espectral, janelas)
+_STRUCTURAL_FIELDS = ('sample_rate', 'fft_size', 'buffer_size', 'window', 'stats_windows')
+
+
+def analyze_shared(key: str, name: str, capacity: int, config: Dict,
+                   gap_position: Optional[int] = None) -> Dict:
+    """
+    Executa no processo de análise: anexa ao buffer compartilhado (uma vez),
+    copia um snapshot consistente e calcula DataProcessor.analyze_spectra().
+    O processador do worker é mantido entre chamadas, então as médias
+    Welch/exponencial continuam acumulando como no modo em thread;
+    `gap_position` (última lacuna de ingestão) reinicia a média como lá.
+    """
+    entry = _WORKER_STATE.get(key)
+    if entry is not None:
+        shared, processor = entry
+        current = processor.config
+        if shared.name != name or any(getattr(current, field) != config[field]
+                                      for field in _STRUCTURAL_FIELDS):
+            shared.close()
+            entry = None
+    if entry is None:
+        shared = SharedSampleRingBuffer(capacity, name=name, create=False)
+        processor = DataProcessor(SystemConfig(**config))
+        _WORKER_STATE[key] = (shared, processor)
+    else:
+        processor.update_config(**config)
+
+    if gap_position != processor.last_gap_position:
+        if gap_position is None:
+            processor.last_gap_position = None  # Buffer limpo no servidor
+        else:
+            processor.mark_gap(position=gap_position)
+
+    processor.data_buffer = shared.snapshot(out=processor.data_buffer)
+    processor.version += 1  # Snapshot novo: não reaproveitar a análise em cache
+    return processor.analyze_spectra()
+
+
+def release_shared(key: str):
+    """Desanexa o buffer de um dispositivo removido"""
+    entry = _WORKER_STATE.pop(key, None)
+    if entry is not None:
+        entry[0].close()
+
+
+class ProcessAnalysisPool:
+    """
+    Processos de análise para o modo ANALYSIS_CONFIG['mode'] = 'process'.
+
+    Cada dispositivo fica fixo em um processo (afinidade), que guarda o
+    estado espectral entre chamadas; dispositivos são distribuídos entre os
+    processos pelo menor número de atribuições. O buffer de amostras não
+    passa pelo pipe: só o nome do bloco compartilhado vai e só o resultado
+    (espectros do eixo principal, picos e harmônicos) volta. FFT e
+    harmônicos deixam de competir pelo GIL com HTTP, Socket.IO e a leitura
+    serial.
+    """
+
+    def __init__(self, processes: int = 2, start_method: str = 'spawn', timeout: float = 5.0):
+        self.context = multiprocessing.get_context(start_method)
+        self.timeout = timeout
+        self.workers: List[ProcessPoolExecutor] = [self._new_worker()
+                                                   for _ in range(max(1, processes))]
+        self.assignments: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def _new_worker(self) -> ProcessPoolExecutor:
+        worker = ProcessPoolExecutor(max_workers=1, mp_context=self.context)
+        worker.submit(int)  # Inicia o processo já (o spawn leva ~1 s importando NumPy/SciPy)
+        return worker
+
+    def _worker_index(self, key: str) -> int:
+        with self.lock:
+            index = self.assignments.get(key)
+            if index is None:
+                loads = [0] * len(self.workers)
+                for assigned in self.assignments.values():
+                    loads[assigned] += 1
+                index = loads.index(min(loads))
+                self.assignments[key] = index
+            return index
+
+    def analyze(self, key: str, buffer: SharedSampleRingBuffer, config: SystemConfig,
+                gap_position: Optional[int] = None) -> Dict:
+        """Análise espectral do buffer no processo do dispositivo (bloqueia até o resultado)"""
+        index = self._worker_index(key)
+        try:
+            with METRICS.time('analysis_process'):
+                future = self.workers[index].submit(analyze_shared, key, buffer.name,
+                                                    buffer.capacity, asdict(config),
+                                                    gap_position)
+                return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # Processo morreu (p. ex. falta de memória): recriar para as próximas chamadas
+            logger.error(f"Processo de análise {index} encerrado; reiniciando")
+            with self.lock:
+                self.workers[index] = self._new_worker()
+            raise
+
+    def release(self, key: str):
+        with self.lock:
+            index = self.assignments.pop(key, None)
+        if index is not None:
+            try:
+                self.workers[index].submit(release_shared, key)
+            except RuntimeError:
+                pass  # Pool já encerrado
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            return {
+                'processes': len(self.workers),
+                'assignments': dict(self.assignments)
+            }
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.shutdown(wait=False)
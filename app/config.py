@@ -13,9 +13,10 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 TESTS_DIR = os.path.join(DATA_DIR, 'tests')
 CALIBRATIONS_DIR = os.path.join(DATA_DIR, 'calibrations')
+TRENDS_DIR = os.path.join(DATA_DIR, 'trends')
 
 # Criar diretórios se não existirem
-for directory in [DATA_DIR, TESTS_DIR, CALIBRATIONS_DIR]:
+for directory in [DATA_DIR, TESTS_DIR, CALIBRATIONS_DIR, TRENDS_DIR]:
     os.makedirs(directory, exist_ok=True)
 
 # Configurações do Sistema
@@ -24,6 +25,8 @@ FFT_SIZE = 2048             # AUMENTADO para 2048 pontos (era 256)
 BUFFER_SIZE = 4096          # Aumentado para suportar FFT maior (era 1000)
 SERIAL_BAUD = 921600        # Baud rate serial
 SERIAL_TIMEOUT = 1          # Timeout em segundos
+SERIAL_DATA_FORMAT = 'csv'  # 'csv' ou 'binary' (negociado com o ESP32; fallback em CSV)
+SERIAL_BULK_INGEST = True   # Leitura em blocos e parse CSV em lote (False = linha a linha)
 
 # Fatores de conversão Hz para RPM (dados reais do motor)
 RPM_FACTORS = {
@@ -41,6 +44,8 @@ DEFAULT_CONFIG = {
     'noise_threshold': 50,      # mm/s²
     'fft_range': 100,           # Hz (aumentado para mostrar mais frequências, era 50)
     'main_axis': 'x',           # Eixo principal
+    'spectral_mode': 'instant', # 'instant', 'welch' ou 'exponential' (STFT incremental)
+    'fft_overlap': 0.75,        # Sobreposição entre segmentos nos modos com média
     'buffer_warning': 70,       # % de warning do buffer
     'auto_backup': True         # Backup automático
 }
@@ -57,10 +62,119 @@ COLORS = {
     'sensor2': '#e94560'
 }
 
+# Fontes de dados para testes sem hardware (/api/connect com 'source')
+DATA_SOURCES = ('serial', 'replay', 'synthetic', 'emulator')
+SIMULATION_CONFIG = {
+    'speed': 1.0,               # Múltiplo do tempo real (0 = o mais rápido possível)
+    'signal': {                 # Padrões do gerador sintético (ver SignalConfig)
+        'tones': [[29.3, 100.0]],
+        'harmonics': 3,
+        'noise': 5.0,
+        'imbalance': 1.2,
+        'dropout_rate': 0.0
+    }
+}
+
+# Fila entre o leitor e o processamento (limitada em amostras, ver IngestQueue)
+INGEST_CONFIG = {
+    'max_samples': BUFFER_SIZE,     # Atraso maior que o buffer de análise seria sobrescrito de qualquer forma
+    'policy': 'drop_oldest',        # 'drop_oldest', 'drop_newest' ou 'decimate'
+    'decimate_factor': 2,           # Modo 'decimate': 1 a cada N amostras durante a sobrecarga
+    'high_watermark': 0.75,         # Fração da fila que inicia a sobrecarga
+    'low_watermark': 0.25           # Fração que encerra a sobrecarga
+}
+
+# Temporização pelos timestamps do ESP32 (campos do SystemConfig, ver app/timing.py)
+TIMING_CONFIG = {
+    'resample': True,           # Reamostrar cada bloco na grade uniforme de 1/SAMPLE_RATE
+    'max_fill_ms': 25.0,        # Lacunas até este tamanho são interpoladas; maiores marcam descontinuidade
+    'gap_factor': 1.5           # Intervalo maior que 1,5× o medido conta como amostra perdida
+}
+
+# Banda de alta resolução em torno da rotação (campos do SystemConfig, ver BandZoomAnalyzer)
+BAND_ZOOM_CONFIG = {
+    'zoom_band': True,          # Zoom FFT (demodulação + decimação) junto do espectro normal
+    'zoom_center': 0.0,         # Centro da banda (Hz); 0 = frequência do motor configurada
+    'zoom_span': 10.0,          # Largura (Hz): motor_frequency ± 5 Hz
+    'zoom_size': 2048           # FFT complexa: 200 Hz / 16 → 0,0061 Hz/bin (≈ FFT de 32768 pontos)
+}
+
+# Tabela de picos por canal (campos do SystemConfig, ver find_spectral_peaks)
+PEAK_DETECTION_CONFIG = {
+    'peak_count': 5,            # Picos mais altos de cada canal no payload ('peak_table')
+    'peak_prominence': 0.0,     # Proeminência mínima (mm/s²); 0 = threshold de ruído (noise_threshold / 20)
+    'peak_min_width': 1.0,      # Largura mínima a meia proeminência (bins): descarta bins isolados
+    'peak_max_width': 20.0      # Largura máxima (bins, ≈ 2 Hz com FFT de 2048): descarta lombadas largas
+}
+
+# Rastreamento de ordens 1×…N× da rotação (campos do SystemConfig, ver app/orders.py)
+ORDER_TRACKING_CONFIG = {
+    'order_tracking': True,     # Filtros DFT recursivos atualizados a cada bloco (sem FFT)
+    'orders': 6,                # 1× a 6× (ordens acima de Nyquist ficam zeradas)
+    'order_time_constant': 0.5, # s: resolução ≈ 0,3 Hz, estabiliza em ≈ 3 s
+    'order_speed': 'detected',  # 'detected' (pico 1× da análise) ou 'config' (motor_frequency)
+    'order_alarms': ()          # Limite por ordem, ex.: (40.0, 20.0) = 1× > 40 e 2× > 20 (0 = sem alarme)
+}
+
+# Gravação de testes em disco (amostras brutas + métricas)
+RECORDER_CONFIG = {
+    'flush_interval': 1.0,      # s entre flush/fsync dos arquivos da sessão
+    'max_queue_chunks': 512,    # Blocos pendentes de escrita (memória limitada)
+    'csv_chunk_records': 10000  # Registros lidos por vez ao exportar CSV
+}
+
+# Histórico de tendências por dispositivo (data/trends/<id>/, ver app/trends.py)
+TRENDS_CONFIG = {
+    'enabled': True,            # Métricas lidas a 5 Hz (mesmo ritmo do gravador de testes)
+    'retention': {              # s mantidos em cada camada
+        'second': 86400,            # 1 dia
+        'minute': 90 * 86400,       # 90 dias
+        'hour': 5 * 365 * 86400     # 5 anos
+    },
+    'max_points': 1000,         # Pontos por série quando /api/trends não informa a resolução
+    'orders': 3                 # Amplitudes de 1×…3× dos 6 canais em data/trends/<id>/orders_3 (0 = não gravar)
+}
+
+# Espectrograma (waterfall) por dispositivo, em memória (ver app/waterfall.py)
+WATERFALL_CONFIG = {
+    'enabled': True,
+    'hop_seconds': 1.0,         # Uma linha (FFT de FFT_SIZE pontos dos 6 canais) por segundo
+    'history_seconds': 3600,    # Linhas guardadas: 1 h ≈ 3600 × 6 × 1024 bytes ≈ 21 MiB
+    'db_min': -40.0,            # dB (20·log10 da magnitude) do nível 0 da quantização
+    'db_max': 60.0,             # dB do nível 255
+    'tile_rows': 256,           # Linhas por tile (tempo)
+    'tile_bins': 256,           # Bins por tile (frequência)
+    'cache_bytes': 32 * 1024 * 1024  # Limite do cache LRU de tiles prontos
+}
+
+# Métricas de desempenho por etapa (texto Prometheus em /api/metrics)
+METRICS_CONFIG = {
+    'enabled': False,           # Desligado: instrumentação sem custo e endpoint 404
+    'prefix': 'vibration',      # Prefixo dos nomes das séries
+    'rate_window': 5.0          # Janela (s) das taxas amostras/s e emissões/s
+}
+
+# Várias bancadas no mesmo servidor (/api/devices/<id>/...)
+DEVICE_CONFIG = {
+    'default_id': 'default',        # Dispositivo das rotas sem <id> (/api/connect, ...)
+    'default_name': 'Bancada 1',
+    'max_devices': 16,
+    'workers': 4                    # Threads do pool compartilhado (ingestão e análise)
+}
+
+# Onde roda a análise espectral (FFT, picos, harmônicos)
+ANALYSIS_CONFIG = {
+    'mode': 'thread',           # 'thread' (no servidor) ou 'process' (buffer em memória compartilhada)
+    'processes': 2,             # Processos de análise no modo 'process' (bancadas distribuídas entre eles)
+    'timeout': 5.0              # s de espera pelo resultado antes de analisar no próprio servidor
+}
+
 # Configurações WebSocket
 WEBSOCKET_CONFIG = {
     'host': '127.0.0.1',
     'port': 5000,
     'debug': False,
-    'cors_allowed_origins': '*'
+    'cors_allowed_origins': '*',
+    'default_fps': 10,          # Taxa padrão de 'data_update' por cliente (Hz)
+    'max_fps': 30               # Taxa máxima que um cliente pode pedir (Hz)
 }
\ No newline at end of file
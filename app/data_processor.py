@@ -7,11 +7,22 @@ Email: eng.parangaba@gmail.com
 import numpy as np
 from scipy import signal
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Set
 from dataclasses import dataclass
 import json
 import time
 
+from app.ring_buffer import SampleRingBuffer, CHANNELS, channel_index
+from app.spectral import (SpectralEngine, SpectralAverager, BandZoomAnalyzer, zoom_spectrum,
+                          parabolic_peaks, find_spectral_peaks)
+from app.statistics import RollingStatistics
+from app.payload import to_json_payload
+from app.metrics import METRICS
+from app.analysis_cache import AnalysisCache
+from app.timing import TimingEstimator, UniformResampler
+from app.waterfall import Waterfall
+from app.orders import OrderTracker
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -23,21 +34,83 @@ class SystemConfig:
     motor_frequency: int = 20
     noise_threshold: float = 50.0
     fft_range: int = 100  # Aumentado de 50 para 100
+    main_axis: str = 'x'  # Eixo usado no espectro principal e no desbalanceamento
+    window: str = 'hann'  # Janela da FFT
+    stats_windows: Tuple[float, ...] = (0.5, 1.0, 10.0)  # Janelas estatísticas (s)
+    spectral_mode: str = 'instant'  # 'instant', 'welch' ou 'exponential'
+    fft_overlap: float = 0.75       # Sobreposição entre segmentos (modos com média)
+    welch_segments: int = 8         # Segmentos na média de Welch
+    spectral_alpha: float = 0.25    # Peso do segmento novo na média exponencial
+    resample: bool = True           # Reamostrar na grade uniforme pelos timestamps do ESP32
+    max_fill_ms: float = 25.0       # Maior lacuna preenchida por interpolação
+    gap_factor: float = 1.5         # Intervalo (× o esperado) que conta como lacuna
+    zoom_band: bool = True          # Espectro de alta resolução em torno da rotação
+    zoom_center: float = 0.0        # Centro da banda (Hz); 0 = motor_frequency
+    zoom_span: float = 10.0         # Largura da banda (Hz)
+    zoom_size: int = 2048           # Pontos da FFT complexa da banda (decimada)
+    order_tracking: bool = True     # Amplitude/fase de 1×…N× por bloco, sem FFT
+    orders: int = 6                 # Ordens rastreadas (1× a N×)
+    order_time_constant: float = 0.5  # Constante de tempo (s) dos filtros das ordens
+    order_speed: str = 'detected'   # Rotação: 'detected' (pico 1× da análise) ou 'config'
+    order_alarms: Tuple[float, ...] = ()  # Limite de amplitude por ordem (0 = sem alarme)
+    peak_count: int = 5             # Picos por canal na tabela de picos
+    peak_prominence: float = 0.0    # Proeminência mínima; 0 = noise_threshold / 20
+    peak_min_width: float = 1.0     # Largura mínima a meia proeminência (bins)
+    peak_max_width: float = 20.0    # Largura máxima (bins); 0 = sem limite
+
+# Campos que alteram os espectros brutos (antes do threshold); os demais só
+# afetam threshold, picos, harmônicos e a montagem do estado
+SPECTRAL_FIELDS = frozenset(('spectral_mode', 'fft_overlap', 'welch_segments',
+                             'spectral_alpha', 'window'))
 
 class DataProcessor:
     """Processa dados vibracionais (FFT, RMS, harmônicos, etc.)"""
     
-    def __init__(self, config: SystemConfig):
+    RMS_WINDOW = 100    # Amostras usadas no RMS do payload
+    NOISE_WINDOW = 50   # Amostras usadas no nível de ruído
+    
+    def __init__(self, config: SystemConfig, data_buffer: SampleRingBuffer = None):
         self.config = config
-        self.data_buffer: List[Dict] = []
+        # Buffer próprio ou fornecido (p. ex. SharedSampleRingBuffer no modo 'process')
+        self.data_buffer = data_buffer if data_buffer is not None else SampleRingBuffer(config.buffer_size)
+        
+        # Estatísticas deslizantes: janelas legadas (100/50 amostras) + configuradas
+        self.stats_windows = {
+            f"{seconds:g}s": int(round(seconds * config.sample_rate))
+            for seconds in config.stats_windows
+        }
+        self.stats = RollingStatistics(
+            [self.RMS_WINDOW, self.NOISE_WINDOW, *self.stats_windows.values()],
+            capacity=config.buffer_size
+        )
         self.fft_cache = {}
         self.start_time = time.time()
         self.total_samples = 0
-        self.avg_interval = None
-        self.last_timestamp = None
+        self.version = 0  # Incrementado a cada mudança no buffer
+        # Gerações de configuração (ver update_config) e cache das análises por versão
+        self.spectral_generation = 0
+        self.config_generation = 0
+        self.cache = AnalysisCache()
+        # Temporização pelos timestamps do ESP32 e reamostragem uniforme
+        self.timing = TimingEstimator(config.sample_rate, gap_factor=config.gap_factor)
+        self.resampler = (UniformResampler(config.sample_rate, config.max_fill_ms)
+                          if config.resample else None)
+        
+        # Descontinuidades (amostras descartadas na ingestão, ver IngestGap)
+        self.gap_count = 0
+        self.gap_samples = 0
+        self.last_gap_position: Optional[int] = None  # total_written na lacuna
+        
+        # Motor espectral (janelas em cache, FFT real dos 6 canais em lote)
+        self.spectral = SpectralEngine(config.sample_rate, config.fft_size, config.window)
+        
+        self.averager: Optional[SpectralAverager] = None
+        self.band_zoom: Optional[BandZoomAnalyzer] = None
+        self.waterfall: Optional[Waterfall] = None  # Ver enable_waterfall
+        self.orders: Optional[OrderTracker] = None     # Ver get_order_tracker
         
         # Resolução de frequência (melhor resolução com FFT maior)
-        self.freq_resolution = config.sample_rate / config.fft_size
+        self.freq_resolution = self.spectral.freq_resolution
         
         # Fatores RPM (dados reais do motor)
         self.rpm_factors = {
@@ -47,78 +120,273 @@ class DataProcessor:
         
         logger.info(f"Inicializado DataProcessor com FFT_SIZE={config.fft_size}, resolução={self.freq_resolution:.4f} Hz/bin")
     
-    def add_data(self, data_point: Dict):
+    def add_data(self, data_point: Dict, received_at: float = None):
         """Adiciona ponto de dados ao buffer"""
-        self.data_buffer.append(data_point)
-        self.total_samples += 1
-
-        ts = data_point['timestamp']  # timestamp do ESP32 em ms
-
-        if self.last_timestamp is not None:
-            interval = ts - self.last_timestamp  # intervalo entre pacotes
-
-            if self.avg_interval is None:
-                self.avg_interval = interval
-
-            else:
-                # filtro exponencial (suavização)
-                self.avg_interval = self.avg_interval * 0.9 + interval * 0.1
-
-        self.last_timestamp = ts
-        
-        # Manter tamanho do buffer
-        if len(self.data_buffer) > self.config.buffer_size:
-            self.data_buffer = self.data_buffer[-self.config.buffer_size:]
+        m1, m2 = data_point['m1'], data_point['m2']
+        values = np.array([[m1['x']], [m1['y']], [m1['z']],
+                           [m2['x']], [m2['y']], [m2['z']]], dtype=np.float32)
+        self.add_block(np.array([data_point['timestamp']]), values, received_at)
+    
+    def add_block(self, timestamps: np.ndarray, values: np.ndarray, received_at: float = None):
+        """
+        Adiciona bloco de amostras (timestamps: (n,), values: (6, n)) ao buffer.
+        Os timestamps do ESP32 alimentam as estatísticas de temporização;
+        com config.resample, duplicatas/fora de ordem são descartadas e o
+        bloco é reamostrado na grade uniforme antes de entrar no buffer.
+        """
+        n = len(timestamps)
+        if n == 0:
+            return
+        
+        valid = self.timing.observe(timestamps, received_at)
+        self.total_samples += n
+        
+        if self.resampler is None:
+            self._insert(timestamps, values)
+            return
+        
+        if not valid.all():
+            timestamps, values = timestamps[valid], values[:, valid]
+        for grid_timestamps, grid_values, after_gap in self.resampler.process(timestamps, values):
+            if after_gap:
+                self._note_gap(0)  # Lacuna longa demais para interpolar
+            self._insert(grid_timestamps, grid_values)
+    
+    def _insert(self, timestamps: np.ndarray, values: np.ndarray):
+        n = len(timestamps)
+        if n == 0:
+            return
+        self.data_buffer.append_block(timestamps, values)
+        self.stats.update(self.data_buffer, n)
+        tracker = self.get_order_tracker()
+        if tracker is not None:
+            with METRICS.time('orders'):
+                tracker.update(values)
+        self.version += 1
+    
+    def mark_gap(self, samples: int = 0, position: int = None):
+        """
+        Registra uma descontinuidade antes da próxima amostra. A média
+        Welch/exponencial recomeça com segmentos posteriores à lacuna e o
+        estado informa enquanto a janela da FFT ainda a contém.
+        """
+        if self.resampler is not None:
+            self.resampler.reset()  # Não interpolar através das amostras descartadas
+        self._note_gap(samples, position)
     
-    def calculate_fft(self, sensor_data: List[float], axis: str = 'x') -> np.ndarray:
+    def _note_gap(self, samples: int, position: int = None):
+        if position is None:
+            position = self.data_buffer.total_written
+        self.gap_count += 1
+        self.gap_samples += samples
+        self.last_gap_position = position
+        if self.averager is not None:
+            self.averager.mark_discontinuity(position)
+        if self.band_zoom is not None:
+            self.band_zoom.mark_discontinuity(position)
+        if self.waterfall is not None:
+            self.waterfall.mark_discontinuity(position)
+        if self.orders is not None:
+            self.orders.restart()  # Filtros recomeçam após a lacuna
+        self.version += 1
+    
+    def get_gap_info(self) -> Dict:
+        """Lacunas de ingestão e se a última ainda está na janela da FFT"""
+        since = None
+        if self.last_gap_position is not None:
+            since = self.data_buffer.total_written - self.last_gap_position
+        return {
+            'count': self.gap_count,
+            'dropped_samples': self.gap_samples,
+            'samples_since_gap': since,
+            'in_fft_window': since is not None and since < self.config.fft_size
+        }
+    
+    def calculate_fft(self, sensor_data: np.ndarray, axis: str = 'x') -> np.ndarray:
         """Calcula FFT de um sinal com filtro para remover pico de 0 Hz"""
         if len(sensor_data) < self.config.fft_size:
             return np.zeros(self.config.fft_size // 2)
         
-        # Pegar últimas N amostras
-        signal_data = sensor_data[-self.config.fft_size:]
-        
-        # Remover média DC (evita pico em 0 Hz)
-        signal_data = signal_data - np.mean(signal_data)
-        
-        # Aplicar janela de Hann (reduz vazamento espectral)
-        window = np.hanning(len(signal_data))
-        windowed_signal = signal_data * window
-        
-        # Calcular FFT
-        fft_result = np.fft.fft(windowed_signal)
+        # Remoção de DC, janela, FFT real e normalização no motor espectral
+        magnitude = self.spectral.magnitude(sensor_data, self.config.window)
         
-        # Calcular magnitude (apenas metade simétrica)
-        magnitude = np.abs(fft_result[:self.config.fft_size // 2])
-        
-        # Normalizar
-        magnitude = magnitude / (self.config.fft_size / 2)
-        
-        # Remover componente DC (0 Hz) para evitar pico de 0.0
-        if len(magnitude) > 0:
-            magnitude[0] = 0
+        return self.apply_threshold(magnitude)
+    
+    def update_config(self, **changes) -> Set[str]:
+        """
+        Altera campos da configuração e invalida só o que depende deles:
+        campos de SPECTRAL_FIELDS avançam spectral_generation (FFTs brutas
+        recalculadas); os demais avançam config_generation (threshold,
+        picos e harmônicos recalculados sobre as FFTs em cache).
+        Retorna os campos que realmente mudaram.
+        """
+        changed = {field for field, value in changes.items()
+                   if getattr(self.config, field) != value}
+        for field in changed:
+            setattr(self.config, field, changes[field])
+        if changed & SPECTRAL_FIELDS:
+            self.spectral_generation += 1
+        if changed - SPECTRAL_FIELDS:
+            self.config_generation += 1
+        return changed
+    
+    def spectra_key(self) -> Tuple[int, int]:
+        """Chave dos espectros brutos: versão do buffer e geração espectral"""
+        return (self.version, self.spectral_generation)
+    
+    def analysis_key(self) -> Tuple[int, int, int]:
+        """Chave da análise e do estado: inclui a geração da configuração"""
+        return (self.version, self.spectral_generation, self.config_generation)
+    
+    def calculate_spectra(self) -> np.ndarray:
+        """Calcula os espectros dos 6 canais (ordem de CHANNELS) em uma chamada"""
+        if len(self.data_buffer) < self.config.fft_size:
+            return np.zeros((len(CHANNELS), self.config.fft_size // 2))
         
-        # Aplicar threshold suave
+        # Espectros brutos em cache (cópia: o threshold é in-place)
+        return self.apply_threshold(self.raw_spectra().copy())
+    
+    def raw_spectra(self) -> np.ndarray:
+        """Espectros sem threshold, calculados uma vez por versão do buffer"""
+        return self.cache.get('spectra', self.spectra_key(), self._compute_raw_spectra)
+    
+    def _compute_raw_spectra(self) -> np.ndarray:
+        if self.config.spectral_mode != 'instant':
+            averager = self.get_averager()
+            averager.update(self.data_buffer)
+            average = averager.average()
+            if average is not None:
+                # Cópia: a média do averager muda na próxima atualização
+                return average.copy()
+        
+        signals = self.data_buffer.latest(self.config.fft_size)
+        return self.spectral.magnitude(signals, self.config.window)
+    
+    def get_averager(self) -> SpectralAverager:
+        """Averager do modo espectral atual (recriado se a configuração mudar)"""
+        config = self.config
+        averager = self.averager
+        if (averager is None or averager.mode != config.spectral_mode
+                or averager.overlap != config.fft_overlap
+                or averager.segments != config.welch_segments
+                or averager.alpha != config.spectral_alpha
+                or averager.window != config.window):
+            averager = SpectralAverager(
+                self.spectral,
+                overlap=config.fft_overlap,
+                segments=config.welch_segments,
+                alpha=config.spectral_alpha,
+                mode=config.spectral_mode,
+                window=config.window
+            )
+            self.averager = averager
+            logger.info(f"Modo espectral '{config.spectral_mode}': hop de {averager.hop} amostras")
+        return averager
+    
+    def band_center(self) -> float:
+        """Centro da banda de alta resolução: zoom_center ou a frequência do motor"""
+        return float(self.config.zoom_center or self.config.motor_frequency)
+    
+    def get_band_zoom(self) -> Optional[BandZoomAnalyzer]:
+        """Analisador da banda atual (recriado se centro, largura, tamanho ou janela mudarem)"""
+        config = self.config
+        center, span = self.band_center(), float(config.zoom_span)
+        if (not config.zoom_band or span <= 0 or center - span / 2 <= 0
+                or center + span / 2 >= config.sample_rate / 2):
+            self.band_zoom = None
+            return None
+        zoom = self.band_zoom
+        if zoom is None or not zoom.matches(center, span, config.zoom_size, config.window):
+            zoom = BandZoomAnalyzer(config.sample_rate, center, span, config.zoom_size, config.window)
+            self.band_zoom = zoom
+            logger.info(f"Banda de alta resolução {center - span / 2:g}-{center + span / 2:g} Hz: "
+                        f"decimação {zoom.decimation}, {zoom.bin_width:.4f} Hz/bin "
+                        f"(≈ FFT de {zoom.equivalent_fft_size} pontos)")
+        return zoom
+    
+    def band_spectra(self) -> Optional[Tuple[np.ndarray, Dict]]:
+        """
+        Espectro da banda (canais, bins) e sua forma, após consumir as
+        amostras novas do buffer; None se desativado ou ainda sem histórico
+        """
+        zoom = self.get_band_zoom()
+        if zoom is None:
+            return None
+        zoom.update(self.data_buffer)
+        return zoom.spectrum()
+    
+    def get_order_tracker(self) -> Optional[OrderTracker]:
+        """
+        Rastreador de ordens atual (recriado se ordens ou constante de tempo
+        mudarem). Com order_speed='config', ou enquanto nenhuma rotação foi
+        detectada, segue a frequência do motor configurada.
+        """
+        config = self.config
+        if not config.order_tracking:
+            self.orders = None
+            return None
+        tracker = self.orders
+        if tracker is None or not tracker.matches(config.orders, config.order_time_constant):
+            tracker = OrderTracker(config.sample_rate, config.orders, config.order_time_constant)
+            self.orders = tracker
+            logger.info(f"Rastreamento de ordens 1×-{config.orders}×: τ={config.order_time_constant:g} s "
+                        f"(rotação '{config.order_speed}')")
+        if config.order_speed != 'detected' or tracker.speed_source == 'config':
+            tracker.set_speed(config.motor_frequency, 'config')
+        return tracker
+    
+    def track_order_speed(self, analysis: Dict):
+        """
+        Rotação detectada para as ordens: pico do eixo principal de m1 (já
+        refinado pela banda de alta resolução quando cai nela), se acima do
+        threshold. Abaixo dele (máquina parada) fica a última rotação conhecida.
+        """
+        if self.orders is None or self.config.order_speed != 'detected':
+            return
+        peak = analysis['peaks']['m1']
+        if peak['amplitude'] > self.config.noise_threshold / 20:
+            self.orders.set_speed(peak['frequency'], 'detected')
+    
+    def check_order_alarms(self) -> List[Dict]:
+        """Alarmes de ordem que acabaram de disparar (ver OrderTracker.check_alarms)"""
+        if self.orders is None or not self.config.order_alarms:
+            return []
+        return self.orders.check_alarms(self.config.order_alarms)
+    
+    def enable_waterfall(self, hop_seconds: float = 1.0, history_seconds: float = 3600,
+                         **options) -> Waterfall:
+        """Espectrograma dos 6 canais com uma linha a cada hop_seconds (ver app.waterfall)"""
+        hop = max(1, int(round(hop_seconds * self.config.sample_rate)))
+        self.waterfall = Waterfall(self.spectral, hop, int(np.ceil(history_seconds / hop_seconds)),
+                                   **options)
+        logger.info(f"Espectrograma: linha a cada {hop} amostras, "
+                    f"{self.waterfall.capacity} linhas ({self.waterfall.rows.nbytes / 2**20:.1f} MiB)")
+        return self.waterfall
+    
+    def update_waterfall(self) -> int:
+        """Linhas novas do espectrograma (FFT só dos saltos completados desde a última chamada)"""
+        if self.waterfall is None:
+            return 0
+        with METRICS.time('waterfall'):
+            return self.waterfall.update(self.data_buffer, self.config.window)
+    
+    def apply_threshold(self, magnitude: np.ndarray) -> np.ndarray:
+        """Aplica threshold suave de ruído (in-place)"""
         magnitude[magnitude < (self.config.noise_threshold / 20)] = 0
-        
         return magnitude
     
-    def extract_signal(self, sensor: str = 'm1', axis: str = 'x') -> List[float]:
-        """Extrai sinal do buffer para um sensor/eixo específico"""
-        if not self.data_buffer:
-            return []
-        
-        signal = []
-        for point in self.data_buffer:
-            if sensor == 'm1':
-                signal.append(point['m1'][axis])
-            else:
-                signal.append(point['m2'][axis])
-        
-        return signal
+    def extract_signal(self, sensor: str = 'm1', axis: str = 'x') -> np.ndarray:
+        """Extrai sinal do buffer para um sensor/eixo específico (view sem cópia)"""
+        return self.data_buffer.channel(sensor, axis)
     
     def find_peaks(self, fft_magnitude: np.ndarray, min_freq: float = 1.0) -> Tuple[float, float, int]:
-        """Encontra picos no espectro FFT, ignorando frequências muito baixas"""
+        """
+        Encontra picos no espectro FFT, ignorando frequências muito baixas.
+        Aceita também uma matriz (canais, bins): retorna arrays por canal.
+        """
+        if fft_magnitude.ndim == 2:
+            return self.find_channel_peaks(fft_magnitude, min_freq)
+        
         if len(fft_magnitude) == 0:
             return 0.0, 0.0, 0
         
@@ -136,33 +404,62 @@ class DataProcessor:
         if max_idx >= len(fft_magnitude):
             return 0.0, 0.0, 0
         
-        # Frequência do pico
-        peak_freq = max_idx * self.freq_resolution
+        # Frequência e amplitude do pico (interpolação sub-bin)
+        offset, peak_amp = parabolic_peaks(fft_magnitude, max_idx)
+        peak_freq = (max_idx + float(offset)) * self.freq_resolution
         
-        # Amplitude do pico
-        peak_amp = fft_magnitude[max_idx]
+        return peak_freq, float(peak_amp), max_idx
+    
+    def find_channel_peaks(self, spectra: np.ndarray,
+                           min_freq: float = 1.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Pico global de cada canal de uma matriz (canais, bins), vetorizado"""
+        channels, bins = spectra.shape
+        min_idx = int(min_freq / self.freq_resolution)
+        if bins <= min_idx:
+            zeros = np.zeros(channels)
+            return zeros, zeros, zeros.astype(int)
+        
+        max_idx = np.argmax(spectra[:, min_idx:], axis=1) + min_idx
+        offset, peak_amp = parabolic_peaks(spectra, max_idx)
+        peak_freq = (max_idx + offset) * self.freq_resolution
         
         return peak_freq, peak_amp, max_idx
     
+    def detect_peaks(self, spectra: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Os peak_count picos mais altos de cada canal que passam nos critérios
+        de proeminência e largura (ver find_spectral_peaks), em uma passada
+        """
+        config = self.config
+        return find_spectral_peaks(
+            spectra, self.freq_resolution, count=max(1, config.peak_count), min_freq=1.0,
+            min_prominence=config.peak_prominence or config.noise_threshold / 20,
+            min_width=config.peak_min_width, max_width=config.peak_max_width or None)
+    
+    def peak_table(self, peaks: Dict[str, np.ndarray]) -> Dict:
+        """Tabela compacta para o payload: linhas [frequência, amplitude, proeminência, largura]"""
+        fields = ('frequency', 'amplitude', 'prominence', 'width')
+        rows = np.stack([peaks[field] for field in fields], axis=-1)
+        table = {'fields': list(fields), 'm1': {}, 'm2': {}}
+        for i, (sensor, axis) in enumerate(CHANNELS):
+            table[sensor][axis] = rows[i][peaks['found'][i]].tolist()
+        return table
+    
     def calculate_rms(self, sensor: str = 'm1', axis: str = 'x', 
                      window: int = 100) -> float:
         """Calcula valor RMS para uma janela de amostras"""
-        if not self.data_buffer or len(self.data_buffer) < window:
+        if len(self.data_buffer) < window:
             return 0.0
         
-        # Pegar últimas N amostras
-        recent_data = self.data_buffer[-window:]
+        # Janelas registradas: leitura O(1) das somas deslizantes
+        if window in self.stats.windows:
+            return float(self.stats.rms(window)[channel_index(sensor, axis)])
         
-        # Extrair valores
-        values = []
-        for point in recent_data:
-            if sensor == 'm1':
-                values.append(point['m1'][axis])
-            else:
-                values.append(point['m2'][axis])
+        # Últimas N amostras (view direta do buffer)
+        values = self.data_buffer.channel(sensor, axis, window)
         
         # Calcular RMS
-        squared = np.square(values)
+        squared = np.square(values, dtype=np.float64)
         mean_squared = np.mean(squared)
         rms = np.sqrt(mean_squared)
         
@@ -197,12 +494,19 @@ class DataProcessor:
             
             max_amp = 0
             found_freq = target_freq
+            best_idx = None
             
             for idx in range(start_idx, end_idx + 1):
                 amp = fft_magnitude[idx]
                 if amp > max_amp:
                     max_amp = amp
-                    found_freq = idx * self.freq_resolution
+                    best_idx = idx
+            
+            if best_idx is not None:
+                # Interpolação sub-bin do pico encontrado
+                offset, max_amp = parabolic_peaks(fft_magnitude, best_idx)
+                max_amp = float(max_amp)
+                found_freq = (best_idx + float(offset)) * self.freq_resolution
             
             # Só incluir se amplitude > threshold
             if max_amp > (self.config.noise_threshold / 20):
@@ -227,73 +531,167 @@ class DataProcessor:
     
     def calculate_current_noise(self, window: int = 50) -> float:
         """Calcula nível de ruído atual (RMS dos últimos pontos)"""
-        if not self.data_buffer or len(self.data_buffer) < window:
+        if len(self.data_buffer) < window:
             return 0.0
         
-        recent_data = self.data_buffer[-window:]
+        if window in self.stats.windows:
+            return float(self.stats.rms(window)[channel_index('m1', 'x')])
         
-        # Extrair valores do eixo X do sensor 1
-        values = []
-        for point in recent_data:
-            values.append(point['m1']['x'])
+        # Valores do eixo X do sensor 1
+        values = self.data_buffer.channel('m1', 'x', window)
         
         # Calcular RMS
-        squared = np.square(values)
+        squared = np.square(values, dtype=np.float64)
         mean_squared = np.mean(squared)
         noise = np.sqrt(mean_squared)
         
         return noise
     
     def get_buffer_info(self) -> Dict:
-        # Se a taxa de chegada ideal é, por ex., 10 ms (100 Hz)
-        ideal_interval = 10.0  
-
-        if self.avg_interval is None:
-            load = 0
-        else:
-            load = min(100, (self.avg_interval / ideal_interval) * 100)
-
+        """
+        Contagem, tempo de coleta e temporização medida. 'buffer_usage' é a
+        perda recente de amostras (%) vista nos timestamps do ESP32: dados
+        chegando abaixo da taxa real indicam o buffer do ESP32 transbordando.
+        """
+        timing = self.timing.get_stats()
         return {
-            'buffer_usage': load,
-        'total_samples': self.total_samples,
-        'collection_time': time.time() - self.start_time
-    }
+            'buffer_usage': min(100.0, timing['loss_percent']),
+            'total_samples': self.total_samples,
+            'collection_time': time.time() - self.start_time,
+            'timing': timing
+        }
     
     def process_realtime_update(self) -> Optional[Dict]:
-        """Processa dados para atualização em tempo real"""
+        """Processa dados para atualização em tempo real (payload JSON)"""
+        state = self.build_realtime_state()
+        return to_json_payload(state) if state else None
+    
+    def build_realtime_state(self) -> Optional[Dict]:
+        """
+        Análise em tempo real com espectros e formas de onda como arrays NumPy.
+        O estado fica em cache até a próxima mudança no buffer ou na
+        configuração: quem pedir a mesma versão recebe o mesmo dict.
+        """
         if len(self.data_buffer) < 100:
             return None
+        key = self.analysis_key()
+        state = self.cache.peek('state', key)
+        if state is None:
+            state = self.assemble_state(self.analyze_spectra())
+            self.cache.put('state', key, state)
+        return state
+    
+    def analyze_spectra(self) -> Dict:
+        """
+        Parte pesada da análise (FFT dos 6 canais, picos e harmônicos).
+        Depende só do buffer e da configuração: pode rodar em outro processo
+        sobre uma cópia do buffer compartilhado (ver app.analysis_pool).
+        Calculada uma vez por analysis_key().
+        """
+        return self.cache.get('analysis', self.analysis_key(), self._analyze_spectra)
+    
+    def _analyze_spectra(self) -> Dict:
+        # FFT dos 6 canais em uma única chamada
+        with METRICS.time('fft'):
+            spectra = self.calculate_spectra()
+        
+        # Picos de todos os canais (acima de 1 Hz, com proeminência e largura mínimas).
+        # O principal de cada canal é o mais alto da tabela; sem pico válido a
+        # amplitude fica 0 e desbalanceamento e harmônicos não usam ruído
+        with METRICS.time('peaks'):
+            peaks = self.detect_peaks(spectra)
+        peak_freqs, peak_amps = peaks['frequency'][:, 0], peaks['amplitude'][:, 0]
+        
+        # Espectro e pico principais no eixo configurado
+        axis = self.config.main_axis
+        idx1 = channel_index('m1', axis)
+        idx2 = channel_index('m2', axis)
+        
+        # Banda de alta resolução em torno da rotação: refina os picos que caem nela
+        with METRICS.time('band_zoom'):
+            band = self.band_spectra()
+        band_result = None
+        if band is not None:
+            peak_freqs, peak_amps, band_result = self.refine_band_peaks(
+                band, peak_freqs, peak_amps, (idx1, idx2))
+        fft1, fft2 = spectra[idx1], spectra[idx2]
+        peak1_freq, peak1_amp = float(peak_freqs[idx1]), float(peak_amps[idx1])
+        peak2_freq, peak2_amp = float(peak_freqs[idx2]), float(peak_amps[idx2])
+        
+        # Picos por eixo (m1/m2 × x/y/z)
+        axis_peaks = {'m1': {}, 'm2': {}}
+        for i, (sensor, channel_axis) in enumerate(CHANNELS):
+            axis_peaks[sensor][channel_axis] = {
+                'frequency': float(peak_freqs[i]),
+                'amplitude': float(peak_amps[i])
+            }
         
-        # Sinal para FFT
-        signal1_x = self.extract_signal('m1', 'x')
-        signal2_x = self.extract_signal('m2', 'x')
-        
-        # Calcular FFTs
-        fft1 = self.calculate_fft(signal1_x, 'x')
-        fft2 = self.calculate_fft(signal2_x, 'x')
-        
-        # Encontrar picos (ignorando frequências abaixo de 1Hz)
-        peak1_freq, peak1_amp, _ = self.find_peaks(fft1, min_freq=1.0)
-        peak2_freq, peak2_amp, _ = self.find_peaks(fft2, min_freq=1.0)
-        
-        # Converter para RPM
-        peak1_rpm = self.frequency_to_rpm(peak1_freq)
-        peak2_rpm = self.frequency_to_rpm(peak2_freq)
+        # Harmônicos
+        with METRICS.time('harmonics'):
+            harmonics = self.find_harmonics(peak1_freq, fft1)
         
-        # Calcular RMS para todos os eixos
-        rms1_x = self.calculate_rms('m1', 'x')
-        rms1_y = self.calculate_rms('m1', 'y')
-        rms1_z = self.calculate_rms('m1', 'z')
+        return {
+            'fft': {
+                'm1': fft1,
+                'm2': fft2
+            },
+            'bin_width': self.freq_resolution,
+            'fft_axis': axis,
+            'axis_peaks': axis_peaks,
+            'peaks': {
+                'm1': {
+                    'frequency': peak1_freq,
+                    'amplitude': peak1_amp,
+                    'rpm': self.frequency_to_rpm(peak1_freq)
+                },
+                'm2': {
+                    'frequency': peak2_freq,
+                    'amplitude': peak2_amp,
+                    'rpm': self.frequency_to_rpm(peak2_freq)
+                }
+            },
+            'harmonics': harmonics,
+            'peak_table': self.peak_table(peaks),
+            'band': band_result
+        }
+    
+    def refine_band_peaks(self, band: Tuple[np.ndarray, Dict], peak_freqs: np.ndarray,
+                          peak_amps: np.ndarray, rows: Tuple[int, int]):
+        """
+        Pico de cada canal na banda (argmax + interpolação sub-bin). Onde o pico
+        global cai dentro da banda, frequência e amplitude passam a ser as da
+        banda. Retorna os picos ajustados e o resultado da banda (espectros
+        do eixo principal, para o zoom, e picos por canal).
+        """
+        magnitude, info = band
+        indices = np.argmax(magnitude, axis=1)
+        offset, amplitude = parabolic_peaks(magnitude, indices)
+        frequency = info['start_freq'] + (indices + offset) * info['step']
+        
+        inside = (np.abs(peak_freqs - info['center']) <= info['span'] / 2) & (peak_amps > 0)
+        peak_freqs = np.where(inside, frequency, peak_freqs)
+        peak_amps = np.where(inside, amplitude, peak_amps)
+        
+        idx1, idx2 = rows
+        return peak_freqs, peak_amps, {
+            'info': info,
+            'fft': {'m1': magnitude[idx1], 'm2': magnitude[idx2]},
+            'peaks': {
+                sensor: {'frequency': float(frequency[row]), 'amplitude': float(amplitude[row])}
+                for sensor, row in (('m1', idx1), ('m2', idx2))
+            }
+        }
+    
+    def assemble_state(self, analysis: Dict) -> Dict:
+        """Completa a análise espectral com RMS, ruído, buffer e formas de onda (barato)"""
+        peaks = analysis['peaks']
+        self.track_order_speed(analysis)
         
-        rms2_x = self.calculate_rms('m2', 'x')
-        rms2_y = self.calculate_rms('m2', 'y')
-        rms2_z = self.calculate_rms('m2', 'z')
+        # RMS de todos os eixos (leitura O(1) das estatísticas deslizantes)
+        rms1_x, rms1_y, rms1_z, rms2_x, rms2_y, rms2_z = self.stats.rms(self.RMS_WINDOW).tolist()
         
         # Desbalanceamento
-        imbalance = self.calculate_imbalance(peak1_amp, peak2_amp)
-        
-        # Harmônicos
-        harmonics = self.find_harmonics(peak1_freq, fft1)
+        imbalance = self.calculate_imbalance(peaks['m1']['amplitude'], peaks['m2']['amplitude'])
         
         # Nível de ruído atual
         current_noise = self.calculate_current_noise()
@@ -306,38 +704,137 @@ class DataProcessor:
             'timestamp': time.time(),
             'collection_time': buffer_info['collection_time'],
             'total_samples': buffer_info['total_samples'],
-            'time_data': self.data_buffer[-100:],  # Últimas 100 amostras
-            'fft': {
-                'm1': fft1.tolist(),
-                'm2': fft2.tolist()
-            },
-            'peaks': {
-                'm1': {
-                    'frequency': peak1_freq,
-                    'amplitude': peak1_amp,
-                    'rpm': peak1_rpm
-                },
-                'm2': {
-                    'frequency': peak2_freq,
-                    'amplitude': peak2_amp,
-                    'rpm': peak2_rpm
-                }
-            },
+            'time_signals': self.data_buffer.latest(100).copy(),  # Últimas 100 amostras
+            'time_timestamps': self.data_buffer.latest_timestamps(100).copy(),
+            'fft': analysis['fft'],
+            'bin_width': analysis['bin_width'],
+            'fft_range': self.config.fft_range,
+            'fft_axis': analysis['fft_axis'],
+            'spectral_mode': self.config.spectral_mode,
+            'axis_peaks': analysis['axis_peaks'],
+            'peaks': peaks,
             'rms': {
                 'm1': {'x': rms1_x, 'y': rms1_y, 'z': rms1_z},
                 'm2': {'x': rms2_x, 'y': rms2_y, 'z': rms2_z}
             },
             'imbalance': imbalance,
-            'harmonics': harmonics,
+            'harmonics': analysis['harmonics'],
+            'peak_table': analysis['peak_table'],
+            'band_zoom': ({**analysis['band']['info'], 'peaks': analysis['band']['peaks']}
+                          if analysis.get('band') else None),
+            'orders': self.orders.get_state() if self.orders is not None else None,
             'current_noise': current_noise,
+            'window_stats': self.get_window_statistics(),
+            'data_gap': self.get_gap_info(),
+            'timing': buffer_info['timing'],
             'buffer_status': buffer_info['buffer_usage']
         }
         
         return update_data
     
+    def analyze_window(self, values: np.ndarray, segment_size: int = None,
+                       overlap: float = 0.5, batch_segments: int = 64) -> Dict:
+        """
+        RMS, pico-a-pico e espectro médio (Welch) de uma janela arbitrária
+        (canais, n), p. ex. um trecho de gravação. Os segmentos são
+        processados em lotes, então a memória não cresce com a janela.
+        """
+        values = np.atleast_2d(values)
+        channels, n = values.shape
+        result = {'samples': int(n), 'segments': 0, 'spectrum': None, 'bin_width': None}
+        if n == 0:
+            return result
+        
+        result['rms'] = np.sqrt(np.mean(np.square(values, dtype=np.float64), axis=1))
+        result['peak_to_peak'] = (values.max(axis=1) - values.min(axis=1)).astype(np.float64)
+        
+        size = min(segment_size or self.config.fft_size, n)
+        if size < 16:
+            return result
+        engine = self.spectral if size == self.config.fft_size else \
+            SpectralEngine(self.config.sample_rate, size, self.config.window)
+        hop = max(1, int(size * (1 - overlap)))
+        
+        # Segmentos como views (canais, k, size); potência somada lote a lote
+        segments = np.lib.stride_tricks.sliding_window_view(values, size, axis=1)[:, ::hop]
+        count = segments.shape[1]
+        power = np.zeros((channels, engine.num_bins))
+        for start in range(0, count, batch_segments):
+            batch = engine.magnitude(segments[:, start:start + batch_segments], self.config.window)
+            power += np.square(batch).sum(axis=1)
+        
+        result['spectrum'] = np.sqrt(power / count)
+        result['bin_width'] = engine.freq_resolution
+        result['segments'] = int(count)
+        return result
+    
+    def zoom_spectra(self, center: float, span: float, axis: str = None) -> Optional[Dict]:
+        """
+        Bins em resolução total em torno de `center` (Hz) para m1 e m2,
+        sem a decimação usada na visão geral
+        """
+        if len(self.data_buffer) < self.config.fft_size:
+            return None
+        if span <= 0:
+            raise ValueError("span deve ser positivo")
+        
+        axis = axis or self.config.main_axis
+        
+        # Dentro da banda de alta resolução: bins da última análise (zoom FFT)
+        analysis = self.cache.latest('analysis')
+        band = analysis.get('band') if analysis and analysis['fft_axis'] == axis else None
+        if band is not None:
+            band_info = band['info']
+            low, high = band_info['center'] - band_info['span'] / 2, band_info['center'] + band_info['span'] / 2
+            if low <= center - span / 2 and center + span / 2 <= high:
+                rows = np.vstack([band['fft']['m1'], band['fft']['m2']])
+                zoomed, info = zoom_spectrum(rows, band_info['step'], center, span,
+                                             start_freq=band_info['start_freq'])
+                info['source'] = 'band'
+                return {
+                    'fft_axis': axis,
+                    'fft': {'m1': zoomed[0].tolist(), 'm2': zoomed[1].tolist()},
+                    'fft_info': info
+                }
+        
+        spectra = self.calculate_spectra()
+        rows = spectra[[channel_index('m1', axis), channel_index('m2', axis)]]
+        zoomed, info = zoom_spectrum(rows, self.freq_resolution, center, span)
+        info['source'] = 'fft'
+        
+        return {
+            'fft_axis': axis,
+            'fft': {'m1': zoomed[0].tolist(), 'm2': zoomed[1].tolist()},
+            'fft_info': info
+        }
+    
+    def get_window_statistics(self) -> Dict:
+        """Média, RMS, pico e pico-a-pico de cada janela configurada"""
+        return {
+            label: self.stats.snapshot(window)
+            for label, window in self.stats_windows.items()
+            if window in self.stats.windows
+        }
+    
     def clear_data(self):
         """Limpa todos os dados"""
-        self.data_buffer = []
+        self.data_buffer.clear()
+        self.stats.reset()
+        self.version += 1
+        if self.averager is not None:
+            self.averager.reset()
+        if self.band_zoom is not None:
+            self.band_zoom.reset()
+        if self.waterfall is not None:
+            self.waterfall.restart()
+        if self.orders is not None:
+            self.orders.reset()
         self.total_samples = 0
+        self.gap_count = 0
+        self.gap_samples = 0
+        self.last_gap_position = None
+        self.timing.reset()
+        if self.resampler is not None:
+            self.resampler.reset()
         self.start_time = time.time()
         logger.info("Dados limpos")
\ No newline at end of file
@@ -0,0 +1,763 @@
+"""
+REGISTRO DE DISPOSITIVOS (VÁRIAS BANCADAS ESP32 NO MESMO SERVIDOR)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.config import (DEFAULT_CONFIG, SAMPLE_RATE, FFT_SIZE, BUFFER_SIZE, SERIAL_BAUD,
+                        SERIAL_TIMEOUT, SERIAL_DATA_FORMAT, SERIAL_BULK_INGEST,
+                        SIMULATION_CONFIG, RECORDER_CONFIG, WEBSOCKET_CONFIG, METRICS_CONFIG,
+                        INGEST_CONFIG, TIMING_CONFIG, TRENDS_CONFIG, WATERFALL_CONFIG,
+                        BAND_ZOOM_CONFIG, ORDER_TRACKING_CONFIG, PEAK_DETECTION_CONFIG)
+from app.ring_buffer import CHANNELS, SharedSampleRingBuffer
+from app.analysis_pool import ProcessAnalysisPool
+from app.serial_reader import SerialReader
+from app.protocol import SampleBlock
+from app.ingest_queue import IngestGap
+from app.metrics import LatencyTracker, RateMeter, METRICS
+from app.emitter import EmissionScheduler
+from app.recorder import TestRecorder, recover_sessions
+from app.recording import parse_channel
+from app.trends import TrendStore, TREND_TIERS, sample_metric_values
+from app.orders import order_trend_metrics
+from app.sources import ReplaySource, SyntheticSource, FirmwareEmulator, SignalConfig
+from app.data_processor import DataProcessor, SystemConfig
+
+logger = logging.getLogger(__name__)
+
+DEVICE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+# Chaves de DEFAULT_CONFIG aplicadas ao SystemConfig de cada dispositivo
+PROCESSOR_CONFIG_KEYS = ('motor_frequency', 'noise_threshold', 'fft_range', 'main_axis',
+                         'spectral_mode', 'fft_overlap')
+
+
+class DevicePipeline:
+    """
+    Uma bancada: leitor (serial ou fonte simulada) → processador → emissão.
+
+    O leitor tem a própria thread de I/O; cada lote recebido agenda um
+    "dreno" no pool compartilhado do registro, com no máximo um dreno em
+    andamento por dispositivo (a ordem das amostras é preservada). A análise
+    pedida pelo agendador de emissão também roda no pool, então o número de
+    FFTs simultâneas fica limitado ao tamanho do pool, qualquer que seja o
+    número de bancadas.
+    """
+
+    def __init__(self, device_id: str, name: str, registry: 'DeviceRegistry', tests_dir: str):
+        self.device_id = device_id
+        self.name = name
+        self.registry = registry
+        self.socketio = registry.socketio
+        self.room = f"device:{device_id}"
+
+        self.reader = SerialReader(baudrate=SERIAL_BAUD, timeout=SERIAL_TIMEOUT,
+                                   data_format=SERIAL_DATA_FORMAT,
+                                   bulk_ingest=SERIAL_BULK_INGEST, ingest=INGEST_CONFIG)
+        self.reader.on_data = self.schedule
+        self.emulator: Optional[FirmwareEmulator] = None
+        # Modo 'process': amostras em memória compartilhada, lidas pelos processos de análise
+        self.analysis_pool = registry.analysis_pool
+        shared = (SharedSampleRingBuffer(BUFFER_SIZE)
+                  if self.analysis_pool is not None else None)
+        self.processor = DataProcessor(SystemConfig(
+            sample_rate=SAMPLE_RATE,
+            fft_size=FFT_SIZE,
+            buffer_size=BUFFER_SIZE,
+            **{key: DEFAULT_CONFIG[key] for key in PROCESSOR_CONFIG_KEYS},
+            **TIMING_CONFIG,
+            **BAND_ZOOM_CONFIG,
+            **ORDER_TRACKING_CONFIG,
+            **PEAK_DETECTION_CONFIG
+        ), data_buffer=shared)
+        # Espectrograma: linhas novas enviadas só aos clientes inscritos (sala própria)
+        if WATERFALL_CONFIG['enabled']:
+            self.processor.enable_waterfall(**{key: value for key, value in WATERFALL_CONFIG.items()
+                                               if key != 'enabled'})
+        self.waterfall_room = f"waterfall:{device_id}"
+        self.waterfall_clients = set()
+        self.lock = threading.RLock()  # Processador compartilhado entre ingestão e emissão
+        self.running = False
+        self.start_time = time.time()
+
+        # Gravação de testes (uma pasta por dispositivo)
+        self.tests_dir = tests_dir
+        recover_sessions(tests_dir)
+        self.recorder = TestRecorder(
+            tests_dir,
+            sample_rate=SAMPLE_RATE,
+            max_queue_chunks=RECORDER_CONFIG['max_queue_chunks'],
+            flush_interval=RECORDER_CONFIG['flush_interval']
+        )
+        self.test_recording = False
+        self.last_metrics_time = 0.0
+
+        # Histórico de tendências (segundo/minuto/hora), alimentado mesmo sem gravação
+        self.trends = (TrendStore(os.path.join(registry.trends_dir, device_id),
+                                  retention=TRENDS_CONFIG['retention'])
+                       if registry.trends_dir and TRENDS_CONFIG['enabled'] else None)
+        # Amplitudes das ordens lidas direto do rastreador (sem depender da FFT);
+        # o nº de ordens vai no nome da pasta porque o registro tem tamanho fixo
+        trend_orders = min(TRENDS_CONFIG['orders'], ORDER_TRACKING_CONFIG['orders'])
+        self.trend_orders = trend_orders if self.trends is not None else 0
+        self.order_trends = (TrendStore(os.path.join(registry.trends_dir, device_id,
+                                                     f"orders_{trend_orders}"),
+                                        metrics=order_trend_metrics(trend_orders),
+                                        retention=TRENDS_CONFIG['retention'])
+                             if self.trend_orders > 0 else None)
+
+        # Latência ponta a ponta (chegada da amostra no PC → emissão)
+        self.latency = LatencyTracker()
+        self.oldest_pending_at: Optional[float] = None
+        self.ingest_rate = RateMeter(METRICS_CONFIG['rate_window'])
+
+        # Dreno agendado no pool (no máximo um por dispositivo)
+        self.drain_lock = threading.Lock()
+        self.drain_scheduled = False
+        self.reported_overloads = 0
+
+        self.clients = set()
+        self.emitter = EmissionScheduler(
+            self.socketio,
+            build_update=lambda: self.registry.run(self.build_realtime_state),
+            get_version=lambda: self.processor.version,
+            default_fps=WEBSOCKET_CONFIG['default_fps'],
+            max_fps=WEBSOCKET_CONFIG['max_fps']
+        )
+        self.emitter.on_emit = self.record_emit_latency
+        self.emitter.emit_rate = RateMeter(METRICS_CONFIG['rate_window'])
+        self.emitter.start()
+
+    # ---------- Fonte de dados ----------
+
+    def is_connected(self) -> bool:
+        return self.reader.is_connected()
+
+    def connect(self, source: str, params: Dict) -> Tuple[bool, Optional[str]]:
+        """Troca a fonte do dispositivo e conecta; retorna (sucesso, alvo)"""
+        reader, target = self.create_source(source, params)
+        reader.requested_format = params.get('format', SERIAL_DATA_FORMAT)
+        reader.on_data = self.schedule
+        # Antes de connect(): os primeiros blocos já encontram o leitor novo
+        self.reader = reader
+        self.reported_overloads = 0
+        self.running = True
+        if not reader.connect(target):
+            self.running = False
+            self.stop_emulator()
+            return False, target
+        return True, target
+
+    def disconnect(self):
+        self.reader.disconnect()
+        self.stop_emulator()
+        self.running = False
+
+    def create_source(self, source: str, params: Dict):
+        """
+        Cria o leitor da fonte pedida e o alvo para connect():
+        serial → porta; replay → gravação (relativa à pasta de testes);
+        synthetic → gerador; emulator → pty do firmware emulado
+        """
+        # Fonte anterior é encerrada antes de trocar o leitor
+        self.reader.disconnect()
+        self.stop_emulator()
+
+        speed = float(params.get('speed', SIMULATION_CONFIG['speed']))
+        signal = SignalConfig.from_dict({**SIMULATION_CONFIG['signal'], **params.get('signal', {})})
+
+        if source == 'replay':
+            path = params.get('path') or ''
+            target = path if os.path.isabs(path) else os.path.join(self.tests_dir, path)
+            reader = ReplaySource(speed=speed, loop=bool(params.get('loop', False)),
+                                  sample_rate=SAMPLE_RATE, ingest=INGEST_CONFIG)
+            return reader, target
+
+        if source == 'synthetic':
+            reader = SyntheticSource(signal=signal, speed=speed,
+                                     duration=params.get('duration'), ingest=INGEST_CONFIG)
+            return reader, None
+
+        reader = SerialReader(baudrate=SERIAL_BAUD, timeout=SERIAL_TIMEOUT,
+                              bulk_ingest=SERIAL_BULK_INGEST, ingest=INGEST_CONFIG)
+        if source == 'emulator':
+            self.emulator = FirmwareEmulator(signal=signal, speed=speed)
+            return reader, self.emulator.start()
+        return reader, params.get('port')
+
+    def stop_emulator(self):
+        if self.emulator is not None:
+            self.emulator.stop()
+            self.emulator = None
+
+    def source_name(self) -> str:
+        return getattr(self.reader, 'source_name', 'emulator' if self.emulator else 'serial')
+
+    # ---------- Ingestão (pool compartilhado) ----------
+
+    def schedule(self):
+        """Chamado pela thread do leitor a cada item: agenda um dreno se não houver"""
+        with self.drain_lock:
+            if self.drain_scheduled:
+                return
+            self.drain_scheduled = True
+        self.registry.submit(self._drain)
+
+    def _drain(self):
+        """Processa a fila do leitor até esvaziar, liberando o pool em seguida"""
+        reader = self.reader
+        while True:
+            try:
+                self.process_data(reader.get_all_data(), reader)
+            except Exception as e:
+                logger.error(f"Erro no processamento ({self.device_id}): {e}")
+            with self.drain_lock:
+                # Item que chegou depois do último get_all_data ainda é tratado aqui
+                if reader.data_queue.empty() and reader.status_queue.empty():
+                    self.drain_scheduled = False
+                    return
+
+    def process_data(self, items: List, reader: SerialReader = None):
+        """Insere um lote do leitor no processador, gravador e métricas"""
+        reader = reader or self.reader
+        status_messages = []
+        recorded_timestamps = []
+        recorded_values = []
+        gaps = []
+        samples = 0
+        new_rows = 0
+        alarms = []
+
+        if self.running:
+            with self.lock, METRICS.time('add_data'):
+                for item in items:
+                    if isinstance(item, IngestGap):
+                        # Amostras descartadas pela fila: a FFT não pode ignorar a lacuna
+                        self.processor.mark_gap(item.samples)
+                        gaps.append(item)
+                        continue
+                    if isinstance(item, SampleBlock):
+                        # Bloco já decodificado (vetorizado)
+                        self.processor.add_block(item.timestamps, item.values, item.received_at)
+                        samples += len(item.timestamps)
+                        self.mark_pending(item.received_at)
+                        if self.test_recording:
+                            self.recorder.write_samples(item.timestamps, item.values)
+                        continue
+
+                    received_at = time.monotonic()
+                    self.mark_pending(received_at)
+                    parsed = reader.parse_data_line(item)
+                    if not parsed:
+                        continue
+                    if parsed['type'] == 'data':
+                        self.processor.add_data(parsed, received_at)
+                        samples += 1
+                        if self.test_recording:
+                            recorded_timestamps.append(parsed['timestamp'])
+                            recorded_values.append([parsed[sensor][axis]
+                                                    for sensor, axis in CHANNELS])
+                    elif parsed['type'] == 'status':
+                        status_messages.append(parsed['message'])
+
+            # Linhas do espectrograma completadas por este lote e alarmes de ordem
+            if samples:
+                with self.lock:
+                    new_rows = self.processor.update_waterfall()
+                    alarms = self.processor.check_order_alarms()
+
+        if samples and METRICS.enabled:
+            METRICS.inc('samples', samples, device=self.device_id)
+            self.ingest_rate.add(samples)
+
+        # Amostras linha a linha: um bloco por lote para o gravador
+        if recorded_timestamps:
+            self.recorder.write_samples(recorded_timestamps, np.array(recorded_values).T)
+
+        # Métricas do teste e tendências: uma vez por lote, sobre a mesma análise da emissão
+        if samples:
+            self.sample_metrics()
+
+        if new_rows:
+            self.push_waterfall(new_rows)
+
+        if alarms:
+            self.report_order_alarms(alarms)
+
+        if gaps:
+            self.report_overload(reader, gaps)
+
+        # Status do firmware (linhas '#' e fila separada dos modos em bloco)
+        for message in status_messages + reader.get_status_messages():
+            self.socketio.emit('status_message', {'message': message, 'device_id': self.device_id},
+                               to=self.room)
+
+        # Sem clientes não há emissão: não acumular latência
+        if not self.clients:
+            self.oldest_pending_at = None
+
+        if samples:
+            self.emitter.notify()
+
+    def report_overload(self, reader: SerialReader, gaps: List[IngestGap]):
+        """Avisa o painel uma vez por período de sobrecarga da fila de ingestão"""
+        ingest = reader.data_queue
+        if ingest.overload_events == self.reported_overloads:
+            return
+        self.reported_overloads = ingest.overload_events
+        lost = sum(gap.samples for gap in gaps)
+        message = (f"SOBRECARGA_INGESTAO: {lost} amostras descartadas "
+                   f"({ingest.policy}, total {ingest.total_dropped()})")
+        logger.warning(f"{message} ({self.device_id})")
+        self.socketio.emit('status_message', {'message': message, 'device_id': self.device_id},
+                           to=self.room)
+
+    def report_order_alarms(self, alarms: List[Dict]):
+        """Avisa o painel (status_message) de cada ordem que passou do limite"""
+        for alarm in alarms:
+            message = (f"ALARME_ORDEM: {alarm['order']}× {alarm['sensor']}/{alarm['axis']} "
+                       f"({alarm['frequency']:.2f} Hz) = {alarm['amplitude']:.2f} > {alarm['limit']:g}")
+            logger.warning(f"{message} ({self.device_id})")
+            self.socketio.emit('status_message', {'message': message, 'device_id': self.device_id},
+                               to=self.room)
+        if METRICS.enabled:
+            METRICS.inc('order_alarms', len(alarms), device=self.device_id)
+
+    # ---------- Análise ----------
+
+    def build_realtime_state(self) -> Optional[Dict]:
+        """Análise em tempo real compartilhada por todos os clientes do tick"""
+        state = self.current_state()
+        if state:
+            # Cópia rasa: o estado em cache é compartilhado com o gravador
+            state = {**state, 'latency': self.latency.summary(), 'device_id': self.device_id}
+        return state
+
+    def current_state(self) -> Optional[Dict]:
+        """
+        Estado da versão atual do buffer, calculado uma vez e reaproveitado
+        por emissão, gravador e endpoints (cache do processador)
+        """
+        if self.analysis_pool is None:
+            with self.lock:
+                return self.processor.build_realtime_state()
+        return self._build_state_in_process()
+
+    def _build_state_in_process(self) -> Optional[Dict]:
+        """FFT e harmônicos no processo de análise; a ingestão segue sem o lock"""
+        processor = self.processor
+        with self.lock:
+            if len(processor.data_buffer) < 100:
+                return None
+            key = processor.analysis_key()
+            state = processor.cache.peek('state', key)
+            if state is not None:
+                return state
+        try:
+            analysis = self.analysis_pool.analyze(self.device_id, processor.data_buffer,
+                                                  processor.config, processor.last_gap_position)
+        except Exception as e:
+            logger.warning(f"Análise em processo falhou ({self.device_id}): {e}; "
+                           f"analisando no servidor")
+            with self.lock:
+                analysis = processor.analyze_spectra()
+        with self.lock:
+            # Guardado na chave do pedido: o snapshot tem essa versão ou uma mais nova
+            state = processor.assemble_state(analysis)
+            processor.cache.put('analysis', key, analysis)
+            processor.cache.put('state', key, state)
+            return state
+
+    def zoom_spectra(self, params) -> Optional[Dict]:
+        """Zoom pedido via HTTP ou WebSocket (center/span em Hz, axis opcional)"""
+        center = float(params.get('center'))
+        span = float(params.get('span', 10.0))
+        axis = params.get('axis') or None
+        if axis is not None and axis not in ('x', 'y', 'z'):
+            raise ValueError(f"Eixo inválido: {axis}")
+        with self.lock:
+            return self.processor.zoom_spectra(center, span, axis)
+
+    # ---------- Espectrograma ----------
+
+    def subscribe_waterfall(self, sid: str, enabled: bool = True):
+        """Inscreve (ou remove) o cliente no envio incremental de 'waterfall_row'"""
+        if self.processor.waterfall is None:
+            raise ValueError("Espectrograma desativado (WATERFALL_CONFIG)")
+        if enabled:
+            self.waterfall_clients.add(sid)
+            self.socketio.server.enter_room(sid, self.waterfall_room, namespace='/')
+        elif sid in self.waterfall_clients:
+            self.waterfall_clients.discard(sid)
+            self.socketio.server.leave_room(sid, self.waterfall_room, namespace='/')
+
+    def push_waterfall(self, count: int):
+        """Envia só as linhas novas (normalmente uma) aos clientes inscritos"""
+        if not self.waterfall_clients:
+            return
+        latest = self.processor.waterfall.latest(count)
+        if latest is None:
+            return
+        rows = latest['rows']
+        self.socketio.emit('waterfall_row', {
+            'device_id': self.device_id,
+            'first_row': latest['first_row'],
+            'rows': len(rows),
+            'channels': [f"{sensor}.{axis}" for sensor, axis in CHANNELS],
+            'bins': int(rows.shape[2]),
+            'timestamps': latest['timestamps'].tolist(),
+            'times': latest['times'].tolist(),
+            'data': rows.tobytes()  # uint8 (linhas, canais, bins)
+        }, to=self.waterfall_room)
+
+    def waterfall_info(self, params) -> Dict:
+        """Parâmetros e faixa do histórico; com 'time' (epoch s), a linha correspondente"""
+        waterfall = self.processor.waterfall
+        if waterfall is None:
+            raise ValueError("Espectrograma desativado (WATERFALL_CONFIG)")
+        info = waterfall.get_info()
+        info['channels'] = [f"{sensor}.{axis}" for sensor, axis in CHANNELS]
+        if params.get('time') is not None:
+            info['row'] = waterfall.row_at(float(params.get('time')))
+        return info
+
+    def waterfall_tile(self, params) -> Tuple[bytes, Dict]:
+        """Tile pedido via HTTP: channel, tz/t (tempo) e fz/f (frequência)"""
+        waterfall = self.processor.waterfall
+        if waterfall is None:
+            raise ValueError("Espectrograma desativado (WATERFALL_CONFIG)")
+        channel = params.get('channel', f"m1.{self.processor.config.main_axis}")
+        return waterfall.tile(parse_channel(channel),
+                              int(params.get('tz', 0)), int(params.get('t', 0)),
+                              int(params.get('fz', 0)), int(params.get('f', 0)))
+
+    def get_config(self) -> Dict:
+        return {key: getattr(self.processor.config, key) for key in PROCESSOR_CONFIG_KEYS}
+
+    def apply_config(self, config: Dict):
+        """Atualiza a configuração; a análise em cache é invalidada só no que mudou"""
+        with self.lock:
+            self.processor.update_config(**{key: config[key] for key in PROCESSOR_CONFIG_KEYS
+                                            if key in config})
+
+    def clear_data(self):
+        with self.lock:
+            self.processor.clear_data()
+
+    # ---------- Clientes ----------
+
+    def add_client(self, sid: str):
+        self.clients.add(sid)
+        self.emitter.add_client(sid)
+
+    def remove_client(self, sid: str):
+        self.clients.discard(sid)
+        self.emitter.remove_client(sid)
+        if sid in self.waterfall_clients:
+            self.subscribe_waterfall(sid, False)
+
+    def mark_pending(self, received_at: float):
+        """Registra a chegada da amostra mais antiga ainda não emitida"""
+        if self.oldest_pending_at is None:
+            self.oldest_pending_at = received_at
+
+    def record_emit_latency(self):
+        """Latência do pior caso: amostra mais antiga incluída na emissão"""
+        if self.oldest_pending_at is not None:
+            self.latency.record(time.monotonic() - self.oldest_pending_at)
+            self.oldest_pending_at = None
+
+    # ---------- Gravação ----------
+
+    def start_test(self) -> str:
+        session_dir = self.recorder.start(metadata={
+            'device_id': self.device_id,
+            'device_name': self.name,
+            'motor_frequency': self.processor.config.motor_frequency,
+            'main_axis': self.processor.config.main_axis,
+            'noise_threshold': self.processor.config.noise_threshold
+        })
+        self.test_recording = True
+        return session_dir
+
+    def stop_test(self) -> Optional[Dict]:
+        self.test_recording = False
+        return self.recorder.stop()
+
+    def sample_metrics(self):
+        """
+        Métricas atuais (no máximo a cada 0,2 s) para o gravador de testes,
+        se gravando, e para o histórico de tendências
+        """
+        if not self.test_recording and self.trends is None:
+            return
+
+        current_time = time.time()
+
+        # Salvar no máximo a cada 0,2 s (5 Hz)
+        if current_time - self.last_metrics_time < 0.2:
+            return
+        self.last_metrics_time = current_time
+
+        if self.order_trends is not None:
+            with self.lock:
+                tracker = self.processor.orders
+                values = (tracker.trend_values(self.trend_orders)
+                          if tracker is not None and tracker.settled else None)
+            if values is not None:
+                self.order_trends.add(current_time, values)
+
+        update = self.current_state()
+        if not update:
+            return
+
+        if self.test_recording:
+            # Linha de métricas na ordem de METRIC_FIELDS (gravada em disco)
+            self.recorder.write_metrics(
+                current_time,
+                int((current_time - self.start_time) * 1000),  # elapsed_ms
+                [
+                    update['peaks']['m1']['frequency'],
+                    update['peaks']['m1']['amplitude'],
+                    update['imbalance'],
+                    update['rms']['m1']['x'],
+                    update['rms']['m1']['y'],
+                    update['rms']['m1']['z'],
+                    update['rms']['m2']['x'],
+                    update['rms']['m2']['y'],
+                    update['rms']['m2']['z'],
+                    update['buffer_status'],
+                    update['current_noise']
+                ]
+            )
+
+        if self.trends is not None:
+            self.trends.add(current_time, sample_metric_values(update))
+
+    def query_trends(self, params) -> Dict:
+        """Consulta de /api/trends: metric (lista separada por vírgulas), from, to, resolution"""
+        if self.trends is None:
+            raise ValueError("Histórico de tendências desativado (TRENDS_CONFIG)")
+        metrics = [m for m in (params.get('metric') or ','.join(self.trends.metrics)).split(',') if m]
+        # Ordens (order<k>_<sensor>_<eixo>) ficam em um histórico próprio
+        store = self.trends
+        if self.order_trends is not None:
+            orders = [metric in self.order_trends.metrics for metric in metrics]
+            if any(orders) and not all(orders):
+                raise ValueError("Consulte as ordens (order<k>_...) separadas das demais métricas")
+            if metrics and all(orders):
+                store = self.order_trends
+        end = float(params.get('to') or time.time())
+        start = float(params.get('from') or end - 3600)
+        resolution = params.get('resolution')
+        tiers = dict(TREND_TIERS)
+        if resolution in tiers:
+            resolution = tiers[resolution]
+        elif resolution is not None:
+            resolution = float(resolution)
+        return store.query(metrics, start, end, resolution,
+                           max_points=int(params.get('max_points', TRENDS_CONFIG['max_points'])))
+
+    # ---------- Resumo ----------
+
+    def get_status(self) -> Dict:
+        buffer_info = self.processor.get_buffer_info()
+        return {
+            'device_id': self.device_id,
+            'name': self.name,
+            'connected': self.is_connected(),
+            'serial_format': self.reader.data_format,
+            'source': self.source_name(),
+            'running': self.running,
+            'test_recording': self.test_recording,
+            'recorder': self.recorder.get_status(),
+            'clients': len(self.clients),
+            'buffer': buffer_info['buffer_usage'],
+            'total_samples': buffer_info['total_samples'],
+            'collection_time': buffer_info['collection_time'],
+            'latency': self.latency.summary(),
+            'emission': self.emitter.get_stats(),
+            'analysis_mode': 'thread' if self.analysis_pool is None else 'process',
+            'analysis': self.get_analysis_status(),
+            'ingest': self.reader.data_queue.get_stats(),
+            'trends': self.trends.get_status() if self.trends is not None else None,
+            'order_trends': (self.order_trends.get_status()
+                             if self.order_trends is not None else None),
+            'waterfall': (self.processor.waterfall.get_info()
+                          if self.processor.waterfall is not None else None),
+            'data_gap': self.processor.get_gap_info(),
+            'timing': buffer_info['timing'],
+            'config': self.get_config()
+        }
+
+    def get_analysis_status(self) -> Dict:
+        """Picos da última análise em cache (sem recalcular) e acertos do cache"""
+        with self.lock:
+            processor = self.processor
+            state = processor.cache.latest('state')
+            return {
+                'version': processor.version,
+                'spectral_generation': processor.spectral_generation,
+                'config_generation': processor.config_generation,
+                'peaks': state['peaks'] if state else None,
+                'imbalance': state['imbalance'] if state else None,
+                'cache': processor.cache.get_stats()
+            }
+
+    def summary(self) -> Dict:
+        """Resumo curto para a lista de dispositivos do painel"""
+        return {
+            'device_id': self.device_id,
+            'name': self.name,
+            'connected': self.is_connected(),
+            'source': self.source_name(),
+            'test_recording': self.test_recording,
+            'clients': len(self.clients),
+            'total_samples': self.processor.get_buffer_info()['total_samples'],
+            'samples_per_s': self.ingest_rate.rate() if METRICS.enabled else None
+        }
+
+    def close(self):
+        self.disconnect()
+        self.emitter.stop()
+        if self.test_recording:
+            self.stop_test()
+        if self.trends is not None:
+            self.trends.close()
+        if self.order_trends is not None:
+            self.order_trends.close()
+        if self.analysis_pool is not None:
+            self.analysis_pool.release(self.device_id)
+            self.processor.data_buffer.close()
+
+
+class DeviceRegistry:
+    """
+    Dispositivos do servidor e o pool de threads compartilhado entre eles.
+    O dispositivo DEFAULT_DEVICE_ID existe sempre e atende as rotas antigas
+    (/api/connect, /api/status...); os demais usam /api/devices/<id>/...
+    """
+
+    def __init__(self, socketio, tests_dir: str, workers: int = 4, max_devices: int = 16,
+                 default_id: str = 'default', default_name: str = 'Bancada 1',
+                 analysis_pool: Optional[ProcessAnalysisPool] = None,
+                 trends_dir: Optional[str] = None):
+        self.socketio = socketio
+        self.analysis_pool = analysis_pool
+        self.tests_dir = tests_dir
+        self.trends_dir = trends_dir  # Tendências em trends_dir/<id> (None: desativadas)
+        self.max_devices = max_devices
+        self.default_id = default_id
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers),
+                                       thread_name_prefix='device-worker')
+        self.devices: Dict[str, DevicePipeline] = {}
+        self.sids: Dict[str, str] = {}  # sid → dispositivo selecionado
+        self.pending = 0                # Tarefas enviadas ao pool e não concluídas
+        self.lock = threading.Lock()
+        self.add(default_id, default_name)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.devices.values()))
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    @property
+    def default(self) -> DevicePipeline:
+        return self.devices[self.default_id]
+
+    def get(self, device_id: Optional[str]) -> Optional[DevicePipeline]:
+        return self.devices.get(device_id or self.default_id)
+
+    def add(self, device_id: str, name: str = None) -> DevicePipeline:
+        """Cria um dispositivo (gravações em tests_dir/<id>, exceto o padrão)"""
+        if not DEVICE_ID_PATTERN.match(device_id or ''):
+            raise ValueError(f"Identificador inválido: {device_id!r} (use letras, números, _ ou -)")
+        with self.lock:
+            if device_id in self.devices:
+                raise ValueError(f"Dispositivo já existe: {device_id}")
+            if len(self.devices) >= self.max_devices:
+                raise ValueError(f"Limite de {self.max_devices} dispositivos atingido")
+            tests_dir = (self.tests_dir if device_id == self.default_id
+                         else os.path.join(self.tests_dir, device_id))
+            os.makedirs(tests_dir, exist_ok=True)
+            device = DevicePipeline(device_id, name or device_id, self, tests_dir)
+            self.devices[device_id] = device
+        logger.info(f"Dispositivo registrado: {device_id} ({device.name})")
+        return device
+
+    def remove(self, device_id: str):
+        if device_id == self.default_id:
+            raise ValueError("O dispositivo padrão não pode ser removido")
+        with self.lock:
+            device = self.devices.pop(device_id, None)
+            if device is None:
+                raise ValueError(f"Dispositivo não encontrado: {device_id}")
+            moved = [sid for sid, selected in self.sids.items() if selected == device_id]
+        device.close()
+        for sid in moved:
+            fallback = self.select(sid, self.default_id)
+            self.socketio.emit('device_selected', {'success': True, 'device_id': fallback.device_id,
+                                                   'name': fallback.name}, to=sid)
+        logger.info(f"Dispositivo removido: {device_id}")
+
+    # ---------- Clientes e salas ----------
+
+    def select(self, sid: str, device_id: str) -> DevicePipeline:
+        """Move o cliente para o dispositivo (sala Socket.IO e agendador de emissão)"""
+        device = self.devices.get(device_id)
+        if device is None:
+            raise ValueError(f"Dispositivo não encontrado: {device_id}")
+        previous = self.devices.get(self.sids.get(sid))
+        if previous is not None and previous is not device:
+            previous.remove_client(sid)
+            self.socketio.server.leave_room(sid, previous.room, namespace='/')
+        self.sids[sid] = device_id
+        device.add_client(sid)
+        self.socketio.server.enter_room(sid, device.room, namespace='/')
+        return device
+
+    def release(self, sid: str):
+        device = self.devices.get(self.sids.pop(sid, None))
+        if device is not None:
+            device.remove_client(sid)
+
+    def device_for(self, sid: str) -> DevicePipeline:
+        return self.devices.get(self.sids.get(sid)) or self.default
+
+    # ---------- Pool ----------
+
+    def submit(self, func, *args) -> Future:
+        with self.lock:
+            self.pending += 1
+        future = self.pool.submit(func, *args)
+        future.add_done_callback(self._task_done)
+        return future
+
+    def _task_done(self, future: Future):
+        with self.lock:
+            self.pending -= 1
+
+    def run(self, func, *args):
+        """Executa no pool e espera o resultado (limita análises simultâneas)"""
+        return self.submit(func, *args).result()
+
+    def list(self) -> List[Dict]:
+        return [device.summary() for device in self]
+
+    def shutdown(self):
+        for device in self:
+            device.close()
+        self.pool.shutdown(wait=False)
+        if self.analysis_pool is not None:
+            self.analysis_pool.shutdown()
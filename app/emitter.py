@@ -0,0 +1,262 @@
+"""
+AGENDADOR DE EMISSÃO WEBSOCKET (TAXA POR CLIENTE)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from app.payload import encode_payload, PAYLOAD_MODES, BINARY_ENCODINGS
+from app.metrics import METRICS, RateMeter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClientState:
+    """Estado de emissão de um cliente Socket.IO"""
+    sid: str
+    interval: float                 # Intervalo alvo entre atualizações (s)
+    next_due: float = 0.0
+    awaiting_ack: bool = False      # Última atualização ainda não confirmada
+    last_sent_at: float = 0.0
+    last_version: int = -1
+    sent: int = 0
+    coalesced: int = 0              # Ticks pulados por ACK pendente
+    mode: str = 'json'              # 'json' ou 'binary'
+    encoding: str = 'float32'       # Codificação dos anexos binários
+    display_points: int = 0         # Pontos do gráfico FFT (0 = sem decimação)
+    max_freq: float = 0.0           # Faixa exibida (0 = fft_range do sistema)
+
+
+class EmissionScheduler:
+    """
+    Envia 'data_update' a cada cliente na taxa que ele pediu.
+
+    A análise é calculada no máximo uma vez por tick e compartilhada entre
+    todos os clientes devidos; a serialização (JSON ou binária) também é
+    feita uma vez por formato. Um cliente só recebe nova atualização depois
+    de confirmar (ACK) a anterior, então clientes lentos recebem apenas o
+    estado mais recente em vez de acumular fila.
+    """
+
+    ACK_TIMEOUT = 2.0  # s sem ACK: considerar perdido e voltar a enviar
+    MAX_DISPLAY_POINTS = 8192
+
+    def __init__(self, socketio, build_update: Callable[[], Optional[Dict]],
+                 get_version: Callable[[], int], default_fps: float = 10.0,
+                 max_fps: float = 30.0, event: str = 'data_update'):
+        self.socketio = socketio
+        self.build_update = build_update
+        self.get_version = get_version
+        self.default_fps = default_fps
+        self.max_fps = max_fps
+        self.event = event
+        self.on_emit: Optional[Callable[[], None]] = None
+
+        self.clients: Dict[str, ClientState] = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+        self.cached_version = -1
+        self.cached_update: Optional[Dict] = None
+        self.encoded: Dict[Tuple, Dict] = {}
+        self.builds = 0
+
+        # Métricas: taxa de envios e desde quando existe versão nova
+        self.emit_rate = RateMeter()
+        self.seen_version = -1
+        self.version_seen_at = time.monotonic()
+
+    def _interval(self, fps: Optional[float]) -> float:
+        fps = self.default_fps if not fps else min(max(float(fps), 0.5), self.max_fps)
+        return 1.0 / fps
+
+    def add_client(self, sid: str, fps: float = None):
+        with self.lock:
+            self.clients[sid] = ClientState(sid=sid, interval=self._interval(fps))
+        self.wakeup.set()
+
+    def remove_client(self, sid: str):
+        with self.lock:
+            self.clients.pop(sid, None)
+
+    def set_rate(self, sid: str, fps: float) -> float:
+        """Altera a taxa alvo do cliente; retorna a taxa efetiva (Hz)"""
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                client = self.clients[sid] = ClientState(sid=sid, interval=self._interval(fps))
+            client.interval = self._interval(fps)
+            client.next_due = 0.0
+        self.wakeup.set()
+        return 1.0 / client.interval
+    
+    def set_payload_mode(self, sid: str, mode: str, encoding: str = 'float32'):
+        """Define o formato do payload do cliente ('json' ou 'binary')"""
+        if mode not in PAYLOAD_MODES:
+            raise ValueError(f"Modo de payload desconhecido: {mode}")
+        if encoding not in BINARY_ENCODINGS:
+            raise ValueError(f"Codificação desconhecida: {encoding}")
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                client = self.clients[sid] = ClientState(sid=sid, interval=self._interval(None))
+            client.mode = mode
+            client.encoding = encoding
+            client.last_version = -1  # Reenviar no novo formato
+        self.wakeup.set()
+
+    def set_display(self, sid: str, points: int = 0, max_freq: float = 0.0) -> Dict:
+        """Define a largura do gráfico (pontos) e a faixa de frequência do cliente"""
+        points = max(0, min(int(points or 0), self.MAX_DISPLAY_POINTS))
+        max_freq = max(0.0, float(max_freq or 0.0))
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                client = self.clients[sid] = ClientState(sid=sid, interval=self._interval(None))
+            client.display_points = points
+            client.max_freq = max_freq
+            client.last_version = -1  # Reenviar com a nova forma
+        self.wakeup.set()
+        return {'points': points, 'max_freq': max_freq}
+
+    def notify(self):
+        """Sinaliza que há dados novos (chamado pela thread de processamento)"""
+        self.wakeup.set()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        logger.info("Agendador de emissão iniciado")
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def _loop(self):
+        while self.running:
+            self.wakeup.clear()
+            try:
+                timeout = self.tick()
+            except Exception as e:
+                logger.error(f"Erro na emissão: {e}")
+                timeout = 1.0
+            self.wakeup.wait(timeout)
+
+    def tick(self) -> float:
+        """Emite para os clientes devidos; retorna quanto esperar até o próximo"""
+        now = time.monotonic()
+        version = self.get_version()
+        if version != self.seen_version:
+            self.seen_version = version
+            self.version_seen_at = now
+
+        with self.lock:
+            clients = list(self.clients.values())
+
+        due = []
+        for client in clients:
+            if client.awaiting_ack and now - client.last_sent_at > self.ACK_TIMEOUT:
+                client.awaiting_ack = False
+            if client.next_due > now:
+                continue
+            if client.awaiting_ack:
+                client.coalesced += 1
+                METRICS.inc('emit_coalesced')
+                continue
+            if client.last_version == version:
+                continue  # Nada novo para este cliente
+            due.append(client)
+
+        if due:
+            # Uma análise por tick, compartilhada entre os clientes
+            if version != self.cached_version:
+                with METRICS.time('build_state'):
+                    self.cached_update = self.build_update()
+                self.cached_version = version
+                self.encoded = {}
+                self.builds += 1
+
+            if self.cached_update is not None:
+                for client in due:
+                    self._send(client, version, now)
+                if self.on_emit is not None:
+                    self.on_emit()
+
+        # Próximo prazo entre clientes que podem receber
+        waits = [c.next_due - now for c in clients if not c.awaiting_ack and c.next_due > now]
+        return max(0.001, min(waits)) if waits else 1.0
+
+    def _send(self, client: ClientState, version: int, now: float):
+        sid = client.sid
+
+        def ack(*args):
+            client.awaiting_ack = False
+            self.wakeup.set()
+
+        client.awaiting_ack = True
+        client.last_sent_at = now
+        client.last_version = version
+        client.next_due = now + client.interval
+        client.sent += 1
+        payload = self._encoded(client)
+        with METRICS.time('emit'):
+            self.socketio.emit(self.event, payload, to=sid, callback=ack)
+        if METRICS.enabled:
+            METRICS.inc('emits', mode=client.mode)
+            self.emit_rate.add()
+    
+    def _encoded(self, client: ClientState) -> Dict:
+        """Payload serializado uma vez por formato, forma de exibição e versão"""
+        mode = client.mode
+        encoding = client.encoding if mode == 'binary' else ''
+        key = (mode, encoding, client.display_points, client.max_freq)
+        payload = self.encoded.get(key)
+        if payload is None:
+            with METRICS.time('encode'):
+                payload = self.encoded[key] = encode_payload(
+                    self.cached_update, mode, encoding or 'float32',
+                    max_freq=client.max_freq or None, points=client.display_points or None
+                )
+        return payload
+
+    def client_lag(self) -> Dict[str, float]:
+        """
+        Atraso (s) de cada cliente: há quanto tempo existe uma versão dos
+        dados que ele ainda não recebeu (0 = está em dia).
+        """
+        now = time.monotonic()
+        version = self.get_version()
+        with self.lock:
+            clients = list(self.clients.values())
+        since = self.version_seen_at if version == self.seen_version else now
+        return {
+            c.sid: (0.0 if c.last_version == version else now - since)
+            for c in clients
+        }
+
+    def get_stats(self) -> Dict:
+        """Resumo por cliente (taxa alvo, enviados, coalescidos)"""
+        with self.lock:
+            return {
+                'builds': self.builds,
+                'clients': {
+                    sid: {
+                        'fps': 1.0 / c.interval,
+                        'mode': c.mode,
+                        'display_points': c.display_points,
+                        'sent': c.sent,
+                        'coalesced': c.coalesced,
+                        'awaiting_ack': c.awaiting_ack
+                    }
+                    for sid, c in self.clients.items()
+                }
+            }
@@ -0,0 +1,278 @@
+"""
+FILA DE INGESTÃO LIMITADA (POLÍTICAS DE SOBRECARGA E MARCADORES DE LACUNA)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+from app.protocol import SampleBlock
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'decimate')
+
+
+@dataclass
+class IngestGap:
+    """
+    Marcador de descontinuidade na fila: `samples` amostras foram descartadas
+    antes do próximo item. Timestamps (ms do ESP32) do trecho perdido quando
+    conhecidos (blocos); linhas CSV avulsas não os informam.
+    """
+    samples: int
+    reason: str
+    start_timestamp: Optional[int] = None
+    end_timestamp: Optional[int] = None
+
+    def merge(self, samples: int, reason: str, start: Optional[int], end: Optional[int]):
+        self.samples += samples
+        if reason != self.reason:
+            self.reason = 'mixed'
+        if start is not None:
+            self.start_timestamp = start if self.start_timestamp is None else min(self.start_timestamp, start)
+        if end is not None:
+            self.end_timestamp = end if self.end_timestamp is None else max(self.end_timestamp, end)
+
+
+Item = Union[str, SampleBlock, IngestGap]
+
+
+def item_samples(item: Item) -> int:
+    """Amostras que um item ocupa na fila (marcadores não contam)"""
+    if isinstance(item, SampleBlock):
+        return len(item)
+    if isinstance(item, IngestGap):
+        return 0
+    return 1
+
+
+def _timestamp_range(item: Item):
+    if isinstance(item, SampleBlock) and len(item):
+        return int(item.timestamps[0]), int(item.timestamps[-1])
+    return None, None
+
+
+class IngestQueue:
+    """
+    Fila entre a thread do leitor e o processamento, limitada em amostras
+    (não em itens: um bloco binário pode ter centenas de amostras).
+
+    Cheia, aplica a política configurada:
+      drop_oldest: descarta os itens mais antigos (mantém o dado mais novo);
+      drop_newest: recusa o item que chega;
+      decimate:    durante a sobrecarga guarda 1 a cada `decimate_factor`
+                   amostras de cada bloco; se ainda assim encher, drop_oldest.
+    Um bloco maior que a capacidade é cortado antes, em qualquer política,
+    para as suas `max_samples` amostras mais novas.
+    Toda perda vira um IngestGap na posição da descontinuidade, entregue ao
+    consumidor junto com os dados. A sobrecarga começa ao atingir
+    `high_watermark` (fração da capacidade) ou ao descartar e termina quando
+    a fila esvazia até `low_watermark`.
+
+    Mesma interface usada de queue.Queue (put, get, get_nowait, empty, qsize).
+    """
+
+    def __init__(self, max_samples: int = 8192, policy: str = 'drop_oldest',
+                 decimate_factor: int = 2, high_watermark: float = 0.75,
+                 low_watermark: float = 0.25):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de sobrecarga desconhecida: {policy}")
+        self.max_samples = max(1, int(max_samples))
+        self.policy = policy
+        self.decimate_factor = max(2, int(decimate_factor))
+        self.high_samples = int(self.max_samples * high_watermark)
+        self.low_samples = int(self.max_samples * low_watermark)
+
+        self.items = deque()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.pending_gap: Optional[IngestGap] = None  # Perda a sinalizar antes do próximo item
+
+        self.dropped_samples: Dict[str, int] = {}  # Por motivo
+        self.gaps = 0  # Marcadores entregues ao consumidor
+        self.overloaded = False
+        self.overload_events = 0
+        self.overload_started = 0.0
+        self.overload_seconds = 0.0
+        self.max_depth = 0
+
+    # ---------- Produtor ----------
+
+    def put(self, item: Item) -> bool:
+        """Enfileira um item; False se foi descartado (drop_newest)"""
+        n = item_samples(item)
+        with self.lock:
+            if (self.policy == 'decimate' and self.overloaded
+                    and isinstance(item, SampleBlock) and n > 1):
+                item, n = self._decimate(item, n)
+            if n > self.max_samples:
+                # Bloco maior que a fila inteira: só as amostras mais novas cabem
+                item, n = self._trim(item, n)
+
+            if self.samples + n > self.max_samples:
+                self._set_overloaded(True)
+                if self.policy == 'drop_newest':
+                    start, end = _timestamp_range(item)
+                    self._record_gap_pending(n, 'drop_newest', start, end)
+                    return False
+                self._drop_oldest(n)
+
+            if self.pending_gap is not None:
+                self.items.append(self.pending_gap)
+                self.pending_gap = None
+            self.items.append(item)
+            self.samples += n
+            self.max_depth = max(self.max_depth, self.samples)
+            if self.samples >= self.high_samples:
+                self._set_overloaded(True)
+            self.not_empty.notify()
+            return True
+
+    def _decimate(self, block: SampleBlock, n: int):
+        """Mantém 1 a cada decimate_factor amostras; o restante vira lacuna"""
+        step = self.decimate_factor
+        kept = SampleBlock(block.timestamps[::step], block.values[:, ::step],
+                           None if block.sequence is None else block.sequence[::step],
+                           block.received_at)
+        lost = n - len(kept)
+        start, end = _timestamp_range(block)
+        self._record_gap_pending(lost, 'decimate', start, end)
+        return kept, len(kept)
+
+    def _trim(self, block: SampleBlock, n: int):
+        """Mantém as últimas max_samples amostras; o início cortado vira lacuna"""
+        cut = n - self.max_samples
+        kept = SampleBlock(block.timestamps[cut:], block.values[:, cut:],
+                           None if block.sequence is None else block.sequence[cut:],
+                           block.received_at)
+        self._record_gap_pending(cut, 'oversized', int(block.timestamps[0]),
+                                 int(block.timestamps[cut - 1]))
+        return kept, len(kept)
+
+    def _drop_oldest(self, incoming: int):
+        """Remove itens antigos até caber `incoming` amostras; lacuna no início da fila"""
+        gap = None
+        while self.items and self.samples + incoming > self.max_samples:
+            old = self.items.popleft()
+            if isinstance(old, IngestGap):
+                lost, reason, start, end = (old.samples, old.reason,
+                                            old.start_timestamp, old.end_timestamp)
+            else:
+                lost = item_samples(old)
+                reason = 'drop_oldest'
+                start, end = _timestamp_range(old)
+                self.samples -= lost
+                self._count_drop(reason, lost)
+            if gap is None:
+                gap = IngestGap(lost, reason, start, end)
+            else:
+                gap.merge(lost, reason, start, end)
+        if gap is None:
+            return
+        # Lacuna entre o que já foi consumido e o que restou na fila
+        if self.items and isinstance(self.items[0], IngestGap):
+            head = self.items[0]
+            head.merge(gap.samples, gap.reason, gap.start_timestamp, gap.end_timestamp)
+        elif self.items:
+            self.items.appendleft(gap)
+        elif self.pending_gap is not None:
+            self.pending_gap.merge(gap.samples, gap.reason, gap.start_timestamp, gap.end_timestamp)
+        else:
+            self.pending_gap = gap
+
+    def _record_gap_pending(self, samples: int, reason: str,
+                            start: Optional[int], end: Optional[int]):
+        self._count_drop(reason, samples)
+        if self.pending_gap is None:
+            self.pending_gap = IngestGap(samples, reason, start, end)
+        else:
+            self.pending_gap.merge(samples, reason, start, end)
+
+    def _count_drop(self, reason: str, samples: int):
+        if samples <= 0:
+            return
+        self.dropped_samples[reason] = self.dropped_samples.get(reason, 0) + samples
+
+    def _set_overloaded(self, overloaded: bool):
+        if overloaded == self.overloaded:
+            return
+        now = time.monotonic()
+        self.overloaded = overloaded
+        if overloaded:
+            self.overload_events += 1
+            self.overload_started = now
+            logger.warning(f"Fila de ingestão em sobrecarga ({self.samples}/{self.max_samples} "
+                           f"amostras, política {self.policy})")
+        else:
+            duration = now - self.overload_started
+            self.overload_seconds += duration
+            logger.warning(f"Fim da sobrecarga da ingestão após {duration:.2f} s "
+                           f"({self.total_dropped()} amostras descartadas no total)")
+
+    # ---------- Consumidor ----------
+
+    def _pop(self) -> Item:
+        item = self.items.popleft()
+        self.samples -= item_samples(item)
+        if isinstance(item, IngestGap):
+            self.gaps += 1
+        if self.overloaded and self.samples <= self.low_samples:
+            self._set_overloaded(False)
+        return item
+
+    def get(self, block: bool = True, timeout: float = None) -> Item:
+        with self.not_empty:
+            if not block:
+                if not self.items:
+                    raise queue.Empty
+            elif not self.not_empty.wait_for(lambda: self.items, timeout):
+                raise queue.Empty
+            return self._pop()
+
+    def get_nowait(self) -> Item:
+        return self.get(block=False)
+
+    def empty(self) -> bool:
+        return not self.items
+
+    def qsize(self) -> int:
+        return len(self.items)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.samples = 0
+            self.pending_gap = None
+            self._set_overloaded(False)
+
+    # ---------- Estado ----------
+
+    def total_dropped(self) -> int:
+        return sum(self.dropped_samples.values())
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            overload_seconds = self.overload_seconds
+            if self.overloaded:
+                overload_seconds += time.monotonic() - self.overload_started
+            return {
+                'policy': self.policy,
+                'max_samples': self.max_samples,
+                'samples': self.samples,
+                'items': len(self.items),
+                'max_depth': self.max_depth,
+                'overloaded': self.overloaded,
+                'overload_events': self.overload_events,
+                'overload_seconds': overload_seconds,
+                'dropped_samples': self.total_dropped(),
+                'dropped_by_reason': dict(self.dropped_samples),
+                'gaps': self.gaps
+            }
@@ -8,7 +8,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, render_template, jsonify, request, send_from_directory, Response
 from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 import threading
@@ -16,10 +16,16 @@ import time
 import json
 import logging
 from datetime import datetime
+from typing import Dict, List, Optional
 
 from app.config import *
-from app.serial_reader import SerialReader
-from app.data_processor import DataProcessor, SystemConfig
+from app.protocol import FORMAT_COMMANDS
+from app.metrics import METRICS
+from app.devices import DeviceRegistry, DevicePipeline
+from app.analysis_pool import ProcessAnalysisPool
+from app.recorder import export_metrics_csv, export_samples_csv
+from app.recording import RecordingReader, list_recordings, channel_selector
+from app.spectral import shape_spectrum
 
 # Configurar logging
 logging.basicConfig(
@@ -28,6 +34,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class DeviceNotFound(LookupError):
+    """Rota /api/devices/<id>/... com dispositivo inexistente"""
+
+
 class VibrationSystemServer:
     """Servidor principal do sistema"""
     
@@ -43,191 +54,392 @@ class VibrationSystemServer:
                                 cors_allowed_origins="*",
                                 async_mode='threading')
         
-        # Componentes do sistema
-        self.serial = SerialReader(baudrate=SERIAL_BAUD, timeout=SERIAL_TIMEOUT)
-        self.processor = DataProcessor(SystemConfig(
-            sample_rate=SAMPLE_RATE,
-            fft_size=FFT_SIZE,  # Agora 2048
-            buffer_size=BUFFER_SIZE,  # Agora 4096
-            motor_frequency=DEFAULT_CONFIG['motor_frequency'],
-            noise_threshold=DEFAULT_CONFIG['noise_threshold'],
-            fft_range=DEFAULT_CONFIG['fft_range']
-        ))
+        # Instrumentação por etapa (desligada por padrão)
+        METRICS.enabled = METRICS_CONFIG['enabled']
+        METRICS.prefix = METRICS_CONFIG['prefix']
+        
+        # Bancadas: cada uma com leitor, processador, gravador e emissão próprios;
+        # ingestão e análise de todas rodam no mesmo pool de threads
+        self.devices = DeviceRegistry(
+            self.socketio,
+            tests_dir=TESTS_DIR,
+            trends_dir=TRENDS_DIR,
+            workers=DEVICE_CONFIG['workers'],
+            max_devices=DEVICE_CONFIG['max_devices'],
+            default_id=DEVICE_CONFIG['default_id'],
+            default_name=DEVICE_CONFIG['default_name'],
+            analysis_pool=(ProcessAnalysisPool(ANALYSIS_CONFIG['processes'],
+                                               timeout=ANALYSIS_CONFIG['timeout'])
+                           if ANALYSIS_CONFIG['mode'] == 'process' else None)
+        )
         
         # Estado do sistema
-        self.running = False
-        self.test_recording = False
-        self.test_data = []
         self.clients_connected = 0
         self.system_start_time = time.time()
-        self.last_test_save_time = 0.0
         
-        # Configurar rotas e eventos
+        # Configurar rotas, eventos e métricas
         self.setup_routes()
         self.setup_socketio_events()
-        
-        # Iniciar thread de processamento
-        self.start_processing_thread()
+        self.setup_metrics()
         
         logger.info(f"Servidor inicializado com FFT_SIZE={FFT_SIZE}, BUFFER_SIZE={BUFFER_SIZE}")
         logger.info(f"Sistema desenvolvido por: Marlon Biagi Parangaba")
         logger.info(f"Email: eng.parangaba@gmail.com")
     
+    @property
+    def device(self) -> DevicePipeline:
+        """Dispositivo padrão (rotas sem /devices/<id>)"""
+        return self.devices.default
+    
+    def get_device(self, device_id: Optional[str]) -> DevicePipeline:
+        device = self.devices.get(device_id)
+        if device is None:
+            raise DeviceNotFound(device_id)
+        return device
+    
+    def device_config(self, device: DevicePipeline) -> Dict:
+        """Configuração exibida ao cliente: global + parâmetros do dispositivo"""
+        return {**DEFAULT_CONFIG, **device.get_config(), 'device_id': device.device_id}
+    
     def setup_routes(self):
-        """Configurar rotas HTTP"""
+        """Configurar rotas HTTP (as rotas de bancada também existem em /api/devices/<id>/...)"""
+        
+        @self.app.errorhandler(DeviceNotFound)
+        def device_not_found(error):
+            return jsonify({'success': False, 'error': f'Dispositivo não encontrado: {error}'}), 404
         
         @self.app.route('/')
         def index():
             """Página principal"""
             return render_template('index.html')
         
+        @self.app.route('/api/devices', methods=['GET', 'POST'])
+        def api_devices():
+            """Lista as bancadas ou registra uma nova ({id, name})"""
+            if request.method == 'GET':
+                return jsonify({'success': True, 'default': self.devices.default_id,
+                                'devices': self.devices.list()})
+            data = request.get_json(silent=True) or {}
+            try:
+                device = self.devices.add(str(data.get('id', '')), data.get('name'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)})
+            self.socketio.emit('devices_update', {'devices': self.devices.list()})
+            return jsonify({'success': True, 'device': device.summary()})
+        
+        @self.app.route('/api/devices/<device_id>', methods=['DELETE'])
+        def api_remove_device(device_id):
+            """Desconecta e remove uma bancada"""
+            self.get_device(device_id)
+            try:
+                self.devices.remove(device_id)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)})
+            self.socketio.emit('devices_update', {'devices': self.devices.list()})
+            return jsonify({'success': True})
+        
         @self.app.route('/api/status')
-        def api_status():
-            """Status do sistema"""
-            buffer_info = self.processor.get_buffer_info()
-            status = {
-                'connected': self.serial.is_connected(),
-                'running': self.running,
-                'test_recording': self.test_recording,
-                'clients': self.clients_connected,
-                'buffer': buffer_info['buffer_usage'],
-                'total_samples': buffer_info['total_samples'],
-                'collection_time': buffer_info['collection_time'],
+        @self.app.route('/api/devices/<device_id>/status')
+        def api_status(device_id=None):
+            """Status do sistema (dispositivo padrão ou o indicado)"""
+            device = self.get_device(device_id)
+            status = device.get_status()
+            status.update({
                 'system_uptime': time.time() - self.system_start_time,
-                'config': DEFAULT_CONFIG
-            }
+                'devices': len(self.devices),
+                'clients_total': self.clients_connected,
+                'config': self.device_config(device)
+            })
             return jsonify(status)
         
+        @self.app.route('/api/metrics')
+        def api_metrics():
+            """Métricas do pipeline no formato de texto do Prometheus"""
+            if not METRICS.enabled:
+                return Response("métricas desabilitadas (METRICS_CONFIG['enabled'])\n",
+                                status=404, mimetype='text/plain')
+            return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+        
         @self.app.route('/api/ports')
         def api_ports():
             """Lista portas seriais disponíveis"""
-            ports = self.serial.list_ports()
+            ports = self.device.reader.list_ports()
             return jsonify(ports)
         
         @self.app.route('/api/connect', methods=['POST'])
-        def api_connect():
-            """Conectar à porta serial"""
-            data = request.json
+        @self.app.route('/api/devices/<device_id>/connect', methods=['POST'])
+        def api_connect(device_id=None):
+            """Conectar à fonte de dados: porta serial (padrão), replay, sintético ou emulador"""
+            device = self.get_device(device_id)
+            data = request.json or {}
+            source = data.get('source', 'serial')
             port = data.get('port')
+            data_format = data.get('format', SERIAL_DATA_FORMAT)
             
-            if not port:
+            if source not in DATA_SOURCES:
+                return jsonify({'success': False, 'error': f'Fonte inválida: {source}'})
+            
+            if source == 'serial' and not port:
                 return jsonify({'success': False, 'error': 'Porta não especificada'})
             
+            if data_format not in FORMAT_COMMANDS:
+                return jsonify({'success': False, 'error': f'Formato inválido: {data_format}'})
+            
+            # Uma porta só pode ser aberta por uma bancada
+            if source == 'serial':
+                for other in self.devices:
+                    if (other is not device and other.is_connected()
+                            and getattr(other.reader.serial_conn, 'port', None) == port):
+                        return jsonify({'success': False,
+                                        'error': f'Porta {port} em uso por {other.device_id}'})
+            
             try:
-                success = self.serial.connect(port)
+                success, target = device.connect(source, data)
                 if success:
-                    self.running = True
-                    return jsonify({'success': True, 'port': port})
-                else:
-                    return jsonify({'success': False, 'error': 'Falha na conexão'})
+                    self.socketio.emit('devices_update', {'devices': self.devices.list()})
+                    return jsonify({'success': True, 'source': source, 'port': target,
+                                    'device_id': device.device_id})
+                return jsonify({'success': False, 'error': 'Falha na conexão'})
             except Exception as e:
-                logger.error(f"Erro na conexão: {e}")
+                logger.error(f"Erro na conexão ({device.device_id}): {e}")
                 return jsonify({'success': False, 'error': str(e)})
         
         @self.app.route('/api/disconnect')
-        def api_disconnect():
+        @self.app.route('/api/devices/<device_id>/disconnect')
+        def api_disconnect(device_id=None):
             """Desconectar da porta serial"""
-            self.serial.disconnect()
-            self.running = False
+            self.get_device(device_id).disconnect()
+            self.socketio.emit('devices_update', {'devices': self.devices.list()})
             return jsonify({'success': True})
         
         @self.app.route('/api/calibrate')
-        def api_calibrate():
+        @self.app.route('/api/devices/<device_id>/calibrate')
+        def api_calibrate(device_id=None):
             """Recalibrar sensores"""
-            if self.serial.is_connected():
-                self.serial.send_command('RECALIBRAR')
+            device = self.get_device(device_id)
+            if device.is_connected():
+                device.reader.send_command('RECALIBRAR')
                 return jsonify({'success': True})
             return jsonify({'success': False, 'error': 'Não conectado'})
         
         @self.app.route('/api/start_test', methods=['POST'])
-        def api_start_test():
+        @self.app.route('/api/devices/<device_id>/start_test', methods=['POST'])
+        def api_start_test(device_id=None):
             """Iniciar gravação de teste"""
-            self.test_recording = True
-            self.test_data = []
-            logger.info("Teste iniciado")
-            return jsonify({'success': True})
+            device = self.get_device(device_id)
+            try:
+                session_dir = device.start_test()
+            except OSError as e:
+                logger.error(f"Erro ao iniciar gravação: {e}")
+                return jsonify({'success': False, 'error': str(e)})
+            logger.info(f"Teste iniciado ({device.device_id})")
+            return jsonify({'success': True, 'session': os.path.basename(session_dir)})
         
         @self.app.route('/api/stop_test', methods=['POST'])
-        def api_stop_test():
+        @self.app.route('/api/devices/<device_id>/stop_test', methods=['POST'])
+        def api_stop_test(device_id=None):
             """Parar gravação de teste"""
-            self.test_recording = False
-            logger.info("Teste finalizado")
-            return jsonify({'success': True})
+            device = self.get_device(device_id)
+            session = device.stop_test()
+            logger.info(f"Teste finalizado ({device.device_id})")
+            return jsonify({'success': True, 'samples': session['samples'] if session else 0})
         
         @self.app.route('/api/export_test', methods=['POST'])
-        def api_export_test():
-            """Exportar dados do teste"""
-            if not self.test_data:
+        @self.app.route('/api/devices/<device_id>/export_test', methods=['POST'])
+        def api_export_test(device_id=None):
+            """Exportar dados do teste (lidos do disco em blocos)"""
+            device = self.get_device(device_id)
+            session_dir = device.recorder.session_dir
+            if session_dir is None or device.recorder.metrics_written == 0:
                 return jsonify({'success': False, 'error': 'Nenhum dado para exportar'})
             
             try:
                 filename = f"teste_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                filepath = os.path.join(TESTS_DIR, filename)
+                filepath = os.path.join(device.tests_dir, filename)
+                
+                # Flush pendente é feito pela thread de escrita; exportar o que já está em disco
+                rows = export_metrics_csv(session_dir, filepath,
+                                          RECORDER_CONFIG['csv_chunk_records'])
+                result = {'success': True, 'filename': self.tests_path(filepath)}
                 
-                # Salvar como CSV
-                import csv
-                with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    
-                    # Cabeçalho detalhado
-                    writer.writerow([
-                        'timestamp', 'elapsed_ms', 'time_formatted',
-                        'dominant_freq', 'peak_amplitude', 'imbalance',
-                        'rms1_x', 'rms1_y', 'rms1_z',
-                        'rms2_x', 'rms2_y', 'rms2_z',
-                        'buffer_usage', 'noise_level'
-                    ])
-                    
-                    # Dados
-                    for row in self.test_data:
-                        if len(row) >= 14:  # Verificar se tem dados suficientes
-                            writer.writerow([
-                                row[0],  # timestamp
-                                row[1],  # elapsed_ms
-                                row[2],  # time_formatted
-                                row[3],  # dominant_freq
-                                row[4],  # peak_amplitude
-                                row[5],  # imbalance
-                                row[6],  # rms1_x
-                                row[7],  # rms1_y
-                                row[8],  # rms1_z
-                                row[9],  # rms2_x
-                                row[10], # rms2_y
-                                row[11], # rms2_z
-                                row[12], # buffer_usage
-                                row[13]  # noise_level
-                            ])
+                # Amostras brutas (opcional, arquivo separado)
+                options = request.get_json(silent=True) or {}
+                if options.get('include_samples'):
+                    samples_path = filepath.replace('.csv', '_amostras.csv')
+                    export_samples_csv(session_dir, samples_path,
+                                       RECORDER_CONFIG['csv_chunk_records'])
+                    result['samples_filename'] = self.tests_path(samples_path)
                 
-                logger.info(f"Teste exportado: {filename} ({len(self.test_data)} pontos)")
-                return jsonify({'success': True, 'filename': filename})
+                logger.info(f"Teste exportado: {result['filename']} ({rows} pontos)")
+                return jsonify(result)
             except Exception as e:
                 logger.error(f"Erro ao exportar teste: {e}")
                 return jsonify({'success': False, 'error': str(e)})
         
+        @self.app.route('/api/recordings')
+        @self.app.route('/api/devices/<device_id>/recordings')
+        def api_recordings(device_id=None):
+            """Sessões gravadas em disco"""
+            device = self.get_device(device_id)
+            return jsonify({'success': True, 'recordings': list_recordings(device.tests_dir)})
+        
+        @self.app.route('/api/recordings/<name>/samples')
+        @self.app.route('/api/devices/<device_id>/recordings/<name>/samples')
+        def api_recording_samples(name, device_id=None):
+            """Amostras brutas de um intervalo (start/end em ms do ESP32)"""
+            device = self.get_device(device_id)
+            try:
+                with self.open_recording(device, name) as reader:
+                    timestamps, values, channels = self.read_recording_window(reader, request.args)
+                    max_samples = int(request.args.get('max_samples', 20000))
+                    if len(timestamps) > max_samples:
+                        return jsonify({'success': False,
+                                        'error': f'Janela com {len(timestamps)} amostras '
+                                                 f'(máximo {max_samples})'})
+                    return jsonify({
+                        'success': True,
+                        'channels': channels,
+                        'timestamps': timestamps.tolist(),
+                        'values': values.tolist()
+                    })
+            except (OSError, TypeError, ValueError) as e:
+                return jsonify({'success': False, 'error': str(e)})
+        
+        @self.app.route('/api/recordings/<name>/analysis')
+        @self.app.route('/api/devices/<device_id>/recordings/<name>/analysis')
+        def api_recording_analysis(name, device_id=None):
+            """RMS e espectro (Welch) de um intervalo gravado"""
+            device = self.get_device(device_id)
+            try:
+                with self.open_recording(device, name) as reader:
+                    timestamps, values, channels = self.read_recording_window(reader, request.args)
+                    analysis = device.processor.analyze_window(
+                        values, segment_size=request.args.get('fft_size', type=int))
+                
+                result = {
+                    'success': True,
+                    'channels': channels,
+                    'samples': analysis['samples'],
+                    'start_ms': int(timestamps[0]) if len(timestamps) else None,
+                    'end_ms': int(timestamps[-1]) if len(timestamps) else None,
+                    'segments': analysis['segments']
+                }
+                if analysis['samples']:
+                    result['rms'] = dict(zip(channels, analysis['rms'].tolist()))
+                    result['peak_to_peak'] = dict(zip(channels, analysis['peak_to_peak'].tolist()))
+                if analysis['spectrum'] is not None:
+                    spectra, info = shape_spectrum(
+                        analysis['spectrum'], analysis['bin_width'],
+                        max_freq=request.args.get('max_freq', device.processor.config.fft_range,
+                                                  type=float),
+                        points=request.args.get('points', type=int)
+                    )
+                    result['fft'] = dict(zip(channels, spectra.tolist()))
+                    result['fft_info'] = info
+                return jsonify(result)
+            except (OSError, TypeError, ValueError) as e:
+                return jsonify({'success': False, 'error': str(e)})
+        
         @self.app.route('/api/config', methods=['GET', 'POST'])
-        def api_config():
-            """Configurações do sistema"""
+        @self.app.route('/api/devices/<device_id>/config', methods=['GET', 'POST'])
+        def api_config(device_id=None):
+            """Configurações do sistema (parâmetros de análise por dispositivo)"""
+            device = self.get_device(device_id)
             if request.method == 'GET':
-                return jsonify(DEFAULT_CONFIG)
+                return jsonify(DEFAULT_CONFIG if device_id is None else self.device_config(device))
             else:
-                data = request.json
-                for key, value in data.items():
-                    if key in DEFAULT_CONFIG:
-                        DEFAULT_CONFIG[key] = value
+                data = request.get_json(silent=True)
+                if not isinstance(data, dict):
+                    return jsonify({'success': False, 'error': 'Configuração deve ser um objeto JSON'})
+                if data.get('spectral_mode', 'instant') not in ('instant', 'welch', 'exponential'):
+                    return jsonify({'success': False, 'error': 'Modo espectral inválido'})
+                if data.get('main_axis', 'x') not in ('x', 'y', 'z'):
+                    return jsonify({'success': False, 'error': 'Eixo principal inválido'})
+                try:
+                    overlap = float(data.get('fft_overlap', 0))
+                except (TypeError, ValueError):
+                    return jsonify({'success': False, 'error': 'Sobreposição deve ser numérica'})
+                if not 0 <= overlap < 1:
+                    return jsonify({'success': False, 'error': 'Sobreposição deve estar em [0, 1)'})
                 
-                # Atualizar processador
-                self.processor.config.motor_frequency = DEFAULT_CONFIG['motor_frequency']
-                self.processor.config.noise_threshold = DEFAULT_CONFIG['noise_threshold']
-                self.processor.config.fft_range = DEFAULT_CONFIG['fft_range']
+                config = {key: value for key, value in data.items() if key in DEFAULT_CONFIG}
+                # Parâmetros numéricos chegam ao processador já convertidos
+                for key, allow_zero in (('motor_frequency', False), ('noise_threshold', True),
+                                        ('fft_range', False)):
+                    if key not in config:
+                        continue
+                    try:
+                        value = float(config[key])
+                    except (TypeError, ValueError):
+                        return jsonify({'success': False, 'error': f'{key} deve ser numérico'})
+                    if not 0 <= value < float('inf') or (value == 0 and not allow_zero):
+                        return jsonify({'success': False, 'error': f'{key} fora da faixa'})
+                    config[key] = value
+                if 'fft_overlap' in config:
+                    config['fft_overlap'] = overlap
+                if device is self.device:
+                    # Dispositivo padrão mantém DEFAULT_CONFIG como antes
+                    DEFAULT_CONFIG.update(config)
+                device.apply_config(config)
                 
-                logger.info(f"Configurações atualizadas: {DEFAULT_CONFIG}")
+                logger.info(f"Configurações atualizadas ({device.device_id}): {config}")
                 return jsonify({'success': True})
         
+        @self.app.route('/api/spectrum/zoom')
+        @self.app.route('/api/devices/<device_id>/spectrum/zoom')
+        def api_spectrum_zoom(device_id=None):
+            """Espectro em resolução total em torno de uma frequência"""
+            device = self.get_device(device_id)
+            try:
+                zoom = device.zoom_spectra(request.args)
+                if zoom is None:
+                    return jsonify({'success': False, 'error': 'Dados insuficientes'})
+                return jsonify({'success': True, **zoom})
+            except (TypeError, ValueError) as e:
+                return jsonify({'success': False, 'error': str(e)})
+        
+        @self.app.route('/api/trends')
+        @self.app.route('/api/devices/<device_id>/trends')
+        def api_trends(device_id=None):
+            """Histórico (min/max/média/último) de métricas: metric, from, to (epoch s), resolution"""
+            device = self.get_device(device_id)
+            try:
+                return jsonify({'success': True, 'device_id': device.device_id,
+                                **device.query_trends(request.args)})
+            except (TypeError, ValueError) as e:
+                return jsonify({'success': False, 'error': str(e)})
+        
+        @self.app.route('/api/waterfall')
+        @self.app.route('/api/devices/<device_id>/waterfall')
+        def api_waterfall(device_id=None):
+            """Faixa de linhas e parâmetros do espectrograma (time=epoch s → índice da linha)"""
+            device = self.get_device(device_id)
+            try:
+                return jsonify({'success': True, 'device_id': device.device_id,
+                                **device.waterfall_info(request.args)})
+            except (TypeError, ValueError) as e:
+                return jsonify({'success': False, 'error': str(e)})
+        
+        @self.app.route('/api/waterfall/tile')
+        @self.app.route('/api/devices/<device_id>/waterfall/tile')
+        def api_waterfall_tile(device_id=None):
+            """Tile binário uint8 (linhas × bins); metadados no cabeçalho X-Waterfall-Tile"""
+            device = self.get_device(device_id)
+            try:
+                data, info = device.waterfall_tile(request.args)
+            except (TypeError, ValueError) as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            response = Response(data, mimetype='application/octet-stream')
+            response.headers['X-Waterfall-Tile'] = json.dumps(info)
+            if info['complete']:
+                response.headers['Cache-Control'] = 'private, max-age=3600'
+            return response
+        
         @self.app.route('/api/clear_data')
-        def api_clear_data():
+        @self.app.route('/api/devices/<device_id>/clear_data')
+        def api_clear_data(device_id=None):
             """Limpar todos os dados"""
-            self.processor.clear_data()
-            self.test_data = []
+            self.get_device(device_id).clear_data()
             return jsonify({'success': True})
         
         @self.app.route('/static/<path:path>')
@@ -235,111 +447,233 @@ class VibrationSystemServer:
             """Servir arquivos estáticos"""
             return send_from_directory(STATIC_DIR, path)
         
-        @self.app.route('/data/tests/<filename>')
+        @self.app.route('/data/tests/<path:filename>')
         def serve_test_file(filename):
-            """Servir arquivos de teste"""
+            """Servir arquivos de teste (bancadas extras em subpastas)"""
             return send_from_directory(TESTS_DIR, filename, as_attachment=True)
     
     def setup_socketio_events(self):
-        """Configurar eventos WebSocket"""
+        """Configurar eventos WebSocket (cada cliente acompanha um dispositivo)"""
         
         @self.socketio.on('connect')
         def handle_connect():
             self.clients_connected += 1
+            device = self.devices.select(request.sid, self.devices.default_id)
             logger.info(f"Cliente conectado. Total: {self.clients_connected}")
-            emit('connected', {'message': 'Conectado ao servidor'})
+            emit('connected', {'message': 'Conectado ao servidor', 'device_id': device.device_id,
+                               'devices': self.devices.list()})
             
             # Enviar configuração atual
-            emit('config_update', DEFAULT_CONFIG)
+            emit('config_update', self.device_config(device))
         
         @self.socketio.on('disconnect')
         def handle_disconnect():
             self.clients_connected = max(0, self.clients_connected - 1)
+            self.devices.release(request.sid)
             logger.info(f"Cliente desconectado. Total: {self.clients_connected}")
         
+        @self.socketio.on('select_device')
+        def handle_select_device(data):
+            """Passa a receber data_update/status_message de outra bancada"""
+            try:
+                device = self.devices.select(request.sid, data.get('device_id'))
+            except ValueError as e:
+                emit('device_selected', {'success': False, 'error': str(e)})
+                return
+            emit('device_selected', {'success': True, 'device_id': device.device_id,
+                                     'name': device.name})
+            emit('config_update', self.device_config(device))
+        
+        @self.socketio.on('set_refresh_rate')
+        def handle_set_refresh_rate(data):
+            emitter = self.devices.device_for(request.sid).emitter
+            fps = emitter.set_rate(request.sid, data.get('fps'))
+            emit('refresh_rate', {'fps': fps})
+        
+        @self.socketio.on('set_payload_mode')
+        def handle_set_payload_mode(data):
+            emitter = self.devices.device_for(request.sid).emitter
+            try:
+                emitter.set_payload_mode(request.sid, data.get('mode', 'json'),
+                                         data.get('encoding', 'float32'))
+                emit('payload_mode', {'success': True, 'mode': data.get('mode', 'json')})
+            except ValueError as e:
+                emit('payload_mode', {'success': False, 'error': str(e)})
+        
+        @self.socketio.on('set_display')
+        def handle_set_display(data):
+            emitter = self.devices.device_for(request.sid).emitter
+            display = emitter.set_display(request.sid, data.get('points', 0),
+                                          data.get('max_freq', 0))
+            emit('display', display)
+        
+        @self.socketio.on('request_zoom')
+        def handle_request_zoom(data):
+            try:
+                zoom = self.devices.device_for(request.sid).zoom_spectra(data)
+                if zoom is None:
+                    emit('zoom_spectrum', {'success': False, 'error': 'Dados insuficientes'})
+                else:
+                    emit('zoom_spectrum', {'success': True, **zoom})
+            except (TypeError, ValueError) as e:
+                emit('zoom_spectrum', {'success': False, 'error': str(e)})
+        
+        @self.socketio.on('subscribe_waterfall')
+        def handle_subscribe_waterfall(data):
+            """Liga/desliga o envio incremental das linhas novas ('waterfall_row')"""
+            device = self.devices.device_for(request.sid)
+            enabled = bool((data or {}).get('enabled', True))
+            try:
+                device.subscribe_waterfall(request.sid, enabled)
+                emit('waterfall_subscription', {'success': True, 'enabled': enabled,
+                                                **device.waterfall_info({})})
+            except ValueError as e:
+                emit('waterfall_subscription', {'success': False, 'error': str(e)})
+        
         @self.socketio.on('get_config')
         def handle_get_config():
-            emit('config_update', DEFAULT_CONFIG)
+            emit('config_update', self.device_config(self.devices.device_for(request.sid)))
         
         @self.socketio.on('set_motor_freq')
         def handle_set_motor_freq(data):
             freq = data.get('frequency')
             if freq in RPM_FACTORS:
-                DEFAULT_CONFIG['motor_frequency'] = freq
-                self.processor.config.motor_frequency = freq
-                emit('config_update', DEFAULT_CONFIG)
-                logger.info(f"Frequência do motor alterada para {freq} Hz")
+                device = self.devices.device_for(request.sid)
+                if device is self.device:
+                    DEFAULT_CONFIG['motor_frequency'] = freq
+                device.apply_config({'motor_frequency': freq})
+                emit('config_update', self.device_config(device))
+                logger.info(f"Frequência do motor alterada para {freq} Hz ({device.device_id})")
     
-    def start_processing_thread(self):
-        """Iniciar thread de processamento de dados"""
-        def processing_loop():
-            while True:
-                try:
-                    self.process_data()
-                    time.sleep(0.01)  # 100Hz
-                except Exception as e:
-                    logger.error(f"Erro no processamento: {e}")
-                    time.sleep(1)
-        
-        thread = threading.Thread(target=processing_loop, daemon=True)
-        thread.start()
-        logger.info("Thread de processamento iniciada")
+    def tests_path(self, path: str) -> str:
+        """Caminho relativo a TESTS_DIR para download em /data/tests/..."""
+        return os.path.relpath(path, TESTS_DIR).replace(os.sep, '/')
+    
+    def open_recording(self, device: DevicePipeline, name: str) -> RecordingReader:
+        """Abre uma sessão da pasta de testes do dispositivo pelo nome (sem caminhos)"""
+        if name != os.path.basename(name) or name.startswith('.'):
+            raise ValueError(f"Sessão inválida: {name}")
+        session_dir = os.path.join(device.tests_dir, name)
+        if not os.path.isdir(session_dir):
+            raise ValueError(f"Sessão não encontrada: {name}")
+        return RecordingReader(session_dir)
+    
+    def read_recording_window(self, reader: RecordingReader, params):
+        """Janela pedida via query string: start, end (ms) e channels ('m1.x,m2.x')"""
+        first_ms, last_ms = reader.time_range()
+        start_ms = int(params.get('start', first_ms))
+        end_ms = int(params.get('end', last_ms))
+        channels = params.get('channels')
+        channels = channels.split(',') if channels else None
+        _, names = channel_selector(channels)
+        timestamps, values = reader.read(start_ms, end_ms, channels)
+        return timestamps, values, names
     
-    def process_data(self):
-        """Processar dados recebidos do serial"""
-        if not self.serial.is_connected() or not self.running:
-            return
+    def setup_metrics(self):
+        """Descrição dos contadores e gauges (um valor por dispositivo) de /api/metrics"""
+        METRICS.describe_counter('samples', 'Amostras inseridas no buffer')
+        METRICS.describe_counter('serial_bytes', 'Bytes lidos da fonte de dados')
+        METRICS.describe_counter('emits', 'Atualizações data_update enviadas')
+        METRICS.describe_counter('emit_coalesced', 'Ticks pulados por ACK pendente')
+        METRICS.describe_counter('analysis_cache', 'Consultas ao cache de análise por parte')
+        METRICS.describe_counter('waterfall_tiles', 'Pedidos de tiles do espectrograma (cache LRU)')
+        METRICS.describe_counter('order_alarms', 'Alarmes de ordem disparados (1×…N× acima do limite)')
         
-        # Coletar todos os dados disponíveis
-        lines = self.serial.get_all_data()
+        def per_device(value):
+            return lambda: {(('device', d.device_id),): value(d) for d in self.devices}
         
-        for line in lines:
-            # Parse da linha
-            parsed = self.serial.parse_data_line(line)
-            
-            if parsed:
-                if parsed['type'] == 'data':
-                    # Adicionar ao processador
-                    self.processor.add_data(parsed)
-                    
-                    # Se gravando teste, salvar
-                    if self.test_recording:
-                        # Obter dados atuais
-                        current_time = time.time()
-
-                        # Salvar no máximo a cada 0,2 s (5 Hz)
-                        if current_time - self.last_test_save_time >= 0.2:
-                            update = self.processor.process_realtime_update()
-                        
-                            if update:
-                                self.test_data.append([
-                                    datetime.now().isoformat(),  # timestamp
-                                    int((current_time - self.system_start_time) * 1000),  # elapsed_ms
-                                    datetime.now().strftime('%H:%M:%S'),  # time_formatted
-                                    update['peaks']['m1']['frequency'],
-                                    update['peaks']['m1']['amplitude'],
-                                    update['imbalance'],
-                                    update['rms']['m1']['x'],
-                                    update['rms']['m1']['y'],
-                                    update['rms']['m1']['z'],
-                                    update['rms']['m2']['x'],
-                                    update['rms']['m2']['y'],
-                                    update['rms']['m2']['z'],
-                                    update['buffer_status'],
-                                    update['current_noise']
-                                ])
-                                
-                            self.last_test_save_time = current_time
-                
-                elif parsed['type'] == 'status':
-                    # Enviar status para clientes
-                    self.socketio.emit('status_message', {'message': parsed['message']})
-        
-        # Processar atualização em tempo real (se tiver clientes)
-        if self.clients_connected > 0 and len(self.processor.data_buffer) >= 100:
-            update = self.processor.process_realtime_update()
-            if update:
-                self.socketio.emit('data_update', update)
+        def frame_errors():
+            errors = {}
+            for d in self.devices:
+                decoder = d.reader.decoder
+                for kind, count in (('crc', decoder.crc_errors),
+                                    ('lost_frames', decoder.lost_frames),
+                                    ('skipped_bytes', decoder.skipped_bytes)):
+                    errors[(('device', d.device_id), ('kind', kind))] = count
+            return errors
+        
+        def ingest_drops():
+            drops = {}
+            for d in self.devices:
+                for reason, count in d.reader.data_queue.dropped_samples.items():
+                    drops[(('device', d.device_id), ('reason', reason))] = count
+            return drops
+        
+        def timing_stat(field):
+            return per_device(lambda d: d.processor.timing.get_stats()[field] or 0.0)
+        
+        def per_client(value):
+            def collect():
+                values = {}
+                for d in self.devices:
+                    for sid, item in value(d).items():
+                        values[(('device', d.device_id), ('sid', sid))] = float(item)
+                return values
+            return collect
+        
+        def client_stat(field):
+            return per_client(lambda d: {sid: c[field]
+                                         for sid, c in d.emitter.get_stats()['clients'].items()})
+        
+        gauges = [
+            ('ingest_queue_depth', 'Itens aguardando processamento na fila da serial',
+             per_device(lambda d: d.reader.data_queue.qsize()), 'gauge'),
+            ('ingest_queue_samples', 'Amostras aguardando processamento (limite INGEST_CONFIG)',
+             per_device(lambda d: d.reader.data_queue.samples), 'gauge'),
+            ('ingest_dropped_samples_total', 'Amostras descartadas pela fila de ingestão (por motivo)',
+             ingest_drops, 'counter'),
+            ('ingest_overloaded', 'Fila de ingestão em sobrecarga (0/1)',
+             per_device(lambda d: int(d.reader.data_queue.overloaded)), 'gauge'),
+            ('ingest_overload_events_total', 'Períodos de sobrecarga da fila de ingestão',
+             per_device(lambda d: d.reader.data_queue.overload_events), 'counter'),
+            ('ingest_gaps_total', 'Lacunas (amostras descartadas) sinalizadas ao processador',
+             per_device(lambda d: d.processor.gap_count), 'counter'),
+            ('status_queue_depth', 'Mensagens de status aguardando envio',
+             per_device(lambda d: d.reader.status_queue.qsize()), 'gauge'),
+            ('invalid_lines_total', 'Linhas CSV descartadas pelo parse',
+             per_device(lambda d: d.reader.invalid_lines), 'counter'),
+            ('frame_errors_total', 'Erros do protocolo binário',
+             frame_errors, 'counter'),
+            ('recorder_dropped_samples_total', 'Amostras descartadas pelo gravador (fila cheia)',
+             per_device(lambda d: d.recorder.dropped_samples), 'counter'),
+            ('recorder_queue_depth', 'Blocos aguardando escrita em disco',
+             per_device(lambda d: d.recorder.queue.qsize()), 'gauge'),
+            ('ingest_samples_per_second', 'Amostras inseridas por segundo (janela recente)',
+             per_device(lambda d: d.ingest_rate.rate()), 'gauge'),
+            ('device_sample_rate_hz', 'Taxa de amostragem estimada pelos timestamps do ESP32',
+             timing_stat('measured_rate_hz'), 'gauge'),
+            ('sample_jitter_seconds', 'Desvio padrão dos intervalos entre amostras (timestamps do ESP32)',
+             per_device(lambda d: (d.processor.timing.jitter() or 0.0) / 1000.0), 'gauge'),
+            ('clock_drift_ppm', 'Deriva do relógio do ESP32 frente ao PC',
+             timing_stat('clock_drift_ppm'), 'gauge'),
+            ('sample_loss_ratio', 'Fração de amostras ausentes nos timestamps (janela recente)',
+             per_device(lambda d: d.processor.timing.recent_loss()), 'gauge'),
+            ('timestamp_duplicates_total', 'Amostras com timestamp repetido ou fora de ordem',
+             per_device(lambda d: d.processor.timing.duplicates + d.processor.timing.out_of_order),
+             'counter'),
+            ('waterfall_tile_cache_bytes', 'Memória do cache de tiles do espectrograma',
+             per_device(lambda d: d.processor.waterfall.tiles.bytes
+                        if d.processor.waterfall is not None else 0), 'gauge'),
+            ('buffer_fill_ratio', 'Ocupação do buffer de amostras (0-1)',
+             per_device(lambda d: len(d.processor.data_buffer) / d.processor.config.buffer_size),
+             'gauge'),
+            ('emit_rate_hz', 'Atualizações enviadas por segundo (todos os clientes)',
+             per_device(lambda d: d.emitter.emit_rate.rate()), 'gauge'),
+            ('emit_latency_p99_seconds', 'Latência p99 chegada da amostra → emissão',
+             per_device(lambda d: d.latency.summary()['p99_ms'] / 1000.0), 'gauge'),
+            ('worker_pool_pending', 'Tarefas no pool compartilhado (em execução ou na fila)',
+             lambda: self.devices.pending, 'gauge'),
+            ('clients', 'Clientes WebSocket conectados',
+             lambda: self.clients_connected, 'gauge'),
+            ('client_lag_seconds', 'Há quanto tempo o cliente não recebe a versão mais recente',
+             per_client(lambda d: d.emitter.client_lag()), 'gauge'),
+            ('client_awaiting_ack', 'Cliente com atualização ainda não confirmada (0/1)',
+             client_stat('awaiting_ack'), 'gauge'),
+            ('client_coalesced_total', 'Ticks pulados por cliente (ACK pendente)',
+             client_stat('coalesced'), 'counter')
+        ]
+        for name, help_text, callback, kind in gauges:
+            METRICS.register_gauge(name, help_text, callback, kind)
     
     def run(self, host='127.0.0.1', port=5000, debug=False):
         """Executar servidor"""
@@ -0,0 +1,283 @@
+"""
+MÉTRICAS DE DESEMPENHO DO PIPELINE
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import time
+import threading
+import numpy as np
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple, Union
+
+
+class LatencyTracker:
+    """Guarda as últimas latências (ms) e resume em percentis"""
+
+    def __init__(self, size: int = 1000):
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self.lock:
+            self.values.append(seconds * 1000.0)
+            self.count += 1
+
+    def summary(self) -> Dict:
+        """Última latência, p50, p99 e máxima (ms) da janela recente"""
+        with self.lock:
+            if not self.values:
+                return {'count': 0, 'last_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+            values = np.fromiter(self.values, dtype=np.float64)
+            last = self.values[-1]
+            count = self.count
+        p50, p99 = np.percentile(values, [50, 99])
+        return {
+            'count': count,
+            'last_ms': float(last),
+            'p50_ms': float(p50),
+            'p99_ms': float(p99),
+            'max_ms': float(values.max())
+        }
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+            self.count = 0
+
+
+# Limites (s) dos histogramas de etapa: de 50 µs a 2,5 s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Descrição de cada etapa instrumentada (label 'stage')
+STAGE_HELP = {
+    'serial_read': 'leitura da porta (inclui espera por dados)',
+    'parse': 'conversão de CSV/quadros binários em blocos',
+    'add_data': 'inserção de um lote no buffer e estatísticas',
+    'fft': 'espectros dos 6 canais',
+    'peaks': 'tabela de picos (proeminência e largura) dos 6 canais',
+    'harmonics': 'busca de harmônicos',
+    'band_zoom': 'espectro de alta resolução da banda em torno da rotação',
+    'waterfall': 'FFTs das linhas novas do espectrograma',
+    'orders': 'filtros das ordens 1×…N× de um bloco',
+    'analysis_process': 'análise no processo separado (ida e volta, modo process)',
+    'build_state': 'análise completa de uma atualização',
+    'encode': 'serialização do payload (JSON/binário)',
+    'emit': 'socketio.emit de uma atualização'
+}
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus (buckets fixos)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Último: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[list, float, int]:
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+
+class _StageTimer:
+    """Context manager que mede a duração de um bloco em um histograma"""
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    """Timer compartilhado quando as métricas estão desligadas (sem custo)"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+GaugeValue = Union[float, Dict[Tuple[Tuple[str, str], ...], float]]
+
+
+class RateMeter:
+    """Taxa (eventos/s) de um contador na janela recente"""
+
+    def __init__(self, window: float = 5.0):
+        self.window = window
+        self.points = deque()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def add(self, amount: int = 1):
+        now = time.monotonic()
+        with self.lock:
+            self.total += amount
+            self.points.append((now, self.total))
+            while len(self.points) > 2 and now - self.points[0][0] > self.window:
+                self.points.popleft()
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        with self.lock:
+            if not self.points or now - self.points[-1][0] > self.window:
+                return 0.0
+            start_time, start_total = self.points[0]
+            elapsed = now - start_time
+            return (self.total - start_total) / elapsed if elapsed > 0 else 0.0
+
+
+class MetricsRegistry:
+    """
+    Histogramas de etapas, contadores e gauges exportados em texto Prometheus.
+
+    Desligado (padrão), time() devolve um timer nulo compartilhado e inc()
+    retorna na primeira linha: o custo no caminho quente é uma chamada de
+    método. Gauges são calculados só no momento da coleta (callbacks).
+    """
+
+    def __init__(self, enabled: bool = False, prefix: str = 'vibration',
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.counter_help: Dict[str, str] = {}
+        self.gauges: Dict[str, Tuple[str, str, Callable[[], GaugeValue]]] = {}
+        self.lock = threading.Lock()
+
+    # ---------- Caminho quente ----------
+
+    def time(self, stage: str):
+        """Mede um bloco `with` no histograma da etapa"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self._stage(stage))
+
+    def observe(self, stage: str, seconds: float):
+        if self.enabled:
+            self._stage(stage).observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Incrementa um contador (criado na primeira chamada)"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def _stage(self, stage: str) -> Histogram:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.stages.setdefault(stage, Histogram(self.buckets))
+        return histogram
+
+    # ---------- Registro ----------
+
+    def describe_counter(self, name: str, help_text: str):
+        self.counter_help[name] = help_text
+
+    def register_gauge(self, name: str, help_text: str, callback: Callable[[], GaugeValue],
+                       kind: str = 'gauge'):
+        """
+        Valor calculado na coleta. O callback retorna um número ou um dict
+        {((label, valor), ...): número}. kind='counter' para totais já
+        acumulados em outro lugar (ex.: linhas inválidas do leitor serial).
+        """
+        self.gauges[name] = (help_text, kind, callback)
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    # ---------- Exportação ----------
+
+    @staticmethod
+    def _labels(pairs) -> str:
+        if not pairs:
+            return ''
+        escaped = []
+        for key, value in pairs:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self) -> str:
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        p = self.prefix
+        lines = []
+
+        name = f"{p}_stage_seconds"
+        stages_help = '; '.join(f"{stage}: {text}" for stage, text in STAGE_HELP.items())
+        lines.append(f"# HELP {name} Duração de cada etapa do pipeline (s). {stages_help}")
+        lines.append(f"# TYPE {name} histogram")
+        for stage in sorted(self.stages):
+            counts, total, count = self.stages[stage].snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+        described = set()
+        for (counter, labels), value in counters:
+            full = f"{p}_{counter}_total"
+            if counter not in described:
+                described.add(counter)
+                lines.append(f"# HELP {full} {self.counter_help.get(counter, counter)}")
+                lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full}{self._labels(labels)} {value:.9g}")
+
+        for gauge in sorted(self.gauges):
+            help_text, kind, callback = self.gauges[gauge]
+            try:
+                value = callback()
+            except Exception:
+                continue  # Fonte indisponível na coleta: omitir a série
+            if value is None:
+                continue
+            full = f"{p}_{gauge}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            if isinstance(value, dict):
+                for labels, item in sorted(value.items()):
+                    lines.append(f"{full}{self._labels(labels)} {float(item):.9g}")
+            else:
+                lines.append(f"{full} {float(value):.9g}")
+
+        return '\n'.join(lines) + '\n'
+
+
+# Registro global do processo (habilitado pelo servidor conforme METRICS_CONFIG)
+METRICS = MetricsRegistry()
@@ -0,0 +1,190 @@
+"""
+RASTREAMENTO DE ORDENS (1×…N× DA ROTAÇÃO) SEM FFT
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import numpy as np
+from scipy import signal
+from typing import Dict, List, Optional, Sequence
+
+from app.ring_buffer import CHANNELS, NUM_CHANNELS
+
+
+class OrderTracker:
+    """
+    Amplitude e fase das ordens 1×…N× da rotação nos 6 canais, atualizadas
+    a cada bloco de amostras.
+
+    Cada ordem é um filtro DFT recursivo: o sinal (sem o nível DC) é
+    multiplicado por exp(-j·2π·k·fase da rotação) e passa por um
+    passa-baixas de dois polos reais (constante de tempo `time_constant`),
+    o que equivale a um Goertzel deslizante com janela exponencial na
+    frequência k × rotação. A fase da rotação é integrada amostra a
+    amostra, então mudanças de velocidade não reiniciam os filtros.
+    Todas as ordens e canais vão em uma única chamada de lfilter por bloco.
+
+    A amplitude sai na mesma escala do espectro principal (amplitude/2 de
+    um seno); a fase (graus) é relativa ao oscilador de referência, logo
+    só diferenças entre canais são significativas.
+    """
+
+    def __init__(self, sample_rate: float, orders: int = 6, time_constant: float = 0.5,
+                 speed: float = 0.0, channels: int = NUM_CHANNELS):
+        if orders < 1:
+            raise ValueError("orders deve ser >= 1")
+        if time_constant <= 0:
+            raise ValueError("time_constant deve ser positivo")
+        self.sample_rate = float(sample_rate)
+        self.time_constant = float(time_constant)
+        self.channels = channels
+        # Ordem 0 (DC) primeiro: estimativa do nível médio retirado das demais
+        self.orders = np.arange(0, int(orders) + 1)
+
+        # Dois polos iguais em exp(-1/(τ·fs)), ganho unitário em DC
+        pole = np.exp(-1.0 / (self.time_constant * self.sample_rate))
+        self.b = np.array([(1.0 - pole) ** 2])
+        self.a = np.array([1.0, -2.0 * pole, pole ** 2])
+        # Resposta ao degrau de dois polos passa de 98% após ≈ 6τ
+        self.settle_samples = int(np.ceil(6 * self.time_constant * self.sample_rate))
+
+        self.speed = float(speed)
+        self.speed_source = 'config'
+        self.restarts = 0
+        self.active_alarms = set()
+        self.reset()
+
+    @property
+    def count(self) -> int:
+        return len(self.orders) - 1
+
+    def matches(self, orders: int, time_constant: float) -> bool:
+        return (self.count, self.time_constant) == (int(orders), float(time_constant))
+
+    def reset(self):
+        """Zera os filtros (após lacuna ou limpeza do buffer)"""
+        self.zi = np.zeros((len(self.orders), self.channels, 2), dtype=np.complex128)
+        self.levels = np.zeros((len(self.orders), self.channels), dtype=np.complex128)
+        self.phase = 0.0    # Ciclos da rotação na próxima amostra
+        self.samples = 0    # Amostras desde o último reinício
+
+    def restart(self):
+        if self.samples:
+            self.restarts += 1
+        self.reset()
+
+    def set_speed(self, speed: float, source: str = 'config'):
+        """Rotação (Hz) usada a partir do próximo bloco"""
+        self.speed = max(0.0, float(speed))
+        self.speed_source = source
+
+    def update(self, values: np.ndarray):
+        """Processa um bloco (canais, n) recém-inserido no buffer"""
+        n = values.shape[1]
+        if n == 0:
+            return
+        values = values.astype(np.float64)
+        if self.samples == 0:
+            # Nível DC inicial do próprio bloco: evita o transitório do degrau
+            start = values.mean(axis=1)
+            self.zi[0] = signal.lfilter_zi(self.b, self.a)[None, :] * start[:, None]
+            self.levels[0] = start
+        dc = self.levels[0].real
+
+        step = self.speed / self.sample_rate
+        cycles = (self.phase + step * np.arange(n)) % 1.0
+        self.phase = float((self.phase + step * n) % 1.0)
+        # k × ciclos mod 1 é exato para k inteiro: sem perda de precisão com o tempo
+        oscillator = np.exp(-2j * np.pi * (np.outer(self.orders[1:], cycles) % 1.0))
+
+        mixed = np.empty((len(self.orders), self.channels, n), dtype=np.complex128)
+        mixed[0] = values
+        mixed[1:] = (values - dc[:, None])[None] * oscillator[:, None, :]
+        filtered, self.zi = signal.lfilter(self.b, self.a, mixed, axis=-1, zi=self.zi)
+        self.levels = filtered[..., -1]
+        self.samples += n
+
+    @property
+    def settled(self) -> bool:
+        return self.samples >= self.settle_samples
+
+    def valid_orders(self) -> np.ndarray:
+        """Máscara das ordens 1…N abaixo de Nyquist na rotação atual"""
+        return (self.speed > 0) & (self.orders[1:] * self.speed < self.sample_rate / 2)
+
+    def amplitudes(self) -> np.ndarray:
+        """Amplitude (canais, ordens); 0 nas ordens fora da faixa"""
+        amplitude = np.abs(self.levels[1:]).T
+        amplitude[:, ~self.valid_orders()] = 0.0
+        return amplitude
+
+    def phases(self) -> np.ndarray:
+        """Fase (graus) (canais, ordens)"""
+        return np.degrees(np.angle(self.levels[1:])).T
+
+    def check_alarms(self, limits: Sequence[float], hysteresis: float = 0.9) -> List[Dict]:
+        """
+        Compara cada ordem com o limite correspondente (limits[k-1], 0 =
+        sem alarme). Retorna só os alarmes que acabaram de disparar; um
+        alarme ativo é liberado abaixo de hysteresis × limite.
+        """
+        if not self.settled or not any(limits):
+            return []
+        count = min(len(limits), self.count)
+        limit = np.asarray(limits[:count], dtype=np.float64)
+        amplitude = self.amplitudes()[:, :count]
+        armed = limit > 0
+        above = armed & (amplitude > limit)
+        below = ~armed | (amplitude < hysteresis * limit)
+
+        raised = []
+        for channel, index in zip(*np.nonzero(above)):
+            key = (int(channel), int(index))
+            if key in self.active_alarms:
+                continue
+            self.active_alarms.add(key)
+            sensor, axis = CHANNELS[channel]
+            raised.append({
+                'order': int(index) + 1,
+                'sensor': sensor,
+                'axis': axis,
+                'frequency': float((index + 1) * self.speed),
+                'amplitude': float(amplitude[channel, index]),
+                'limit': float(limit[index])
+            })
+        self.active_alarms = {key for key in self.active_alarms
+                              if key[1] < count and not below[key]}
+        return raised
+
+    def get_state(self) -> Optional[Dict]:
+        """Tabela compacta para o payload (listas por sensor e eixo)"""
+        if self.samples == 0:
+            return None
+        amplitude, phase = self.amplitudes(), self.phases()
+        table = {'amplitude': {'m1': {}, 'm2': {}}, 'phase': {'m1': {}, 'm2': {}}}
+        for i, (sensor, axis) in enumerate(CHANNELS):
+            table['amplitude'][sensor][axis] = amplitude[i].tolist()
+            table['phase'][sensor][axis] = phase[i].tolist()
+        return {
+            'speed': self.speed,
+            'speed_source': self.speed_source,
+            'orders': self.orders[1:].tolist(),
+            'valid': self.valid_orders().tolist(),
+            'time_constant': self.time_constant,
+            'settled': self.settled,
+            'restarts': self.restarts,
+            **table,
+            'alarms': [
+                {'order': index + 1, 'sensor': CHANNELS[channel][0], 'axis': CHANNELS[channel][1]}
+                for channel, index in sorted(self.active_alarms)
+            ]
+        }
+
+    def trend_values(self, orders: int) -> List[float]:
+        """Amplitudes das ordens 1…orders nos 6 canais (ordem de order_trend_metrics)"""
+        return self.amplitudes()[:, :orders].T.ravel().tolist()
+
+
+def order_trend_metrics(orders: int) -> List[str]:
+    """Nomes das séries de tendência das ordens: order<k>_<sensor>_<eixo>"""
+    return [f"order{k}_{sensor}_{axis}" for k in range(1, orders + 1) for sensor, axis in CHANNELS]
@@ -0,0 +1,106 @@
+"""
+SERIALIZAÇÃO DOS PAYLOADS EM TEMPO REAL (JSON / BINÁRIO)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import numpy as np
+from typing import Dict, Tuple
+
+from app.ring_buffer import CHANNELS, samples_to_dicts
+from app.spectral import shape_spectrum
+
+PAYLOAD_MODES = ('json', 'binary')
+BINARY_ENCODINGS = ('float32', 'int16')
+BINARY_FORMAT_VERSION = 1
+
+# Campos com arrays NumPy no estado interno (serializados à parte)
+ARRAY_FIELDS = ('fft', 'time_signals', 'time_timestamps')
+
+
+def _metadata(state: Dict) -> Dict:
+    """Campos escalares/pequenos, iguais nos dois formatos"""
+    return {key: value for key, value in state.items() if key not in ARRAY_FIELDS}
+
+
+def shape_state(state: Dict, max_freq: float = None, points: int = None) -> Dict:
+    """
+    Aplica faixa de frequência e decimação por máximo aos espectros do estado.
+    max_freq padrão: 'fft_range' do estado. Retorna um novo dicionário raso.
+    """
+    max_freq = max_freq or state.get('fft_range')
+    sensors = list(state['fft'].keys())
+    spectra = np.vstack([state['fft'][sensor] for sensor in sensors])
+    shaped, info = shape_spectrum(spectra, state['bin_width'], max_freq, points)
+
+    shaped_state = dict(state)
+    shaped_state['fft'] = {sensor: shaped[i] for i, sensor in enumerate(sensors)}
+    shaped_state['fft_info'] = info
+    return shaped_state
+
+
+def to_json_payload(state: Dict) -> Dict:
+    """Payload compatível com o formato JSON original (listas e dicionários)"""
+    payload = _metadata(state)
+    payload['time_data'] = samples_to_dicts(state['time_timestamps'], state['time_signals'])
+    payload['fft'] = {sensor: spectrum.tolist() for sensor, spectrum in state['fft'].items()}
+    return payload
+
+
+def pack_array(values: np.ndarray, encoding: str = 'float32') -> Tuple[bytes, float]:
+    """
+    Empacota um array em bytes little-endian.
+    float32: escala 1.0; int16: valores = inteiro * escala (escala por array)
+    """
+    if encoding == 'float32':
+        return np.ascontiguousarray(values, dtype='<f4').tobytes(), 1.0
+
+    peak = float(np.max(np.abs(values))) if values.size else 0.0
+    scale = peak / 32767.0 if peak > 0 else 1.0
+    packed = np.round(np.asarray(values, dtype=np.float64) / scale).astype('<i2')
+    return packed.tobytes(), scale
+
+
+def to_binary_payload(state: Dict, encoding: str = 'float32') -> Dict:
+    """
+    Payload com espectros e formas de onda como anexos binários (typed arrays).
+
+    fft_binary:  (sensores, bins) na ordem de header['fft_channels']
+    time_binary: (6, amostras) na ordem de header['time_channels']
+    time_timestamps: uint32 little-endian (ms do ESP32)
+    """
+    if encoding not in BINARY_ENCODINGS:
+        raise ValueError(f"Codificação desconhecida: {encoding}")
+
+    sensors = list(state['fft'].keys())
+    spectra = np.vstack([state['fft'][sensor] for sensor in sensors])
+    signals = state['time_signals']
+
+    fft_bytes, fft_scale = pack_array(spectra, encoding)
+    time_bytes, time_scale = pack_array(signals, encoding)
+
+    payload = _metadata(state)
+    payload['binary_header'] = {
+        'version': BINARY_FORMAT_VERSION,
+        'dtype': encoding,
+        'bin_width': state['bin_width'],
+        'bins': int(spectra.shape[1]),
+        'fft_channels': sensors,
+        'fft_scale': fft_scale,
+        'time_channels': [f"{sensor}.{axis}" for sensor, axis in CHANNELS],
+        'time_samples': int(signals.shape[1]),
+        'time_scale': time_scale
+    }
+    payload['fft_binary'] = fft_bytes
+    payload['time_binary'] = time_bytes
+    payload['time_timestamps'] = np.asarray(state['time_timestamps'], dtype='<u4').tobytes()
+    return payload
+
+
+def encode_payload(state: Dict, mode: str = 'json', encoding: str = 'float32',
+                   max_freq: float = None, points: int = None) -> Dict:
+    """Recorta/decima os espectros e serializa o estado no modo pedido pelo cliente"""
+    state = shape_state(state, max_freq, points)
+    if mode == 'binary':
+        return to_binary_payload(state, encoding)
+    return to_json_payload(state)
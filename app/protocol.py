@@ -0,0 +1,233 @@
+"""
+PROTOCOLO SERIAL BINÁRIO (QUADROS COM CRC)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+
+Formato do quadro (little-endian, 34 bytes):
+    SYNC (u16 = 0xA55A) | SEQ (u16) | TIMESTAMP_MS (u32) |
+    M1_X, M1_Y, M1_Z, M2_X, M2_Y, M2_Z (6 x f32) | CRC16 (u16)
+
+O CRC é CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) sobre os 32 bytes
+que antecedem o campo CRC. Linhas de status ('#...\\n') continuam em texto
+e podem aparecer entre quadros.
+"""
+
+import numpy as np
+import logging
+import warnings
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SYNC_WORD = 0xA55A
+SYNC_BYTES = SYNC_WORD.to_bytes(2, 'little')
+
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('seq', '<u2'),
+    ('timestamp', '<u4'),
+    ('samples', '<f4', (6,)),
+    ('crc', '<u2')
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize  # 34 bytes
+CRC_SPAN = FRAME_SIZE - 2
+
+# Comandos de negociação (enviados ao ESP32 como RECALIBRAR/STATUS)
+FORMAT_COMMANDS = {'csv': 'CSV', 'binary': 'BINARIO'}
+FORMAT_ACK_PREFIX = 'FORMATO:'
+MAX_STATUS_LENGTH = 256
+
+
+def _build_crc_table() -> np.ndarray:
+    table = np.zeros(256, dtype=np.uint16)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table[i] = crc & 0xFFFF
+    return table
+
+
+CRC_TABLE = _build_crc_table()
+
+
+def crc16(data: bytes) -> int:
+    """CRC-16/CCITT-FALSE de um bloco de bytes (referência escalar)"""
+    crc = 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ int(CRC_TABLE[((crc >> 8) ^ byte) & 0xFF])
+    return crc
+
+
+def crc16_rows(rows: np.ndarray) -> np.ndarray:
+    """CRC-16 de cada linha de uma matriz (n, k) de bytes, vetorizado entre linhas"""
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint16)
+    for col in range(rows.shape[1]):
+        idx = ((crc >> 8) ^ rows[:, col]) & 0xFF
+        crc = (crc << 8) ^ CRC_TABLE[idx]
+    return crc
+
+
+@dataclass
+class SampleBlock:
+    """Bloco de amostras decodificadas: timestamps (n,) e valores (6, n)"""
+    timestamps: np.ndarray
+    values: np.ndarray
+    sequence: Optional[np.ndarray] = None
+    received_at: float = 0.0  # time.monotonic() da leitura serial
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+def encode_frames(seq: np.ndarray, timestamps: np.ndarray, values: np.ndarray) -> bytes:
+    """Codifica amostras (6, n) em quadros binários (usado em testes e simulação)"""
+    frames = np.zeros(len(timestamps), dtype=FRAME_DTYPE)
+    frames['sync'] = SYNC_WORD
+    frames['seq'] = seq
+    frames['timestamp'] = timestamps
+    frames['samples'] = np.asarray(values, dtype=np.float32).T
+    raw = frames.view(np.uint8).reshape(-1, FRAME_SIZE)
+    frames['crc'] = crc16_rows(raw[:, :CRC_SPAN])
+    return frames.tobytes()
+
+
+def parse_csv_lines(lines: List[bytes]) -> Tuple[Optional[SampleBlock], int]:
+    """
+    Converte um lote de linhas CSV (TIMESTAMP_MS,M1_X,...,M2_Z) em um bloco.
+    Retorna (bloco ou None, número de linhas inválidas descartadas).
+    """
+    rows = [line for line in lines if line.count(b',') == 6]
+    invalid = len(lines) - len(rows)
+    if not rows:
+        return None, invalid
+
+    try:
+        # Conversão numérica de todo o lote em uma única passada. Em um campo
+        # inválido, fromstring para (NumPy 1.x, com DeprecationWarning) ou
+        # levanta ValueError (2.x): lote íntegro rende 7 valores por linha
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            table = np.fromstring(b','.join(rows), sep=',')
+        if table.size != 7 * len(rows):
+            raise ValueError("lote CSV incompleto")
+        table = table.reshape(-1, 7)
+    except ValueError:
+        # Alguma linha corrompida (ou cabeçalho): separar linha a linha
+        parsed = []
+        for row in rows:
+            try:
+                parsed.append([float(field) for field in row.split(b',')])
+            except ValueError:
+                invalid += 1
+        if not parsed:
+            return None, invalid
+        table = np.array(parsed, dtype=np.float64)
+
+    block = SampleBlock(
+        timestamps=table[:, 0].astype(np.int64),
+        values=np.ascontiguousarray(table[:, 1:].T, dtype=np.float32)
+    )
+    return block, invalid
+
+
+class BinaryFrameDecoder:
+    """Decodifica fluxos de quadros binários em blocos, com ressincronização"""
+
+    def __init__(self):
+        self.pending = b''
+        self.crc_errors = 0
+        self.skipped_bytes = 0
+        self.lost_frames = 0
+        self.last_seq: Optional[int] = None
+
+    def reset(self) -> bytes:
+        """Limpa o estado e devolve bytes ainda não consumidos"""
+        leftover, self.pending = self.pending, b''
+        self.last_seq = None
+        return leftover
+
+    def feed(self, data: bytes) -> Tuple[Optional[SampleBlock], List[str]]:
+        """Consome bytes recebidos; retorna (bloco de amostras, linhas de status)"""
+        buf = self.pending + data
+        pos = 0
+        chunks = []
+        status_lines = []
+
+        while pos < len(buf):
+            if buf.startswith(SYNC_BYTES, pos):
+                count = (len(buf) - pos) // FRAME_SIZE
+                if count == 0:
+                    break  # Quadro incompleto: aguardar mais bytes
+
+                frames = np.frombuffer(buf, dtype=FRAME_DTYPE, count=count, offset=pos)
+                bad_sync = np.flatnonzero(frames['sync'] != SYNC_WORD)
+                if bad_sync.size:
+                    frames = frames[:bad_sync[0]]
+
+                raw = np.frombuffer(buf, dtype=np.uint8, count=len(frames) * FRAME_SIZE,
+                                    offset=pos).reshape(-1, FRAME_SIZE)
+                valid = crc16_rows(raw[:, :CRC_SPAN]) == frames['crc']
+                good = len(frames) if valid.all() else int(np.argmin(valid))
+
+                if good:
+                    chunks.append(frames[:good])
+                    pos += good * FRAME_SIZE
+                if good < len(frames):
+                    # Quadro corrompido (ou sync falso): avançar 1 byte e ressincronizar
+                    self.crc_errors += 1
+                    pos += 1
+                    self.skipped_bytes += 1
+                continue
+
+            if buf[pos] == 0x23:  # '#': linha de status em texto
+                end = buf.find(b'\n', pos, pos + MAX_STATUS_LENGTH)
+                if end < 0:
+                    if len(buf) - pos < MAX_STATUS_LENGTH:
+                        break  # Linha incompleta
+                else:
+                    try:
+                        text = buf[pos:end].decode('utf-8').strip()
+                    except UnicodeDecodeError:
+                        text = None
+                    # '#' dentro de dados binários não forma texto imprimível
+                    if text is not None and text.isprintable():
+                        status_lines.append(text)
+                        pos = end + 1
+                        continue
+
+            # Lixo (ou texto CSV residual): procurar próximo sync ou '#'
+            candidates = [i for i in (buf.find(SYNC_BYTES, pos + 1), buf.find(b'#', pos + 1)) if i >= 0]
+            if not candidates:
+                # Manter o último byte (pode ser a metade de um sync)
+                new_pos = max(pos, len(buf) - 1)
+                self.skipped_bytes += new_pos - pos
+                pos = new_pos
+                break
+            new_pos = min(candidates)
+            self.skipped_bytes += new_pos - pos
+            pos = new_pos
+
+        self.pending = buf[pos:]
+
+        if not chunks:
+            return None, status_lines
+
+        frames = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+        self._track_sequence(frames['seq'])
+        block = SampleBlock(
+            timestamps=frames['timestamp'].astype(np.int64),
+            values=np.ascontiguousarray(frames['samples'].T),
+            sequence=frames['seq'].copy()
+        )
+        return block, status_lines
+
+    def _track_sequence(self, seq: np.ndarray):
+        """Conta quadros perdidos a partir do número de sequência (u16 com wrap)"""
+        seq = seq.astype(np.int64)
+        if self.last_seq is not None:
+            seq = np.concatenate(([self.last_seq], seq))
+        gaps = (np.diff(seq) - 1) % 65536
+        self.lost_frames += int(gaps[gaps < 32768].sum())
+        self.last_seq = int(seq[-1])
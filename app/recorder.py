@@ -0,0 +1,397 @@
+"""
+GRAVADOR DE TESTES EM DISCO (AMOSTRAS BRUTAS + MÉTRICAS)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import os
+import csv
+import json
+import queue
+import threading
+import time
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from app.ring_buffer import CHANNELS, NUM_CHANNELS
+
+logger = logging.getLogger(__name__)
+
+RECORDING_FORMAT_VERSION = 1
+SESSION_FILE = 'session.json'
+SAMPLES_FILE = 'samples.bin'
+METRICS_FILE = 'metrics.bin'
+INDEX_FILE = 'index.bin'
+INDEX_INTERVAL = 1000  # Uma entrada do índice a cada N amostras (5 s a 200 Hz)
+
+# Registro de amostra bruta: timestamp do ESP32 (ms) + 6 canais na ordem de CHANNELS
+SAMPLE_RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('values', '<f4', (NUM_CHANNELS,))
+])
+
+# Métricas derivadas gravadas a 5 Hz (mesmas colunas do CSV exportado)
+METRIC_FIELDS = (
+    'dominant_freq', 'peak_amplitude', 'imbalance',
+    'rms1_x', 'rms1_y', 'rms1_z',
+    'rms2_x', 'rms2_y', 'rms2_z',
+    'buffer_usage', 'noise_level'
+)
+METRIC_RECORD_DTYPE = np.dtype(
+    [('wall_time', '<f8'), ('elapsed_ms', '<i8')] +
+    [(field, '<f4') for field in METRIC_FIELDS]
+)
+
+# Índice esparso: timestamp do ESP32 → número do registro em samples.bin
+INDEX_RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('record', '<i8')
+])
+
+CSV_HEADER = ['timestamp', 'elapsed_ms', 'time_formatted'] + list(METRIC_FIELDS)
+
+
+def _write_json(path: str, data: Dict):
+    """Grava JSON de forma atômica (arquivo temporário + rename)"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_session(session_dir: str) -> Dict:
+    """Lê o cabeçalho (session.json) de uma sessão"""
+    with open(os.path.join(session_dir, SESSION_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def truncate_partial_records(path: str, record_size: int) -> int:
+    """
+    Remove um registro incompleto no fim do arquivo (queda no meio da
+    escrita). Retorna o número de registros completos.
+    """
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    complete = size // record_size
+    if complete * record_size != size:
+        with open(path, 'r+b') as f:
+            f.truncate(complete * record_size)
+        logger.warning(f"{os.path.basename(path)}: {size - complete * record_size} bytes "
+                       f"de registro incompleto descartados")
+    return complete
+
+
+def recover_sessions(base_dir: str) -> List[str]:
+    """
+    Fecha sessões que ficaram com status 'recording' (processo encerrado sem
+    stop()): descarta registros incompletos e atualiza as contagens.
+    """
+    recovered = []
+    if not os.path.isdir(base_dir):
+        return recovered
+
+    for name in sorted(os.listdir(base_dir)):
+        session_dir = os.path.join(base_dir, name)
+        if not os.path.isfile(os.path.join(session_dir, SESSION_FILE)):
+            continue
+        try:
+            session = read_session(session_dir)
+            if session.get('status') != 'recording':
+                continue
+            session['samples'] = truncate_partial_records(
+                os.path.join(session_dir, SAMPLES_FILE), SAMPLE_RECORD_DTYPE.itemsize)
+            session['metrics'] = truncate_partial_records(
+                os.path.join(session_dir, METRICS_FILE), METRIC_RECORD_DTYPE.itemsize)
+            _recover_index(os.path.join(session_dir, INDEX_FILE), session['samples'])
+            session['status'] = 'recovered'
+            session['recovered_at'] = datetime.now().isoformat()
+            _write_json(os.path.join(session_dir, SESSION_FILE), session)
+            recovered.append(session_dir)
+            logger.warning(f"Sessão recuperada: {name} ({session['samples']} amostras, "
+                           f"{session['metrics']} métricas)")
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao recuperar sessão {name}: {e}")
+    return recovered
+
+
+def _recover_index(path: str, samples: int):
+    """Descarta entradas do índice que apontam além das amostras íntegras"""
+    entries = truncate_partial_records(path, INDEX_RECORD_DTYPE.itemsize)
+    if entries == 0:
+        return
+    index = np.fromfile(path, dtype=INDEX_RECORD_DTYPE)
+    valid = int(np.searchsorted(index['record'], samples))
+    if valid < entries:
+        with open(path, 'r+b') as f:
+            f.truncate(valid * INDEX_RECORD_DTYPE.itemsize)
+
+
+def iter_records(path: str, dtype: np.dtype, chunk_records: int = 10000):
+    """Lê um arquivo de registros em blocos (memória limitada)"""
+    if not os.path.exists(path):
+        return
+    total = os.path.getsize(path) // dtype.itemsize
+    with open(path, 'rb') as f:
+        for start in range(0, total, chunk_records):
+            count = min(chunk_records, total - start)
+            yield np.fromfile(f, dtype=dtype, count=count)
+
+
+def export_metrics_csv(session_dir: str, csv_path: str, chunk_records: int = 10000) -> int:
+    """Exporta as métricas de uma sessão para CSV em blocos; retorna o nº de linhas"""
+    rows = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for chunk in iter_records(os.path.join(session_dir, METRICS_FILE),
+                                  METRIC_RECORD_DTYPE, chunk_records):
+            columns = [chunk[field].tolist() for field in METRIC_FIELDS]
+            for i, (wall_time, elapsed_ms) in enumerate(zip(chunk['wall_time'].tolist(),
+                                                            chunk['elapsed_ms'].tolist())):
+                moment = datetime.fromtimestamp(wall_time)
+                writer.writerow([moment.isoformat(), elapsed_ms, moment.strftime('%H:%M:%S')] +
+                                [column[i] for column in columns])
+            rows += len(chunk)
+    return rows
+
+
+def export_samples_csv(session_dir: str, csv_path: str, chunk_records: int = 10000) -> int:
+    """Exporta as amostras brutas de uma sessão para CSV em blocos"""
+    rows = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['timestamp'] + [f"{sensor}_{axis}" for sensor, axis in CHANNELS])
+        for chunk in iter_records(os.path.join(session_dir, SAMPLES_FILE),
+                                  SAMPLE_RECORD_DTYPE, chunk_records):
+            writer.writerows(
+                [ts] + values
+                for ts, values in zip(chunk['timestamp'].tolist(), chunk['values'].tolist())
+            )
+            rows += len(chunk)
+    return rows
+
+
+class TestRecorder:
+    """
+    Grava amostras brutas e métricas de um teste em arquivos binários
+    append-only (registros de tamanho fixo) dentro de uma pasta de sessão.
+
+    A thread de processamento só enfileira blocos; uma thread de escrita
+    grava em disco e faz flush/fsync periodicamente. A fila é limitada:
+    se o disco não acompanhar, blocos são descartados e contados em vez de
+    a memória crescer. Um registro incompleto no fim do arquivo (queda de
+    energia, processo encerrado) é descartado por recover_sessions().
+    """
+
+    def __init__(self, base_dir: str, sample_rate: float = 200.0,
+                 max_queue_chunks: int = 512, flush_interval: float = 1.0):
+        self.base_dir = base_dir
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue_chunks)
+
+        self.session_dir: Optional[str] = None
+        self.session: Optional[Dict] = None
+        self.thread: Optional[threading.Thread] = None
+        self.recording = False
+
+        self.samples_written = 0
+        self.metrics_written = 0
+        self.dropped_chunks = 0
+        self.dropped_samples = 0
+        self.write_errors = 0
+
+    # ---------- Controle da sessão ----------
+
+    def start(self, metadata: Dict = None) -> str:
+        """Cria uma nova sessão e inicia a thread de escrita; retorna a pasta"""
+        if self.recording:
+            self.stop()
+
+        name = f"teste_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        session_dir = os.path.join(self.base_dir, name)
+        suffix = 1
+        while os.path.exists(session_dir):
+            suffix += 1
+            session_dir = os.path.join(self.base_dir, f"{name}_{suffix}")
+        os.makedirs(session_dir)
+
+        self.session_dir = session_dir
+        self.session = {
+            'format_version': RECORDING_FORMAT_VERSION,
+            'status': 'recording',
+            'started_at': datetime.now().isoformat(),
+            'sample_rate': self.sample_rate,
+            'sample_dtype': SAMPLE_RECORD_DTYPE.descr,
+            'metric_dtype': METRIC_RECORD_DTYPE.descr,
+            'index_interval': INDEX_INTERVAL,
+            'samples': 0,
+            'metrics': 0,
+            'metadata': metadata or {}
+        }
+        _write_json(os.path.join(session_dir, SESSION_FILE), self.session)
+
+        self.samples_written = 0
+        self.metrics_written = 0
+        self.dropped_chunks = 0
+        self.dropped_samples = 0
+        self.write_errors = 0
+
+        # Blocos enfileirados após o stop() da sessão anterior não pertencem a esta
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+        self.recording = True
+        self.thread = threading.Thread(target=self._writer_loop, args=(session_dir,), daemon=True)
+        self.thread.start()
+        logger.info(f"Gravação iniciada: {session_dir}")
+        return session_dir
+
+    def stop(self) -> Optional[Dict]:
+        """Esvazia a fila, fecha os arquivos e marca a sessão como concluída"""
+        if not self.recording:
+            return self.session
+        self.recording = False
+        self.queue.put(None)  # Sentinela: a thread de escrita termina após esvaziar a fila
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        self.session.update({
+            'status': 'closed',
+            'stopped_at': datetime.now().isoformat(),
+            'samples': self.samples_written,
+            'metrics': self.metrics_written,
+            'dropped_samples': self.dropped_samples,
+            'write_errors': self.write_errors
+        })
+        _write_json(os.path.join(self.session_dir, SESSION_FILE), self.session)
+        logger.info(f"Gravação finalizada: {self.samples_written} amostras, "
+                    f"{self.metrics_written} métricas")
+        return self.session
+
+    # ---------- Escrita (thread de processamento) ----------
+
+    def write_samples(self, timestamps: Sequence[int], values: np.ndarray):
+        """Enfileira um bloco de amostras brutas (timestamps: (n,), values: (6, n))"""
+        if not self.recording:
+            return
+        n = len(timestamps)
+        if n == 0:
+            return
+        chunk = np.empty(n, dtype=SAMPLE_RECORD_DTYPE)
+        chunk['timestamp'] = timestamps
+        chunk['values'] = np.asarray(values).T
+        self._enqueue(SAMPLES_FILE, chunk)
+
+    def write_metrics(self, wall_time: float, elapsed_ms: int, metrics: Sequence[float]):
+        """Enfileira uma linha de métricas na ordem de METRIC_FIELDS"""
+        if not self.recording:
+            return
+        record = np.empty(1, dtype=METRIC_RECORD_DTYPE)
+        record['wall_time'] = wall_time
+        record['elapsed_ms'] = elapsed_ms
+        for field, value in zip(METRIC_FIELDS, metrics):
+            record[field] = value
+        self._enqueue(METRICS_FILE, record)
+
+    def _enqueue(self, filename: str, chunk: np.ndarray):
+        try:
+            self.queue.put_nowait((filename, chunk))
+        except queue.Full:
+            # Disco não acompanha: descartar em vez de crescer a memória
+            self.dropped_chunks += 1
+            if filename == SAMPLES_FILE:
+                self.dropped_samples += len(chunk)
+            if self.dropped_chunks == 1 or self.dropped_chunks % 100 == 0:
+                logger.warning(f"Fila de gravação cheia: {self.dropped_chunks} blocos descartados")
+
+    # ---------- Thread de escrita ----------
+
+    def _writer_loop(self, session_dir: str):
+        files = {
+            SAMPLES_FILE: open(os.path.join(session_dir, SAMPLES_FILE), 'ab'),
+            METRICS_FILE: open(os.path.join(session_dir, METRICS_FILE), 'ab'),
+            INDEX_FILE: open(os.path.join(session_dir, INDEX_FILE), 'ab')
+        }
+        last_flush = time.monotonic()
+        done = False
+        try:
+            while not done:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = False
+
+                # Esvaziar o que já está na fila antes de escrever
+                items = [] if item is False else [item]
+                while True:
+                    try:
+                        items.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for entry in items:
+                    if entry is None:
+                        done = True
+                        continue
+                    self._write_chunk(files, *entry)
+
+                now = time.monotonic()
+                if done or now - last_flush >= self.flush_interval:
+                    self._flush(files)
+                    last_flush = now
+        finally:
+            for f in files.values():
+                f.close()
+
+    def _write_chunk(self, files: Dict, filename: str, chunk: np.ndarray):
+        try:
+            files[filename].write(chunk.tobytes())
+            if filename == SAMPLES_FILE:
+                self._write_index(files[INDEX_FILE], chunk)
+                self.samples_written += len(chunk)
+            else:
+                self.metrics_written += len(chunk)
+        except OSError as e:
+            self.write_errors += 1
+            logger.error(f"Erro ao gravar {filename}: {e}")
+
+    def _write_index(self, index_file, chunk: np.ndarray):
+        """Entradas do índice para os registros múltiplos de INDEX_INTERVAL do bloco"""
+        first = self.samples_written
+        start = -(-first // INDEX_INTERVAL) * INDEX_INTERVAL
+        records = np.arange(start, first + len(chunk), INDEX_INTERVAL)
+        if records.size == 0:
+            return
+        entries = np.empty(records.size, dtype=INDEX_RECORD_DTYPE)
+        entries['record'] = records
+        entries['timestamp'] = chunk['timestamp'][records - first]
+        index_file.write(entries.tobytes())
+
+    def _flush(self, files: Dict):
+        for f in files.values():
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError as e:
+                self.write_errors += 1
+                logger.error(f"Erro no flush da gravação: {e}")
+
+    # ---------- Consulta ----------
+
+    def get_status(self) -> Dict:
+        return {
+            'recording': self.recording,
+            'session': os.path.basename(self.session_dir) if self.session_dir else None,
+            'samples_written': self.samples_written,
+            'metrics_written': self.metrics_written,
+            'queued_chunks': self.queue.qsize(),
+            'dropped_samples': self.dropped_samples,
+            'write_errors': self.write_errors
+        }
@@ -0,0 +1,180 @@
+"""
+LEITURA DE GRAVAÇÕES (MEMORY-MAP + ÍNDICE DE TEMPO)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import os
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from app.ring_buffer import CHANNELS, CHANNEL_INDEX
+from app.recorder import (SAMPLES_FILE, INDEX_FILE, INDEX_INTERVAL, SESSION_FILE,
+                          SAMPLE_RECORD_DTYPE, INDEX_RECORD_DTYPE, read_session)
+
+logger = logging.getLogger(__name__)
+
+ChannelSpec = Union[None, int, str, Sequence[Union[int, str]]]
+
+
+def parse_channel(channel: Union[int, str]) -> int:
+    """'m1.x' / 'm1_x' / índice (também em texto, como vem da query) → linha na ordem de CHANNELS"""
+    if isinstance(channel, str) and channel.isdigit():
+        channel = int(channel)
+    if isinstance(channel, (int, np.integer)):
+        if not 0 <= channel < len(CHANNELS):
+            raise ValueError(f"Canal inválido: {channel}")
+        return int(channel)
+    sensor, _, axis = str(channel).replace('_', '.').partition('.')
+    if (sensor, axis) not in CHANNEL_INDEX:
+        raise ValueError(f"Canal inválido: {channel}")
+    return CHANNEL_INDEX[(sensor, axis)]
+
+
+def channel_selector(channels: ChannelSpec) -> Tuple[Union[int, slice, List[int]], List[str]]:
+    """
+    Converte a seleção de canais em um índice NumPy. Canais consecutivos
+    viram slice (view sem cópia); seleções arbitrárias exigem cópia.
+    """
+    if channels is None:
+        rows = list(range(len(CHANNELS)))
+    elif isinstance(channels, (int, str, np.integer)):
+        rows = [parse_channel(channels)]
+    else:
+        rows = [parse_channel(channel) for channel in channels]
+    if not rows:
+        raise ValueError("Nenhum canal selecionado")
+
+    names = [f"{CHANNELS[row][0]}.{CHANNELS[row][1]}" for row in rows]
+    if rows == list(range(rows[0], rows[-1] + 1)):
+        return slice(rows[0], rows[-1] + 1), names
+    return rows, names
+
+
+class RecordingReader:
+    """
+    Acesso aleatório a uma sessão gravada pelo TestRecorder.
+
+    samples.bin é mapeado em memória (np.memmap) e o índice esparso
+    (timestamp → registro a cada INDEX_INTERVAL amostras) localiza uma
+    janela com duas buscas binárias: no índice e dentro de um único trecho
+    de INDEX_INTERVAL registros. O custo é proporcional à janela lida, não
+    ao tamanho do arquivo. Pressupõe timestamps não decrescentes (o millis()
+    do ESP32 só volta a zero se a placa reiniciar no meio da gravação).
+    """
+
+    def __init__(self, session_dir: str):
+        self.session_dir = session_dir
+        self.session = read_session(session_dir)
+        self.samples_path = os.path.join(session_dir, SAMPLES_FILE)
+        self.index_path = os.path.join(session_dir, INDEX_FILE)
+        self.index_interval = int(self.session.get('index_interval', INDEX_INTERVAL))
+        self.records: Optional[np.ndarray] = None
+        self.index: Optional[np.ndarray] = None
+        self.refresh()
+
+    def __len__(self) -> int:
+        return 0 if self.records is None else len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def refresh(self):
+        """Remapeia o arquivo (sessão em gravação cresce continuamente)"""
+        size = os.path.getsize(self.samples_path) if os.path.exists(self.samples_path) else 0
+        count = size // SAMPLE_RECORD_DTYPE.itemsize
+        if count == 0:
+            self.records = np.empty(0, dtype=SAMPLE_RECORD_DTYPE)
+        else:
+            self.records = np.memmap(self.samples_path, dtype=SAMPLE_RECORD_DTYPE,
+                                     mode='r', shape=(count,))
+        self.index = self._load_index(count)
+
+    def close(self):
+        self.records = None
+        self.index = None
+
+    def _load_index(self, count: int) -> np.ndarray:
+        """Índice gravado em disco; sem ele, amostrar os timestamps do memmap"""
+        index = None
+        if os.path.exists(self.index_path):
+            entries = os.path.getsize(self.index_path) // INDEX_RECORD_DTYPE.itemsize
+            if entries:
+                index = np.fromfile(self.index_path, dtype=INDEX_RECORD_DTYPE, count=entries)
+                index = index[index['record'] < count]
+
+        expected = -(-count // self.index_interval)
+        if index is None or len(index) < expected:
+            # Sessões antigas ou índice incompleto: leitura estridada (1 a cada N registros)
+            records = np.arange(0, count, self.index_interval)
+            index = np.empty(records.size, dtype=INDEX_RECORD_DTYPE)
+            index['record'] = records
+            index['timestamp'] = self.records['timestamp'][::self.index_interval]
+        return index
+
+    # ---------- Consulta ----------
+
+    def time_range(self) -> Tuple[int, int]:
+        """Primeiro e último timestamp (ms do ESP32) gravados"""
+        if len(self) == 0:
+            return 0, 0
+        return int(self.records['timestamp'][0]), int(self.records['timestamp'][-1])
+
+    def locate(self, timestamp_ms: int, side: str = 'left') -> int:
+        """Registro onde timestamp_ms seria inserido (como np.searchsorted)"""
+        if len(self) == 0:
+            return 0
+        block = int(np.searchsorted(self.index['timestamp'], timestamp_ms, side=side))
+        first = int(self.index['record'][block - 1]) if block > 0 else 0
+        last = int(self.index['record'][block]) if block < len(self.index) else len(self)
+        # Busca binária só dentro do trecho entre duas entradas do índice
+        timestamps = self.records['timestamp'][first:last]
+        return first + int(np.searchsorted(timestamps, timestamp_ms, side=side))
+
+    def read(self, start_ms: int, end_ms: int,
+             channels: ChannelSpec = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Amostras com start_ms <= timestamp <= end_ms.
+        Retorna (timestamps (n,), valores (canais, n)) como views do memmap;
+        canais consecutivos (ou um só) não geram cópia.
+        """
+        selector, _ = channel_selector(channels)
+        first = self.locate(start_ms, 'left')
+        last = self.locate(end_ms, 'right')
+        window = self.records[first:max(first, last)]
+        values = window['values'].T  # (6, n), view estridada
+        return window['timestamp'], values[selector]
+
+    def info(self) -> Dict:
+        start, end = self.time_range()
+        return {
+            'name': os.path.basename(self.session_dir),
+            'status': self.session.get('status'),
+            'started_at': self.session.get('started_at'),
+            'sample_rate': self.session.get('sample_rate'),
+            'samples': len(self),
+            'start_ms': start,
+            'end_ms': end,
+            'duration_s': (end - start) / 1000.0
+        }
+
+
+def list_recordings(base_dir: str) -> List[Dict]:
+    """Resumo das sessões gravadas em base_dir (mais recentes primeiro)"""
+    recordings = []
+    if not os.path.isdir(base_dir):
+        return recordings
+    for name in sorted(os.listdir(base_dir), reverse=True):
+        session_dir = os.path.join(base_dir, name)
+        if not os.path.isfile(os.path.join(session_dir, SESSION_FILE)):
+            continue
+        try:
+            with RecordingReader(session_dir) as reader:
+                recordings.append(reader.info())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Sessão ilegível {name}: {e}")
+    return recordings
@@ -0,0 +1,247 @@
+"""
+BUFFER CIRCULAR DE AMOSTRAS (NUMPY)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Ordem fixa dos canais (channel-major): m1 x/y/z, m2 x/y/z
+CHANNELS: List[Tuple[str, str]] = [
+    ('m1', 'x'), ('m1', 'y'), ('m1', 'z'),
+    ('m2', 'x'), ('m2', 'y'), ('m2', 'z')
+]
+NUM_CHANNELS = len(CHANNELS)
+CHANNEL_INDEX: Dict[Tuple[str, str], int] = {ch: i for i, ch in enumerate(CHANNELS)}
+
+
+def channel_index(sensor: str, axis: str) -> int:
+    """Retorna a linha do buffer correspondente a um sensor/eixo"""
+    return CHANNEL_INDEX[(sensor, axis)]
+
+
+def samples_to_dicts(timestamps: np.ndarray, values: np.ndarray) -> List[Dict]:
+    """Converte timestamps (n,) e valores (6, n) para a lista de dicionários legada"""
+    timestamps = timestamps.tolist()
+    m1x, m1y, m1z, m2x, m2y, m2z = values.tolist()
+    return [
+        {
+            'timestamp': timestamps[i],
+            'm1': {'x': m1x[i], 'y': m1y[i], 'z': m1z[i]},
+            'm2': {'x': m2x[i], 'y': m2y[i], 'z': m2z[i]}
+        }
+        for i in range(len(timestamps))
+    ]
+
+
+class SampleRingBuffer:
+    """
+    Buffer circular de capacidade fixa para as 6 séries + timestamp.
+
+    Os dados ficam em arrays (canal, tempo) com o dobro da capacidade: cada
+    amostra é escrita na posição i e no espelho i + capacidade. Assim as
+    últimas N amostras são sempre uma fatia contígua (view sem cópia).
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity deve ser positiva")
+        self.capacity = capacity
+        self.values = np.zeros((NUM_CHANNELS, 2 * capacity), dtype=np.float32)
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self.head = 0          # Próxima posição de escrita
+        self.count = 0         # Amostras válidas no buffer
+        self.total_written = 0 # Amostras escritas desde o último clear()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, timestamp: int, sample: Sequence[float]):
+        """Adiciona uma amostra (6 valores na ordem de CHANNELS) em O(1)"""
+        head = self.head
+        mirror = head + self.capacity
+        self.values[:, head] = sample
+        self.values[:, mirror] = sample
+        self.timestamps[head] = timestamp
+        self.timestamps[mirror] = timestamp
+
+        self.head = (head + 1) % self.capacity
+        self.total_written += 1
+        if self.count < self.capacity:
+            self.count += 1
+
+    def append_block(self, timestamps: np.ndarray, values: np.ndarray):
+        """Adiciona um bloco (timestamps: (n,), values: (6, n)) de forma vetorizada"""
+        n = len(timestamps)
+        if n == 0:
+            return
+        self.total_written += n
+
+        # Blocos maiores que o buffer: só as últimas amostras sobrevivem
+        if n > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            values = values[:, -self.capacity:]
+            self.head = (self.head + n - self.capacity) % self.capacity
+            n = self.capacity
+
+        positions = (self.head + np.arange(n)) % self.capacity
+        self.values[:, positions] = values
+        self.values[:, positions + self.capacity] = values
+        self.timestamps[positions] = timestamps
+        self.timestamps[positions + self.capacity] = timestamps
+
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+
+    def latest(self, n: int = None) -> np.ndarray:
+        """View (6, n) das últimas n amostras, em ordem cronológica"""
+        n = self.count if n is None else min(n, self.count)
+        end = self.head + self.capacity
+        return self.values[:, end - n:end]
+
+    def latest_timestamps(self, n: int = None) -> np.ndarray:
+        """View (n,) dos timestamps das últimas n amostras"""
+        n = self.count if n is None else min(n, self.count)
+        end = self.head + self.capacity
+        return self.timestamps[end - n:end]
+
+    def channel(self, sensor: str, axis: str, n: int = None) -> np.ndarray:
+        """View das últimas n amostras de um sensor/eixo"""
+        return self.latest(n)[channel_index(sensor, axis)]
+
+    def to_dicts(self, n: int) -> List[Dict]:
+        """Converte as últimas n amostras para o formato de dicionário legado"""
+        return samples_to_dicts(self.latest_timestamps(n), self.latest(n))
+
+    def clear(self):
+        """Descarta todas as amostras (sem realocar memória)"""
+        self.head = 0
+        self.count = 0
+        self.total_written = 0
+
+
+class SharedSampleRingBuffer(SampleRingBuffer):
+    """
+    SampleRingBuffer em memória compartilhada (multiprocessing.shared_memory),
+    legível por outros processos sem cópia pelo pipe.
+
+    Layout do bloco: cabeçalho int64 [seq, head, count, total_written],
+    timestamps (2 × capacidade) e valores (6, 2 × capacidade). Um único
+    processo escreve; as escritas são protegidas por um seqlock (seq ímpar
+    durante a escrita) e os leitores usam snapshot(), que repete a cópia se
+    seq mudou no meio dela.
+    """
+
+    HEADER_FIELDS = 4  # seq, head, count, total_written
+
+    def __init__(self, capacity: int, name: str = None, create: bool = True):
+        if capacity <= 0:
+            raise ValueError("capacity deve ser positiva")
+        self.capacity = capacity
+        self.owner = create
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                                  size=self.shared_size(capacity))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        buffer = self.shm.buf
+        self.header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=buffer)
+        offset = self.header.nbytes
+        self.timestamps = np.ndarray((2 * capacity,), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += self.timestamps.nbytes
+        self.values = np.ndarray((NUM_CHANNELS, 2 * capacity), dtype=np.float32,
+                                 buffer=buffer, offset=offset)
+        if create:
+            self.header[:] = 0
+
+    @staticmethod
+    def shared_size(capacity: int) -> int:
+        return (SharedSampleRingBuffer.HEADER_FIELDS * 8 + 2 * capacity * 8
+                + NUM_CHANNELS * 2 * capacity * 4)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # Estado do buffer vive no cabeçalho compartilhado
+    @property
+    def head(self) -> int:
+        return int(self.header[1])
+
+    @head.setter
+    def head(self, value: int):
+        self.header[1] = value
+
+    @property
+    def count(self) -> int:
+        return int(self.header[2])
+
+    @count.setter
+    def count(self, value: int):
+        self.header[2] = value
+
+    @property
+    def total_written(self) -> int:
+        return int(self.header[3])
+
+    @total_written.setter
+    def total_written(self, value: int):
+        self.header[3] = value
+
+    # ---------- Escrita (processo dono) ----------
+
+    def append(self, timestamp: int, sample: Sequence[float]):
+        self.header[0] += 1
+        try:
+            super().append(timestamp, sample)
+        finally:
+            self.header[0] += 1
+
+    def append_block(self, timestamps: np.ndarray, values: np.ndarray):
+        self.header[0] += 1
+        try:
+            super().append_block(timestamps, values)
+        finally:
+            self.header[0] += 1
+
+    def clear(self):
+        self.header[0] += 1
+        try:
+            super().clear()
+        finally:
+            self.header[0] += 1
+
+    # ---------- Leitura (qualquer processo) ----------
+
+    def snapshot(self, out: Optional[SampleRingBuffer] = None,
+                 timeout: float = 1.0) -> SampleRingBuffer:
+        """Cópia consistente em um SampleRingBuffer local (reaproveita `out`)"""
+        if out is None or out.capacity != self.capacity:
+            out = SampleRingBuffer(self.capacity)
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = int(self.header[0])
+            if not seq & 1:
+                head, count, total = self.header[1:].tolist()
+                np.copyto(out.values, self.values)
+                np.copyto(out.timestamps, self.timestamps)
+                if int(self.header[0]) == seq:
+                    out.head, out.count, out.total_written = head, count, total
+                    return out
+            if time.monotonic() > deadline:
+                raise TimeoutError("Buffer compartilhado em escrita contínua")
+            time.sleep(0.0001)
+
+    def close(self):
+        """Solta as views e o mapeamento; o dono também remove o bloco"""
+        if self.shm is None:
+            return
+        self.header = self.timestamps = self.values = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
@@ -10,21 +10,37 @@ import threading
 import time
 import queue
 import logging
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, List, Union
+
+from app.protocol import (BinaryFrameDecoder, SampleBlock, parse_csv_lines,
+                          FORMAT_COMMANDS, FORMAT_ACK_PREFIX)
+from app.metrics import METRICS
+from app.ingest_queue import IngestQueue, IngestGap
 
 logger = logging.getLogger(__name__)
 
 class SerialReader:
     """Gerencia comunicação serial com ESP32"""
     
-    def __init__(self, baudrate: int = 921600, timeout: int = 1):
+    def __init__(self, baudrate: int = 921600, timeout: int = 1,
+                 data_format: str = 'csv', bulk_ingest: bool = True, ingest: Dict = None):
         self.baudrate = baudrate
         self.timeout = timeout
+        self.bulk_ingest = bulk_ingest       # Leitura em blocos (in_waiting) e parse em lote
+        self.requested_format = data_format  # Formato desejado ('csv' ou 'binary')
+        self.data_format = 'csv'             # Formato efetivamente em uso
+        self.decoder = BinaryFrameDecoder()
         self.serial_conn: Optional[serial.Serial] = None
         self.running = False
-        self.data_queue = queue.Queue()
+        # Fila limitada em amostras (ver IngestQueue; ingest = INGEST_CONFIG)
+        self.data_queue = IngestQueue(**(ingest or {}))
+        self.connected_event = threading.Event()  # Acorda o processamento ao conectar
+        self.status_queue = queue.Queue()    # Linhas '#' (modos em bloco)
+        self.on_data: Optional[Callable[[], None]] = None  # Avisado a cada item enfileirado
+        self.partial_line = b''              # Linha incompleta entre leituras
         self.reader_thread: Optional[threading.Thread] = None
         self.bytes_received = 0
+        self.invalid_lines = 0
         self.start_time = time.time()
         
     def list_ports(self) -> List[str]:
@@ -48,6 +64,9 @@ class SerialReader:
             
             time.sleep(2)  # Aguardar conexão
             self.serial_conn.reset_input_buffer()
+            self.data_format = 'csv'
+            self.decoder.reset()
+            self.partial_line = b''
             
             # Iniciar thread de leitura
             self.running = True
@@ -55,7 +74,12 @@ class SerialReader:
             self.reader_thread.daemon = True
             self.reader_thread.start()
             
+            self.connected_event.set()
             logger.info(f"Conectado à porta serial: {port}")
+            
+            # Negociar formato binário (firmware antigo não responde: segue em CSV)
+            if self.requested_format != 'csv':
+                self.request_format(self.requested_format)
             return True
             
         except Exception as e:
@@ -65,6 +89,7 @@ class SerialReader:
     def disconnect(self):
         """Desconecta da porta serial"""
         self.running = False
+        self.connected_event.clear()
         if self.serial_conn and self.serial_conn.is_open:
             self.serial_conn.close()
             logger.info("Desconectado da porta serial")
@@ -78,29 +103,175 @@ class SerialReader:
             except Exception as e:
                 logger.error(f"Erro ao enviar comando: {e}")
     
+    def request_format(self, data_format: str):
+        """Solicita ao ESP32 a troca de formato (efetivada ao receber #FORMATO:)"""
+        if data_format not in FORMAT_COMMANDS:
+            raise ValueError(f"Formato desconhecido: {data_format}")
+        self.requested_format = data_format
+        self.send_command(FORMAT_COMMANDS[data_format])
+    
+    def _handle_format_ack(self, line: str) -> bool:
+        """Troca o decodificador quando o firmware confirma o formato"""
+        message = line.lstrip('#').strip()
+        if not message.startswith(FORMAT_ACK_PREFIX):
+            return False
+        
+        value = message[len(FORMAT_ACK_PREFIX):].strip().upper()
+        for data_format, command in FORMAT_COMMANDS.items():
+            if value == command and data_format != self.data_format:
+                self.data_format = data_format
+                self.decoder.reset()
+                self.partial_line = b''
+                logger.info(f"Formato serial ativo: {data_format}")
+                return True
+        return False
+    
     def _read_loop(self):
         """Loop de leitura serial em thread separada"""
         while self.running and self.serial_conn and self.serial_conn.is_open:
             try:
-                line = self.serial_conn.readline().decode('utf-8').strip()
+                if self.data_format == 'binary':
+                    self._read_binary_chunk()
+                    continue
+                
+                if self.bulk_ingest:
+                    self._read_csv_chunk()
+                    continue
+                
+                with METRICS.time('serial_read'):
+                    line = self.serial_conn.readline().decode('utf-8').strip()
                 if line:
-                    self.data_queue.put(line)
+                    METRICS.inc('serial_bytes', len(line) + 1)
+                    self._enqueue(line)
                     self.bytes_received += len(line)
+                    if line.startswith('#'):
+                        self._handle_format_ack(line)
             except UnicodeDecodeError:
                 continue  # Ignorar linhas com decode inválido
             except Exception as e:
                 logger.error(f"Erro na leitura serial: {e}")
                 time.sleep(0.1)
     
-    def get_data(self, timeout: float = 0.1) -> Optional[str]:
+    def _read_binary_chunk(self):
+        """Lê tudo o que estiver disponível e decodifica os quadros de uma vez"""
+        with METRICS.time('serial_read'):
+            chunk = self.serial_conn.read(max(1, self.serial_conn.in_waiting))
+        if not chunk:
+            return
+        self.bytes_received += len(chunk)
+        METRICS.inc('serial_bytes', len(chunk))
+        
+        self._decode_binary(chunk, time.monotonic())
+    
+    def _decode_binary(self, data: bytes, received_at: float):
+        """Decodifica bytes binários e encaminha bloco e linhas de status"""
+        with METRICS.time('parse'):
+            block, status_lines = self.decoder.feed(data)
+        if block is not None:
+            block.received_at = received_at
+            self._enqueue(block)
+        for line in status_lines:
+            self._enqueue_status(line[1:].strip())
+            # Ao voltar para CSV, linhas que vieram no mesmo bloco da confirmação
+            # já foram descartadas pelo decodificador como bytes inválidos
+            self._handle_format_ack(line)
+    
+    def _read_csv_chunk(self):
+        """Lê tudo o que estiver disponível e converte as linhas completas em um bloco"""
+        with METRICS.time('serial_read'):
+            chunk = self.serial_conn.read(max(1, self.serial_conn.in_waiting))
+        if not chunk:
+            return
+        self.bytes_received += len(chunk)
+        METRICS.inc('serial_bytes', len(chunk))
+        received_at = time.monotonic()
+        
+        buffer = self.partial_line + chunk
+        lines = buffer.split(b'\n')
+        partial = lines.pop()  # Última linha pode estar incompleta
+        self.partial_line = partial
+        
+        if b'#' not in buffer:
+            # Caminho rápido: apenas dados
+            self._queue_csv_lines(lines, received_at)
+            return
+        
+        # Separar linhas de status das linhas de dados
+        data_lines = []
+        for i, line in enumerate(lines):
+            if not line.startswith(b'#'):
+                data_lines.append(line)
+                continue
+            
+            message = line.decode('utf-8', errors='replace').strip()
+            self._enqueue_status(message[1:].strip())
+            if self._handle_format_ack(message):
+                # Firmware passou a enviar binário: o restante do bloco é binário
+                self._queue_csv_lines(data_lines, received_at)
+                remainder = b'\n'.join(lines[i + 1:] + [partial])
+                if remainder:
+                    self._decode_binary(remainder, received_at)
+                return
+        
+        self._queue_csv_lines(data_lines, received_at)
+    
+    def _queue_csv_lines(self, lines: List[bytes], received_at: float):
+        """Converte um lote de linhas CSV e coloca o bloco na fila"""
+        lines = [line.strip() for line in lines]
+        lines = [line for line in lines if line]
+        if not lines:
+            return
+        with METRICS.time('parse'):
+            block, invalid = parse_csv_lines(lines)
+        self.invalid_lines += invalid
+        if block is not None:
+            block.received_at = received_at
+            self._enqueue(block)
+    
+    def _enqueue(self, item: Union[str, SampleBlock]):
+        """Coloca um item na fila de dados e avisa o consumidor (se houver)"""
+        if self.data_queue.put(item) and self.on_data is not None:
+            self.on_data()
+    
+    def _enqueue_status(self, message: str):
+        self.status_queue.put(message)
+        if self.on_data is not None:
+            self.on_data()
+    
+    def get_data(self, timeout: float = 0.1) -> Optional[Union[str, SampleBlock, IngestGap]]:
         """Obtém dados da fila (não-bloqueante)"""
         try:
             return self.data_queue.get(timeout=timeout)
         except queue.Empty:
             return None
     
-    def get_all_data(self) -> List[str]:
-        """Obtém todos os dados disponíveis na fila"""
+    def wait_until_connected(self, timeout: float = None) -> bool:
+        """Bloqueia até haver conexão (ou timeout); retorna se está conectado"""
+        return self.connected_event.wait(timeout)
+    
+    def get_batch(self, timeout: float = 0.5,
+                  max_items: int = 1000) -> List[Union[str, SampleBlock, IngestGap]]:
+        """
+        Espera pelo primeiro item (até timeout) e drena o que mais estiver
+        na fila, em lote. Retorna lista vazia se nada chegou.
+        """
+        try:
+            batch = [self.data_queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        
+        while len(batch) < max_items:
+            try:
+                batch.append(self.data_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def get_all_data(self) -> List[Union[str, SampleBlock, IngestGap]]:
+        """
+        Obtém todos os dados disponíveis na fila (linhas CSV/status, blocos
+        binários e marcadores IngestGap onde houve descarte por sobrecarga)
+        """
         data = []
         while not self.data_queue.empty():
             try:
@@ -115,6 +286,16 @@ class SerialReader:
             
         return data
     
+    def get_status_messages(self) -> List[str]:
+        """Obtém as mensagens de status ('#...') recebidas nos modos em bloco"""
+        messages = []
+        while not self.status_queue.empty():
+            try:
+                messages.append(self.status_queue.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+    
     def is_connected(self) -> bool:
         """Verifica se está conectado"""
         return self.serial_conn is not None and self.serial_conn.is_open
@@ -0,0 +1,508 @@
+"""
+FONTES DE DADOS SIMULADAS (REPLAY, GERADOR SINTÉTICO, EMULADOR DO FIRMWARE)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+
+Permitem testar o pipeline completo sem ESP32:
+    ReplaySource     - reproduz gravações (sessão, CSV ou captura binária)
+    SyntheticSource  - gera tons, harmônicos, ruído e falhas sintéticos
+    FirmwareEmulator - pseudo-terminal (pty) que fala o protocolo do firmware;
+                       o SerialReader comum conecta na porta criada
+As duas primeiras mantêm a interface do SerialReader (fila, get_batch, status).
+"""
+
+import os
+import time
+import select
+import threading
+import logging
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+from app.serial_reader import SerialReader
+from app.protocol import (SampleBlock, BinaryFrameDecoder, parse_csv_lines,
+                          encode_frames, FRAME_SIZE, FORMAT_COMMANDS)
+from app.recorder import SESSION_FILE
+
+logger = logging.getLogger(__name__)
+
+FIRMWARE_VERSION = "Sistema Vibracional v2.0 - Marlon Biagi Parangaba"
+
+
+@dataclass
+class SignalConfig:
+    """Parâmetros do sinal sintético (amplitudes em mm/s²)"""
+    sample_rate: float = 200.0
+    tones: Sequence[Tuple[float, float]] = ((29.3, 100.0),)  # (frequência Hz, amplitude)
+    harmonics: int = 3               # Harmônicos 2x..Nx de cada tom
+    harmonic_decay: float = 0.5      # Amplitude do harmônico k: amp * decay^(k-1)
+    noise: float = 5.0               # Desvio padrão do ruído gaussiano
+    imbalance: float = 1.0           # Amplitude de m2 relativa a m1
+    phase_shift: float = 90.0        # Defasagem de m2 em relação a m1 (graus)
+    axis_gains: Sequence[float] = (1.0, 0.6, 0.3)  # Ganho de x, y, z
+    dropout_rate: float = 0.0        # Probabilidade de perder cada bloco (lacuna)
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SignalConfig':
+        """Cria a partir de parâmetros JSON (chaves desconhecidas são ignoradas)"""
+        known = {key: value for key, value in (data or {}).items()
+                 if key in cls.__dataclass_fields__}
+        if 'tones' in known:
+            known['tones'] = tuple((float(freq), float(amp)) for freq, amp in known['tones'])
+        return cls(**known)
+
+
+class SignalGenerator:
+    """Gera blocos (timestamps, valores (6, n)) contínuos a partir de SignalConfig"""
+
+    def __init__(self, config: SignalConfig = None):
+        self.config = config or SignalConfig()
+        self.rng = np.random.default_rng(self.config.seed)
+        self.sample_index = 0
+        self.dropped_blocks = 0
+
+        # Componentes (frequência, amplitude) já com harmônicos
+        components = []
+        for freq, amp in self.config.tones:
+            for k in range(1, self.config.harmonics + 2):
+                if freq * k < self.config.sample_rate / 2:
+                    components.append((freq * k, amp * self.config.harmonic_decay ** (k - 1)))
+        self.freqs = np.array([c[0] for c in components])[:, None]
+        self.amps = np.array([c[1] for c in components])[:, None]
+
+        gains = np.asarray(self.config.axis_gains, dtype=np.float64)
+        self.gains = np.concatenate([gains, gains * self.config.imbalance])[:, None]
+
+    def next_block(self, n: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Próximas n amostras, ou None se o bloco foi 'perdido' (o tempo avança)"""
+        start = self.sample_index
+        self.sample_index += n
+        if self.config.dropout_rate > 0 and self.rng.random() < self.config.dropout_rate:
+            self.dropped_blocks += 1
+            return None
+
+        rate = self.config.sample_rate
+        index = np.arange(start, start + n)
+        t = index / rate
+        phase = 2 * np.pi * self.freqs * t
+        shift = np.deg2rad(self.config.phase_shift)
+
+        m1 = (self.amps * np.sin(phase)).sum(axis=0)
+        m2 = (self.amps * np.sin(phase + shift)).sum(axis=0)
+        values = np.vstack([m1, m1, m1, m2, m2, m2]) * self.gains
+        if self.config.noise > 0:
+            values += self.rng.normal(0.0, self.config.noise, values.shape)
+
+        timestamps = np.floor(index * 1000.0 / rate).astype(np.int64)
+        return timestamps, values.astype(np.float32)
+
+
+class SimulatedSource(SerialReader):
+    """
+    Base das fontes sem porta serial: uma thread produz SampleBlocks na mesma
+    fila do SerialReader, no ritmo speed × tempo real (speed=0: o mais rápido
+    possível, limitado apenas pela fila de processamento).
+    """
+
+    source_name = 'simulated'
+    BLOCK_SECONDS = 0.05  # Duração de cada bloco em tempo real
+    MAX_BLOCK = 4096
+
+    def __init__(self, speed: float = 1.0, sample_rate: float = 200.0, **kwargs):
+        super().__init__(**kwargs)
+        self.speed = max(0.0, float(speed))
+        self.sample_rate = sample_rate
+        self.data_format = self.source_name
+        self.samples_produced = 0
+        self.target: Optional[str] = None
+
+    @property
+    def block_size(self) -> int:
+        """Amostras por bloco: ~BLOCK_SECONDS de relógio em qualquer velocidade"""
+        if self.speed == 0:
+            return self.MAX_BLOCK
+        return int(min(self.MAX_BLOCK, max(1, self.sample_rate * self.BLOCK_SECONDS * self.speed)))
+
+    def connect(self, target: str = None) -> bool:
+        if self.running:
+            self.disconnect()
+        try:
+            self.open(target)
+        except Exception as e:
+            logger.error(f"Erro ao abrir fonte {self.source_name}: {e}")
+            return False
+
+        self.target = target
+        self.samples_produced = 0
+        self.start_time = time.time()
+        self.running = True
+        self.reader_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader_thread.start()
+        self.connected_event.set()
+        logger.info(f"Fonte '{self.source_name}' iniciada ({target or '-'}, velocidade "
+                    f"{'máxima' if self.speed == 0 else f'{self.speed:g}x'})")
+        return True
+
+    def disconnect(self):
+        self.running = False
+        self.connected_event.clear()
+        if self.reader_thread is not None and self.reader_thread is not threading.current_thread():
+            self.reader_thread.join(timeout=2.0)
+        self.reader_thread = None
+        self.close()
+
+    def is_connected(self) -> bool:
+        return self.running
+
+    def send_command(self, command: str):
+        logger.info(f"Comando ignorado pela fonte '{self.source_name}': {command}")
+
+    def request_format(self, data_format: str):
+        if data_format not in FORMAT_COMMANDS:
+            raise ValueError(f"Formato desconhecido: {data_format}")
+        self.requested_format = data_format  # Blocos já chegam decodificados
+
+    def open(self, target: Optional[str]):
+        """Prepara a fonte (arquivo, gerador); chamado em connect()"""
+
+    def close(self):
+        """Libera os recursos da fonte"""
+
+    def iter_items(self) -> Iterator[Union[SampleBlock, str]]:
+        """Blocos de amostras e linhas de status ('#...') na ordem de produção"""
+        raise NotImplementedError
+
+    def _read_loop(self):
+        started = time.monotonic()
+        first_ts = None
+        try:
+            for item in self.iter_items():
+                if not self.running:
+                    break
+                if isinstance(item, str):
+                    self._enqueue_status(item.lstrip('#').strip())
+                    continue
+                if len(item) == 0:
+                    continue
+
+                # Ritmo pelo timestamp do ESP32 (lacunas e gravações reais incluídas)
+                if first_ts is None:
+                    first_ts = int(item.timestamps[0])
+                if self.speed > 0:
+                    due = started + (int(item.timestamps[0]) - first_ts) / 1000.0 / self.speed
+                    delay = due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    # Sem perdas: esperar espaço abaixo da marca de sobrecarga da fila
+                    pending = self.data_queue
+                    while (self.running and pending.samples
+                           and pending.samples + len(item) > pending.high_samples):
+                        time.sleep(0.001)
+
+                item.received_at = time.monotonic()
+                self._enqueue(item)
+                self.samples_produced += len(item)
+                self.bytes_received += item.values.nbytes
+        except Exception as e:
+            logger.error(f"Erro na fonte '{self.source_name}': {e}")
+            self._enqueue_status(f"ERRO_FONTE: {e}")
+
+        if self.running:
+            self._enqueue_status(f"FONTE_CONCLUIDA: {self.samples_produced} amostras")
+            logger.info(f"Fonte '{self.source_name}' concluída: {self.samples_produced} amostras")
+            self.running = False
+            self.connected_event.clear()
+
+    def get_info(self) -> Dict:
+        elapsed = max(1e-9, time.time() - self.start_time)
+        return {
+            'source': self.source_name,
+            'target': self.target,
+            'speed': self.speed,
+            'samples': self.samples_produced,
+            'rate': self.samples_produced / elapsed
+        }
+
+
+class SyntheticSource(SimulatedSource):
+    """Gerador sintético contínuo (ou por `duration` segundos de sinal)"""
+
+    source_name = 'synthetic'
+    STATUS_INTERVAL = 1000  # Amostras entre '#STATUS' (como o firmware)
+
+    def __init__(self, signal: SignalConfig = None, duration: float = None, **kwargs):
+        self.signal = signal or SignalConfig()
+        super().__init__(sample_rate=self.signal.sample_rate, **kwargs)
+        self.duration = duration
+        self.generator: Optional[SignalGenerator] = None
+
+    def open(self, target: Optional[str]):
+        self.generator = SignalGenerator(self.signal)
+
+    def iter_items(self):
+        generator = self.generator
+        total = None if self.duration is None else int(self.duration * self.sample_rate)
+        yield "#VERSION: " + FIRMWARE_VERSION + " (sintético)"
+        next_status = self.STATUS_INTERVAL
+        while total is None or generator.sample_index < total:
+            n = self.block_size if total is None else min(self.block_size, total - generator.sample_index)
+            block = generator.next_block(n)
+            if block is not None:
+                # Blocos perdidos viram lacunas de timestamp (o ritmo segue o timestamp)
+                yield SampleBlock(*block)
+            if generator.sample_index >= next_status:
+                yield (f"#STATUS: Amostras={generator.sample_index}, "
+                       f"Taxa={self.sample_rate * max(self.speed, 1):.1f} Hz")
+                next_status += self.STATUS_INTERVAL
+
+
+class ReplaySource(SimulatedSource):
+    """
+    Reproduz uma gravação: pasta de sessão do TestRecorder, CSV (exportado
+    ou capturado do firmware, linhas '#' viram status) ou captura de quadros
+    binários (.bin). Com loop=True recomeça mantendo os timestamps crescentes.
+    """
+
+    source_name = 'replay'
+
+    def __init__(self, loop: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.loop = loop
+        self.kind: Optional[str] = None
+
+    def open(self, target: Optional[str]):
+        if not target or not os.path.exists(target):
+            raise FileNotFoundError(f"Gravação não encontrada: {target}")
+        if os.path.isdir(target):
+            if not os.path.isfile(os.path.join(target, SESSION_FILE)):
+                raise ValueError(f"Pasta não é uma sessão gravada: {target}")
+            self.kind = 'session'
+        elif target.lower().endswith('.csv') or target.lower().endswith('.txt'):
+            self.kind = 'csv'
+        else:
+            self.kind = 'binary'
+
+    def iter_items(self):
+        offset = 0
+        while True:
+            first_ts = last_ts = None
+            for item in self._iter_file():
+                if isinstance(item, SampleBlock) and len(item):
+                    if first_ts is None:
+                        first_ts = int(item.timestamps[0])
+                    last_ts = int(item.timestamps[-1])
+                    if offset:
+                        item.timestamps = item.timestamps + offset
+                yield item
+            if not self.loop or last_ts is None or not self.running:
+                return
+            # Próxima volta continua um período de amostra após o fim da anterior
+            offset += last_ts - first_ts + int(round(1000.0 / self.sample_rate))
+
+    def _iter_file(self):
+        if self.kind == 'session':
+            yield from self._iter_session()
+        elif self.kind == 'csv':
+            yield from self._iter_csv()
+        else:
+            yield from self._iter_binary()
+
+    def _iter_session(self):
+        from app.recording import RecordingReader
+
+        with RecordingReader(self.target) as reader:
+            self.sample_rate = float(reader.session.get('sample_rate', self.sample_rate))
+            for start in range(0, len(reader), self.block_size):
+                records = reader.records[start:start + self.block_size]
+                yield SampleBlock(np.array(records['timestamp']),
+                                  np.ascontiguousarray(records['values'].T))
+
+    def _iter_csv(self):
+        with open(self.target, 'rb') as f:
+            lines = []
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith(b'#'):
+                    if lines:
+                        yield from self._csv_block(lines)
+                        lines = []
+                    yield line.decode('utf-8', errors='replace')
+                    continue
+                lines.append(line)
+                if len(lines) >= self.block_size:
+                    yield from self._csv_block(lines)
+                    lines = []
+            if lines:
+                yield from self._csv_block(lines)
+
+    def _csv_block(self, lines):
+        block, invalid = parse_csv_lines(lines)
+        self.invalid_lines += invalid  # Cabeçalhos e linhas corrompidas
+        if block is not None:
+            yield block
+
+    def _iter_binary(self):
+        decoder = BinaryFrameDecoder()
+        with open(self.target, 'rb') as f:
+            while True:
+                data = f.read(self.block_size * FRAME_SIZE)
+                if not data:
+                    break
+                block, status_lines = decoder.feed(data)
+                yield from status_lines
+                if block is not None:
+                    yield block
+
+
+class FirmwareEmulator:
+    """
+    Emula o firmware do ESP32 em um pseudo-terminal: envia cabeçalho, linhas
+    CSV (ou quadros binários após BINARIO), '#STATUS' a cada 1000 amostras e
+    responde a RECALIBRAR, RESET, STATUS, VERSION, BINARIO e CSV. O
+    SerialReader comum conecta em `port` como se fosse a placa real.
+    Disponível apenas em sistemas com pty (Linux/macOS).
+    """
+
+    STATUS_INTERVAL = 1000
+    BLOCK_SECONDS = 0.02
+
+    def __init__(self, signal: SignalConfig = None, speed: float = 1.0):
+        self.signal = signal or SignalConfig()
+        self.speed = max(0.01, float(speed))
+        self.generator = SignalGenerator(self.signal)
+        self.master_fd: Optional[int] = None
+        self.slave_fd: Optional[int] = None
+        self.port: Optional[str] = None
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+        self.binary_mode = False
+        self.frame_seq = 0
+        self.sample_count = 0
+        self.time_offset = 0      # RESET zera o timestamp (start_time do firmware)
+        self.dropped_bytes = 0    # Escritas sem leitor do outro lado
+        self.commands = []
+
+    def start(self) -> str:
+        """Cria o pty e inicia a emulação; retorna o caminho da porta"""
+        try:
+            import tty
+        except ImportError:
+            raise RuntimeError("Emulador requer suporte a pty (Linux/macOS)")
+
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        os.set_blocking(self.master_fd, False)
+        self.port = os.ttyname(self.slave_fd)
+
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info(f"Emulador do firmware em {self.port}")
+        return self.port
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        for fd in (self.master_fd, self.slave_fd):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.master_fd = self.slave_fd = None
+
+    def _write(self, data: bytes):
+        try:
+            os.write(self.master_fd, data)
+        except BlockingIOError:
+            self.dropped_bytes += len(data)  # Ninguém lendo: como a UART real, descartar
+        except OSError:
+            self.running = False
+
+    def _println(self, text: str = ''):
+        self._write((text + '\n').encode('utf-8'))
+
+    def _run(self):
+        rate = self.signal.sample_rate
+        block = max(1, int(rate * self.BLOCK_SECONDS * self.speed))
+        self._println("SISTEMA DE ANÁLISE VIBRACIONAL - ESP32 (emulador)")
+        self._println(f"Taxa de amostragem: {rate:.0f} Hz")
+        self._println("TIMESTAMP_MS,M1_X,M1_Y,M1_Z,M2_X,M2_Y,M2_Z")
+
+        started = time.monotonic()
+        pending = b''
+        while self.running:
+            # Comandos do PC até o próximo bloco
+            due = started + self.generator.sample_index / rate / self.speed
+            timeout = max(0.0, due - time.monotonic())
+            try:
+                readable, _, _ = select.select([self.master_fd], [], [], timeout)
+            except (OSError, ValueError):
+                break
+            if readable:
+                try:
+                    pending += os.read(self.master_fd, 1024)
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    break
+                *commands, pending = pending.split(b'\n')
+                for command in commands:
+                    self._handle_command(command.decode('utf-8', errors='replace').strip())
+                continue
+
+            result = self.generator.next_block(block)
+            if result is None:
+                continue
+            timestamps, values = result
+            self._send_samples(timestamps - self.time_offset, values)
+
+    def _send_samples(self, timestamps: np.ndarray, values: np.ndarray):
+        n = len(timestamps)
+        if self.binary_mode:
+            seq = (self.frame_seq + np.arange(n)) & 0xFFFF
+            self.frame_seq = (self.frame_seq + n) & 0xFFFF
+            self._write(encode_frames(seq, timestamps, values))
+        else:
+            rows = np.column_stack([timestamps, np.round(values.T, 1)])
+            text = '\n'.join(f"{int(r[0])},{r[1]:.1f},{r[2]:.1f},{r[3]:.1f},{r[4]:.1f},{r[5]:.1f},{r[6]:.1f}"
+                             for r in rows.tolist())
+            self._write((text + '\n').encode())
+
+        before = self.sample_count
+        self.sample_count += n
+        if self.sample_count // self.STATUS_INTERVAL > before // self.STATUS_INTERVAL:
+            self._println(f"#STATUS: Amostras={self.sample_count}, "
+                          f"Taxa={self.signal.sample_rate:.1f} Hz")
+
+    def _handle_command(self, command: str):
+        if not command:
+            return
+        self.commands.append(command)
+        if command == 'RECALIBRAR':
+            self._println("#RECALIBRANDO_SENSORES...")
+            self._println("#CALIBRACAO_CONCLUIDA")
+        elif command == 'RESET':
+            self.sample_count = 0
+            self.time_offset = (self.generator.sample_index * 1000) // int(self.signal.sample_rate)
+            self._println("#CONTADOR_RESETADO")
+        elif command == 'STATUS':
+            self._println(f"#STATUS: Amostras={self.sample_count}, "
+                          f"Taxa={self.signal.sample_rate:.1f} Hz")
+        elif command == 'VERSION':
+            self._println(f"#VERSION: {FIRMWARE_VERSION}")
+        elif command == 'BINARIO':
+            self._println("#FORMATO: BINARIO")
+            self.frame_seq = 0
+            self.binary_mode = True
+        elif command == 'CSV':
+            self.binary_mode = False
+            self._println("#FORMATO: CSV")
@@ -0,0 +1,514 @@
+"""
+MOTOR ESPECTRAL (FFT REAL EM LOTE)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import numpy as np
+import logging
+from collections import deque
+from scipy import signal
+from typing import Dict, Optional, Tuple
+
+from app.ring_buffer import SampleRingBuffer, NUM_CHANNELS
+
+logger = logging.getLogger(__name__)
+
+# Funções de janela suportadas
+WINDOW_FUNCTIONS = {
+    'hann': np.hanning,
+    'hamming': np.hamming,
+    'blackman': np.blackman,
+    'rectangular': np.ones
+}
+
+
+class SpectralEngine:
+    """
+    Calcula espectros de magnitude de vários canais em uma única chamada.
+
+    Janelas e fatores de normalização são calculados uma vez por
+    (fft_size, janela) e reaproveitados. A normalização 1/sum(janela)
+    mantém a escala histórica do sistema (2/N para Hann).
+    """
+
+    def __init__(self, sample_rate: float, fft_size: int, window: str = 'hann'):
+        self.sample_rate = sample_rate
+        self.fft_size = fft_size
+        self.window = window
+        self._windows: Dict[Tuple[int, str], Tuple[np.ndarray, float]] = {}
+
+    @property
+    def freq_resolution(self) -> float:
+        return self.sample_rate / self.fft_size
+
+    @property
+    def num_bins(self) -> int:
+        return self.fft_size // 2
+
+    def frequencies(self) -> np.ndarray:
+        """Frequência (Hz) de cada bin retornado"""
+        return np.arange(self.num_bins) * self.freq_resolution
+
+    def get_window(self, size: int, window: str = None) -> Tuple[np.ndarray, float]:
+        """Janela e fator de normalização em cache para (size, window)"""
+        window = window or self.window
+        key = (size, window)
+        cached = self._windows.get(key)
+        if cached is None:
+            if window not in WINDOW_FUNCTIONS:
+                raise ValueError(f"Janela desconhecida: {window}")
+            values = WINDOW_FUNCTIONS[window](size)
+            cached = (values, 1.0 / np.sum(values))
+            self._windows[key] = cached
+            logger.debug(f"Janela '{window}' ({size} pontos) adicionada ao cache")
+        return cached
+
+    def magnitude(self, signals: np.ndarray, window: str = None) -> np.ndarray:
+        """
+        Espectro de magnitude das últimas fft_size amostras de cada sinal.
+        signals: (..., n), p. ex. (n,), (canais, n) ou (canais, segmentos, n);
+        retorna (..., fft_size // 2)
+        """
+        signals = np.asarray(signals)
+        n = self.fft_size
+        if signals.shape[-1] < n:
+            return np.zeros(signals.shape[:-1] + (self.num_bins,))
+
+        segment = np.asarray(signals[..., -n:], dtype=np.float64)
+        window_values, scale = self.get_window(n, window)
+
+        # Remover média DC, aplicar janela e FFT real de todos os sinais
+        segment = (segment - segment.mean(axis=-1, keepdims=True)) * window_values
+        spectrum = np.fft.rfft(segment, axis=-1)
+
+        magnitude = np.abs(spectrum[..., :self.num_bins]) * scale
+        magnitude[..., 0] = 0  # Remover componente DC (0 Hz)
+
+        return magnitude
+
+
+class SpectralAverager:
+    """
+    STFT incremental com média de Welch ou exponencial.
+
+    Uma FFT só é calculada quando um novo salto (hop) de amostras completa
+    um segmento; os espectros de potência por segmento ficam em cache e a
+    média é reaproveitada até o próximo segmento.
+    """
+
+    MODES = ('welch', 'exponential')
+
+    def __init__(self, engine: SpectralEngine, overlap: float = 0.5,
+                 segments: int = 8, alpha: float = 0.25, mode: str = 'welch',
+                 window: str = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de média desconhecido: {mode}")
+        if not 0 <= overlap < 1:
+            raise ValueError("overlap deve estar em [0, 1)")
+
+        self.engine = engine
+        self.mode = mode
+        self.window = window
+        self.overlap = overlap
+        self.segments = max(1, int(segments))
+        self.alpha = alpha
+        self.hop = max(1, int(round(engine.fft_size * (1 - overlap))))
+
+        self.segment_power = deque(maxlen=self.segments)
+        self.average_power: Optional[np.ndarray] = None
+        self.next_segment_end = engine.fft_size  # Em amostras absolutas (total_written)
+        self.last_total = 0
+        self.segments_computed = 0
+
+    def reset(self):
+        """Descarta os segmentos e a média acumulada"""
+        self.segment_power.clear()
+        self.average_power = None
+        self.next_segment_end = self.engine.fft_size
+        self.last_total = 0
+
+    def mark_discontinuity(self, position: int):
+        """
+        Descarta a média e só aceita segmentos inteiramente depois de
+        `position` (amostras absolutas, total_written): nenhum segmento
+        atravessa a lacuna
+        """
+        self.segment_power.clear()
+        self.average_power = None
+        self.next_segment_end = max(self.next_segment_end, position + self.engine.fft_size)
+
+    def update(self, buffer: SampleRingBuffer) -> int:
+        """Calcula as FFTs dos segmentos completados desde a última chamada"""
+        total = buffer.total_written
+        if total < self.last_total:
+            self.reset()  # Buffer foi limpo
+        self.last_total = total
+
+        n = self.engine.fft_size
+        if total < self.next_segment_end:
+            return 0
+
+        # Segmentos pendentes que ainda estão no buffer (os mais recentes)
+        pending = (total - self.next_segment_end) // self.hop + 1
+        oldest_available = total - len(buffer)
+        keep = min(pending, self.segments) if self.mode == 'welch' else pending
+        first_end = self.next_segment_end + (pending - keep) * self.hop
+        if first_end - n < oldest_available:
+            skipped = -(-(oldest_available + n - first_end) // self.hop)
+            first_end += skipped * self.hop
+            keep = max(0, keep - skipped)
+        self.next_segment_end += pending * self.hop
+        if keep == 0:
+            return 0
+
+        # Janelas deslizantes (sem cópia) sobre o trecho do buffer: (canais, k, n)
+        span = buffer.latest(total - (first_end - n))
+        last_end = first_end + (keep - 1) * self.hop
+        span = span[:, :span.shape[1] - (total - last_end)]
+        windows = np.lib.stride_tricks.sliding_window_view(span, n, axis=1)[:, ::self.hop]
+
+        power = np.square(self.engine.magnitude(windows, self.window))
+        for i in range(power.shape[1]):
+            self._accumulate(power[:, i])
+        self.segments_computed += keep
+        return keep
+
+    def _accumulate(self, power: np.ndarray):
+        if self.mode == 'welch':
+            self.segment_power.append(power)
+            self.average_power = None  # Recalculada sob demanda
+        elif self.average_power is None:
+            self.average_power = power
+        else:
+            self.average_power = (1 - self.alpha) * self.average_power + self.alpha * power
+
+    def average(self) -> Optional[np.ndarray]:
+        """Espectro de magnitude médio (canais, bins), ou None sem segmentos"""
+        if self.mode == 'welch':
+            if not self.segment_power:
+                return None
+            if self.average_power is None:
+                self.average_power = np.mean(self.segment_power, axis=0)
+        if self.average_power is None:
+            return None
+        return np.sqrt(self.average_power)
+
+
+def parabolic_peaks(spectra: np.ndarray, indices) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Interpolação sub-bin dos picos: vértice da parábola pelos 3 bins em torno
+    de cada índice, no log da magnitude (quase exato para janelas Hann).
+    spectra: (..., bins); indices: (...). Retorna (deslocamento em bins,
+    amplitude). Picos na borda ou com vizinho zerado (threshold) ficam no bin.
+    """
+    spectra = np.asarray(spectra)
+    indices = np.asarray(indices, dtype=np.int64)
+    bins = spectra.shape[-1]
+    inner = np.clip(indices, 1, max(1, bins - 2))
+    around = np.stack([np.take_along_axis(spectra, (inner + k)[..., None], axis=-1)[..., 0]
+                       for k in (-1, 0, 1)])
+    peak = np.take_along_axis(spectra, indices[..., None], axis=-1)[..., 0].astype(np.float64)
+    return parabolic_vertex(around, peak, valid=(indices == inner) & (bins >= 3))
+
+
+def parabolic_vertex(around: np.ndarray, peak: np.ndarray = None,
+                     valid=True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vértice da parábola (log da magnitude) por três bins vizinhos já lidos,
+    around: (3, ...). Onde não há interpolação (vizinho zerado, curva não
+    côncava ou valid False), o deslocamento é 0 e a amplitude é `peak`
+    (padrão: o bin central).
+    """
+    around = np.asarray(around, dtype=np.float64)
+    peak = around[1] if peak is None else peak
+    valid = valid & np.all(around > 0, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a, b, c = np.log(around)
+        denominator = a - 2 * b + c
+        valid &= denominator < 0
+        offset = np.where(valid, 0.5 * (a - c) / denominator, 0.0)
+        amplitude = np.where(valid, np.exp(b - 0.25 * (a - c) * offset), peak)
+    return offset, amplitude
+
+
+def find_spectral_peaks(spectra: np.ndarray, bin_width: float, count: int = 5,
+                        min_freq: float = 1.0, min_prominence: float = 0.0,
+                        min_width: float = 1.0, max_width: float = None,
+                        window: int = 64) -> Dict[str, np.ndarray]:
+    """
+    Até `count` picos por canal de uma matriz (canais, bins), em uma única
+    passada sobre todos os canais.
+
+    Os canais vão lado a lado em um vetor, separados por um bin mais alto
+    que qualquer pico (a busca da base para nele, como na borda). Os
+    máximos locais abaixo de min_prominence saem antes do cálculo caro (a
+    proeminência nunca passa da amplitude); nos restantes,
+    scipy.signal.peak_prominences (base procurada em ±window bins) e
+    peak_widths (largura a meia proeminência) rodam uma vez para todos os
+    canais. Ficam os picos com proeminência >= min_prominence e largura
+    entre min_width e max_width bins, os `count` mais altos de cada canal,
+    com frequência e amplitude por interpolação parabólica sub-bin.
+
+    Retorna arrays (canais, count) ordenados por amplitude: frequency,
+    amplitude, prominence, width (Hz) e found (posições sem pico têm zeros
+    e found False).
+    """
+    spectra = np.asarray(spectra)
+    channels, bins = spectra.shape
+    shape = (channels, max(0, count))
+    result = {name: np.zeros(shape) for name in ('frequency', 'amplitude', 'prominence', 'width')}
+    result['found'] = np.zeros(shape, dtype=bool)
+    if bins < 3 or count <= 0:
+        return result
+
+    stride = bins + 1
+    flat = np.empty((channels, stride))
+    flat[:, :bins] = spectra
+    flat[:, bins] = 2.0 * float(spectra.max()) + 1.0  # Separador entre canais
+    flat = flat.ravel()
+
+    # Máximos locais (em platô, o primeiro bin) a partir de min_freq
+    center = flat[1:-1]
+    local = (center > flat[:-2]) & (center >= flat[2:]) & (center >= max(min_prominence, 1e-12))
+    peaks = np.flatnonzero(local) + 1
+    columns = peaks % stride
+    peaks = peaks[(columns < bins) & (columns >= min_freq / bin_width)]
+    if len(peaks) == 0:
+        return result
+
+    prominence, left_base, right_base = signal.peak_prominences(flat, peaks, wlen=2 * window + 1)
+    keep = prominence >= min_prominence
+    peaks, prominence_data = peaks[keep], (prominence[keep], left_base[keep], right_base[keep])
+    width = signal.peak_widths(flat, peaks, rel_height=0.5, prominence_data=prominence_data)[0]
+    keep = width >= min_width
+    if max_width:
+        keep &= width <= max_width
+    peaks, prominence, width = peaks[keep], prominence_data[0][keep], width[keep]
+
+    # Ordem de canal e, dentro dele, de amplitude; posição no canal = rank
+    rows = peaks // stride
+    order = np.lexsort((-flat[peaks], rows))
+    rows = rows[order]
+    rank = np.arange(len(order)) - np.searchsorted(rows, rows)
+    selected = rank < count
+    order, rows, rank = order[selected], rows[selected], rank[selected]
+
+    positions = peaks[order]
+    offset, amplitude = parabolic_vertex(flat[positions + np.array([[-1], [0], [1]])])
+    result['found'][rows, rank] = True
+    result['frequency'][rows, rank] = (positions % stride + offset) * bin_width
+    result['amplitude'][rows, rank] = amplitude
+    result['prominence'][rows, rank] = prominence[order]
+    result['width'][rows, rank] = width[order] * bin_width
+    return result
+
+
+class BandZoomAnalyzer:
+    """
+    Zoom FFT em uma banda estreita (center ± span/2) por demodulação complexa
+    e decimação, acompanhando o buffer como o SpectralAverager.
+
+    Cada amostra nova é multiplicada por exp(-j2π·center·t), passa por um
+    passa-baixas elíptico (estado mantido entre blocos) e só 1 a cada
+    `decimation` amostras é guardada (taxa ≈ 1,25 × span). A FFT complexa das
+    últimas `size` amostras decimadas dá bins de output_rate/size Hz: com
+    200 Hz, span de 10 Hz e size 2048, 0,0061 Hz (resolução real de uma FFT
+    de 32768 pontos, com 2048 pontos e ~164 s de sinal). Enquanto o histórico
+    não enche, o espectro sai com zero-padding a partir de size/16 amostras.
+    """
+
+    def __init__(self, sample_rate: float, center: float, span: float, size: int = 2048,
+                 window: str = 'hann', channels: int = NUM_CHANNELS):
+        if span <= 0:
+            raise ValueError("span deve ser positivo")
+        if not 0 < center < sample_rate / 2:
+            raise ValueError(f"Centro fora da faixa (0, {sample_rate / 2:g}) Hz: {center}")
+        self.sample_rate = float(sample_rate)
+        self.center = float(center)
+        self.span = float(span)
+        self.size = max(16, int(size))
+        self.window = window
+        self.decimation = max(1, int(sample_rate // (1.25 * span)))
+        self.output_rate = self.sample_rate / self.decimation
+        self.min_samples = max(8, self.size // 16)
+
+        # Passa-baixas com corte na meia banda; o que dobraria sobre a banda
+        # na decimação (acima de output_rate - span/2) fica ~80 dB abaixo
+        cutoff = min(0.99, 0.5 * span / (sample_rate / 2))
+        self.sos = signal.ellip(8, 0.1, 80, cutoff, output='sos')
+        self.channels = channels
+        self.history = np.zeros((channels, self.size), dtype=np.complex64)
+        self.engine = SpectralEngine(self.output_rate, self.size, window)
+        self.reset()
+
+    @property
+    def bin_width(self) -> float:
+        return self.output_rate / self.size
+
+    @property
+    def equivalent_fft_size(self) -> int:
+        """Pontos de uma FFT comum com a mesma resolução"""
+        return int(round(self.sample_rate / self.bin_width))
+
+    def matches(self, center: float, span: float, size: int, window: str) -> bool:
+        return (self.center, self.span, self.size, self.window) == (float(center), float(span),
+                                                                     int(size), window)
+
+    def reset(self):
+        """Descarta o histórico decimado e o estado do filtro"""
+        self.zi = np.zeros((self.sos.shape[0], self.channels, 2), dtype=np.complex128)
+        self.count = 0
+        self.phase = 0.0    # Fase do oscilador (ciclos) na próxima amostra
+        self.offset = 0     # Posição no ciclo de decimação
+        self.last_total = 0
+        self.restart_at: Optional[int] = None
+        self.restarts = 0
+
+    def mark_discontinuity(self, position: int):
+        """O histórico recomeça em `position` (total_written): nada atravessa a lacuna"""
+        self.restart_at = position
+
+    def update(self, buffer: SampleRingBuffer) -> int:
+        """Consome as amostras novas do buffer; retorna amostras decimadas geradas"""
+        total = buffer.total_written
+        start = self.last_total
+        if total < start:
+            start = 0
+            self._restart()  # Buffer foi limpo
+        if self.restart_at is not None and self.restart_at <= total:
+            start = max(start, self.restart_at)
+            self.restart_at = None
+            self._restart()
+        if start < total - len(buffer):
+            # Amostras não consumidas já saíram do buffer: o sinal não é contínuo
+            start = total - len(buffer)
+            self._restart()
+        self.last_total = total
+        n = total - start
+        if n <= 0:
+            return 0
+
+        values = buffer.latest(n).astype(np.float64)
+        cycles = self.phase + np.arange(n) * (self.center / self.sample_rate)
+        self.phase = float((self.phase + n * self.center / self.sample_rate) % 1.0)
+        mixed = values * np.exp(-2j * np.pi * (cycles % 1.0))
+        filtered, self.zi = signal.sosfilt(self.sos, mixed, axis=-1, zi=self.zi)
+
+        first = (-self.offset) % self.decimation
+        self.offset = (self.offset + n) % self.decimation
+        decimated = filtered[:, first::self.decimation]
+        k = decimated.shape[1]
+        if k == 0:
+            return 0
+        if k >= self.size:
+            self.history[:] = decimated[:, -self.size:]
+        else:
+            self.history[:, :-k] = self.history[:, k:]
+            self.history[:, -k:] = decimated
+        self.count += k
+        return k
+
+    def _restart(self):
+        restarts = self.restarts + (1 if self.count else 0)  # Só conta histórico perdido
+        self.reset()
+        self.restarts = restarts
+
+    def spectrum(self) -> Optional[Tuple[np.ndarray, Dict]]:
+        """
+        Magnitude (canais, bins) dentro de [center - span/2, center + span/2],
+        na mesma escala do espectro principal (amplitude/2 de um seno), ou
+        None enquanto há menos de min_samples amostras decimadas
+        """
+        count = min(self.count, self.size)
+        if count < self.min_samples:
+            return None
+        window_values, scale = self.engine.get_window(count, self.window)
+        segment = self.history[:, -count:] * window_values
+        # Zero-padding até size: o passo dos bins não muda enquanto o histórico enche
+        spectrum = np.fft.fftshift(np.fft.fft(segment, n=self.size, axis=-1), axes=-1)
+        offsets = (np.arange(self.size) - self.size // 2) * self.bin_width
+        band = np.abs(offsets) <= self.span / 2
+        magnitude = np.abs(spectrum[:, band]) * scale
+        info = {
+            'center': self.center,
+            'span': self.span,
+            'start_freq': self.center + float(offsets[band][0]),
+            'step': self.bin_width,
+            'bin_width': self.bin_width,
+            'points': int(magnitude.shape[1]),
+            'samples': int(count),
+            'duration': count / self.output_rate,
+            'resolution': self.output_rate / count,
+            'decimation': self.decimation,
+            'equivalent_fft_size': self.equivalent_fft_size,
+            'restarts': self.restarts
+        }
+        return magnitude, info
+
+
+def band_limit(spectra: np.ndarray, bin_width: float, max_freq: float) -> np.ndarray:
+    """Corta o espectro (..., bins) até max_freq (inclusive), sem cópia"""
+    bins = spectra.shape[-1]
+    last = min(bins, int(np.floor(max_freq / bin_width + 1e-9)) + 1)
+    return spectra[..., :max(1, last)]
+
+
+def decimate_max(spectra: np.ndarray, points: int) -> Tuple[np.ndarray, int]:
+    """
+    Reduz (..., bins) para no máximo `points` pontos pegando o máximo de cada
+    grupo de bins, para que picos estreitos (ex.: 1x da rotação) nunca sumam.
+    Retorna (espectro reduzido, fator de decimação).
+    """
+    bins = spectra.shape[-1]
+    if points <= 0 or bins <= points:
+        return spectra, 1
+
+    factor = -(-bins // points)
+    groups = -(-bins // factor)
+    padded = np.zeros(spectra.shape[:-1] + (groups * factor,), dtype=spectra.dtype)
+    padded[..., :bins] = spectra
+    reduced = padded.reshape(spectra.shape[:-1] + (groups, factor)).max(axis=-1)
+    return reduced, factor
+
+
+def shape_spectrum(spectra: np.ndarray, bin_width: float, max_freq: float = None,
+                   points: int = None) -> Tuple[np.ndarray, Dict]:
+    """
+    Prepara o espectro para exibição: faixa [0, max_freq] e, opcionalmente,
+    decimação por máximo até `points` pontos (largura do gráfico em pixels).
+    O ponto i cobre as frequências [i * step, (i + 1) * step).
+    """
+    if max_freq:
+        spectra = band_limit(spectra, bin_width, max_freq)
+    spectra, factor = decimate_max(spectra, points or 0)
+    info = {
+        'start_freq': 0.0,
+        'step': bin_width * factor,
+        'bin_width': bin_width,
+        'decimation': factor,
+        'points': int(spectra.shape[-1])
+    }
+    return spectra, info
+
+
+def zoom_spectrum(spectra: np.ndarray, bin_width: float, center: float,
+                  span: float, start_freq: float = 0.0) -> Tuple[np.ndarray, Dict]:
+    """
+    Bins em resolução total dentro de [center - span/2, center + span/2];
+    o bin 0 de `spectra` está em start_freq (Hz)
+    """
+    bins = spectra.shape[-1]
+    first = int(np.clip(np.floor((center - span / 2 - start_freq) / bin_width), 0, bins - 1))
+    last = int(np.clip(np.ceil((center + span / 2 - start_freq) / bin_width), first, bins - 1))
+    zoomed = spectra[..., first:last + 1]
+    info = {
+        'start_freq': start_freq + first * bin_width,
+        'step': bin_width,
+        'bin_width': bin_width,
+        'decimation': 1,
+        'points': int(zoomed.shape[-1]),
+        'center': center,
+        'span': span
+    }
+    return zoomed, info
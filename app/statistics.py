@@ -0,0 +1,198 @@
+"""
+ESTATÍSTICAS DESLIZANTES (RMS, MÉDIA, PICO, PICO-A-PICO)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import numpy as np
+import logging
+from typing import Dict, Sequence
+
+from app.ring_buffer import SampleRingBuffer, NUM_CHANNELS
+
+logger = logging.getLogger(__name__)
+
+
+class RollingStatistics:
+    """
+    Estatísticas de várias janelas deslizantes, atualizadas a cada amostra/bloco.
+
+    Soma e soma dos quadrados de cada janela são mantidas exatamente
+    (entra o bloco novo, sai o trecho que deixou a janela), então média e
+    RMS são leituras O(1). Máximo e mínimo usam sub-blocos ("buckets") de
+    bucket_size amostras: a janela é arredondada para cima até o início do
+    bucket mais antigo, ou seja, pode incluir até bucket_size - 1 amostras
+    a mais.
+    """
+
+    RESYNC_INTERVAL = 100000  # Recalcular somas exatas a cada N amostras (deriva numérica)
+
+    def __init__(self, windows: Sequence[int], capacity: int, bucket_size: int = None):
+        self.windows = sorted({int(w) for w in windows if 0 < w <= capacity})
+        if not self.windows:
+            raise ValueError("Nenhuma janela válida para o tamanho do buffer")
+        if len(self.windows) < len(set(windows)):
+            logger.warning(f"Janelas maiores que o buffer ({capacity}) foram ignoradas")
+
+        self.bucket_size = bucket_size or max(1, self.windows[0] // 10)
+        self.num_buckets = -(-self.windows[-1] // self.bucket_size) + 1
+
+        self.sums = {w: np.zeros(NUM_CHANNELS) for w in self.windows}
+        self.sums_sq = {w: np.zeros(NUM_CHANNELS) for w in self.windows}
+        self.bucket_max = np.zeros((self.num_buckets, NUM_CHANNELS))
+        self.bucket_min = np.zeros((self.num_buckets, NUM_CHANNELS))
+        self.reset()
+
+    def reset(self):
+        """Zera todas as estatísticas"""
+        for w in self.windows:
+            self.sums[w][:] = 0
+            self.sums_sq[w][:] = 0
+        self.count = 0
+        self.bucket_head = 0         # Próximo bucket completo a ser escrito
+        self.buckets_filled = 0
+        self.current_max = np.full(NUM_CHANNELS, -np.inf)
+        self.current_min = np.full(NUM_CHANNELS, np.inf)
+        self.current_count = 0
+        self.since_resync = 0
+        self._extremes_cache: Dict[int, tuple] = {}
+
+    def update(self, buffer: SampleRingBuffer, n: int):
+        """Incorpora as n amostras recém-adicionadas ao buffer (chamar após o append)"""
+        if n <= 0:
+            return
+        available = len(buffer)
+        n = min(n, available)
+        previous = self.count
+        self.count = min(self.count + n, available)
+        self.since_resync += n
+
+        block = buffer.latest(n)
+        resync = self.since_resync >= self.RESYNC_INTERVAL
+        if resync:
+            self.since_resync = 0
+
+        for w in self.windows:
+            before = min(previous, w)
+            after = min(self.count, w)
+            departing = before + n - after
+
+            if resync or n >= w or after + departing > available:
+                # Recalcular exatamente a partir do buffer
+                window_values = buffer.latest(after).astype(np.float64)
+                self.sums[w] = window_values.sum(axis=1)
+                self.sums_sq[w] = np.square(window_values).sum(axis=1)
+                continue
+
+            block64 = block.astype(np.float64)
+            self.sums[w] += block64.sum(axis=1)
+            self.sums_sq[w] += np.square(block64).sum(axis=1)
+            if departing > 0:
+                old = buffer.latest(after + departing)[:, :departing].astype(np.float64)
+                self.sums[w] -= old.sum(axis=1)
+                self.sums_sq[w] -= np.square(old).sum(axis=1)
+
+        self._update_buckets(block)
+        self._extremes_cache.clear()
+
+    def _update_buckets(self, block: np.ndarray):
+        """Atualiza máximos/mínimos por bucket com o bloco novo"""
+        size = self.bucket_size
+        n = block.shape[1]
+        start = 0
+
+        # Completar o bucket parcial atual
+        if self.current_count > 0:
+            take = min(size - self.current_count, n)
+            part = block[:, :take]
+            self.current_max = np.maximum(self.current_max, part.max(axis=1))
+            self.current_min = np.minimum(self.current_min, part.min(axis=1))
+            self.current_count += take
+            start = take
+            if self.current_count == size:
+                self._push_buckets(self.current_max[np.newaxis], self.current_min[np.newaxis])
+                self._reset_current()
+
+        # Buckets completos dentro do bloco (vetorizado)
+        full = (n - start) // size
+        if full > 0:
+            chunk = block[:, start:start + full * size].reshape(NUM_CHANNELS, full, size)
+            self._push_buckets(chunk.max(axis=2).T, chunk.min(axis=2).T)
+            start += full * size
+
+        # Sobra vira o novo bucket parcial
+        if start < n:
+            part = block[:, start:]
+            self.current_max = np.maximum(self.current_max, part.max(axis=1))
+            self.current_min = np.minimum(self.current_min, part.min(axis=1))
+            self.current_count += n - start
+
+    def _push_buckets(self, maxima: np.ndarray, minima: np.ndarray):
+        count = len(maxima)
+        if count > self.num_buckets:
+            maxima, minima = maxima[-self.num_buckets:], minima[-self.num_buckets:]
+            self.bucket_head = (self.bucket_head + count - self.num_buckets) % self.num_buckets
+            count = self.num_buckets
+        positions = (self.bucket_head + np.arange(count)) % self.num_buckets
+        self.bucket_max[positions] = maxima
+        self.bucket_min[positions] = minima
+        self.bucket_head = (self.bucket_head + count) % self.num_buckets
+        self.buckets_filled = min(self.num_buckets, self.buckets_filled + count)
+
+    def _reset_current(self):
+        self.current_max = np.full(NUM_CHANNELS, -np.inf)
+        self.current_min = np.full(NUM_CHANNELS, np.inf)
+        self.current_count = 0
+
+    def _extremes(self, window: int) -> tuple:
+        """(máximo, mínimo) por canal na janela, em cache até a próxima atualização"""
+        cached = self._extremes_cache.get(window)
+        if cached is not None:
+            return cached
+
+        needed = max(0, window - self.current_count)
+        k = min(-(-needed // self.bucket_size), self.buckets_filled)
+        maxima = self.current_max.copy()
+        minima = self.current_min.copy()
+        if k > 0:
+            positions = (self.bucket_head - 1 - np.arange(k)) % self.num_buckets
+            maxima = np.maximum(maxima, self.bucket_max[positions].max(axis=0))
+            minima = np.minimum(minima, self.bucket_min[positions].min(axis=0))
+        if self.count == 0:
+            maxima = minima = np.zeros(NUM_CHANNELS)
+
+        self._extremes_cache[window] = (maxima, minima)
+        return maxima, minima
+
+    def samples(self, window: int) -> int:
+        """Número de amostras efetivamente na janela"""
+        return min(self.count, window)
+
+    def mean(self, window: int) -> np.ndarray:
+        n = self.samples(window)
+        return self.sums[window] / n if n else np.zeros(NUM_CHANNELS)
+
+    def mean_square(self, window: int) -> np.ndarray:
+        n = self.samples(window)
+        return np.maximum(self.sums_sq[window] / n, 0.0) if n else np.zeros(NUM_CHANNELS)
+
+    def rms(self, window: int) -> np.ndarray:
+        return np.sqrt(self.mean_square(window))
+
+    def peak(self, window: int) -> np.ndarray:
+        maxima, minima = self._extremes(window)
+        return np.maximum(np.abs(maxima), np.abs(minima))
+
+    def peak_to_peak(self, window: int) -> np.ndarray:
+        maxima, minima = self._extremes(window)
+        return maxima - minima
+
+    def snapshot(self, window: int) -> Dict[str, list]:
+        """Todas as estatísticas de uma janela (listas na ordem de CHANNELS)"""
+        return {
+            'samples': self.samples(window),
+            'mean': self.mean(window).tolist(),
+            'rms': self.rms(window).tolist(),
+            'peak': self.peak(window).tolist(),
+            'peak_to_peak': self.peak_to_peak(window).tolist()
+        }
@@ -0,0 +1,214 @@
+"""
+TEMPORIZAÇÃO DAS AMOSTRAS (LACUNAS, DUPLICATAS, TAXA REAL E REAMOSTRAGEM)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import time
+import numpy as np
+from typing import Dict, Iterator, Optional, Tuple
+
+
+class TimingEstimator:
+    """
+    Acompanha os timestamps do ESP32 (ms) bloco a bloco, de forma vetorizada:
+
+    - duplicatas (mesmo timestamp) e amostras fora de ordem são marcadas
+      para descarte;
+    - intervalos maiores que `gap_factor` × intervalo esperado contam como
+      lacunas, com o número estimado de amostras perdidas;
+    - taxa real e jitter vêm dos últimos `window` intervalos normais;
+    - a deriva do relógio do ESP32 compara o tempo decorrido nos timestamps
+      com o relógio do PC (time.monotonic na chegada dos blocos).
+    """
+
+    def __init__(self, sample_rate: float, gap_factor: float = 1.5, window: int = 2048,
+                 drift_min_seconds: float = 10.0):
+        self.nominal_rate = float(sample_rate)
+        self.gap_factor = gap_factor
+        self.window = window
+        self.drift_min_seconds = drift_min_seconds
+        self.reset()
+
+    def reset(self):
+        self.last_timestamp: Optional[int] = None
+        self.received = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.gaps = 0
+        self.lost_samples = 0
+        # Últimos intervalos (ms) e quantas amostras cada um representa (1 = normal)
+        self.intervals = np.empty(0)
+        self.steps = np.empty(0)
+        self.reference: Optional[Tuple[int, float]] = None  # (timestamp ESP32, monotonic)
+        self.latest: Optional[Tuple[int, float]] = None
+
+    @property
+    def nominal_interval(self) -> float:
+        return 1000.0 / self.nominal_rate
+
+    def expected_interval(self) -> float:
+        """Intervalo medido (ms), ou o nominal enquanto não há medição"""
+        normal = self.intervals[self.steps == 1]
+        return float(normal.mean()) if len(normal) else self.nominal_interval
+
+    def observe(self, timestamps: np.ndarray, received_at: float = None) -> np.ndarray:
+        """
+        Registra um bloco de timestamps e retorna a máscara das amostras
+        válidas (estritamente crescentes em relação a tudo o que já chegou)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        n = len(timestamps)
+        if n == 0:
+            return np.ones(0, dtype=bool)
+        self.received += n
+
+        # Maior timestamp visto antes de cada amostra
+        previous = np.maximum.accumulate(timestamps)
+        previous = np.concatenate(([self.last_timestamp if self.last_timestamp is not None
+                                    else timestamps[0] - 1], previous[:-1]))
+        if self.last_timestamp is not None:
+            previous = np.maximum(previous, self.last_timestamp)
+        delta = timestamps - previous
+        keep = delta > 0
+        self.duplicates += int(np.count_nonzero(delta == 0))
+        self.out_of_order += int(np.count_nonzero(delta < 0))
+
+        # Intervalos das amostras válidas (o primeiro bloco não tem anterior)
+        intervals = delta[keep].astype(np.float64)
+        if self.last_timestamp is None and len(intervals):
+            intervals = intervals[1:]
+        if len(intervals):
+            expected = self.expected_interval()
+            steps = np.maximum(1, np.round(intervals / expected))
+            is_gap = intervals > self.gap_factor * expected
+            steps[~is_gap] = 1
+            self.gaps += int(np.count_nonzero(is_gap))
+            self.lost_samples += int((steps[is_gap] - 1).sum())
+            self.intervals = np.concatenate((self.intervals, intervals))[-self.window:]
+            self.steps = np.concatenate((self.steps, steps))[-self.window:]
+
+        if keep.any():
+            self.last_timestamp = int(timestamps[keep][-1])
+            now = received_at if received_at is not None else time.monotonic()
+            if self.reference is None:
+                # received_at é a chegada da última amostra do bloco
+                self.reference = (self.last_timestamp, now)
+            self.latest = (self.last_timestamp, now)
+        return keep
+
+    def measured_rate(self) -> Optional[float]:
+        normal = self.intervals[self.steps == 1]
+        return 1000.0 / float(normal.mean()) if len(normal) else None
+
+    def jitter(self) -> Optional[float]:
+        """Desvio padrão (ms) dos intervalos normais recentes"""
+        normal = self.intervals[self.steps == 1]
+        return float(normal.std()) if len(normal) > 1 else None
+
+    def recent_loss(self) -> float:
+        """Fração de amostras ausentes na janela recente (0-1)"""
+        expected = float(self.steps.sum())
+        return 1.0 - len(self.steps) / expected if expected > 0 else 0.0
+
+    def clock_drift_ppm(self) -> Optional[float]:
+        """Deriva do relógio do ESP32 frente ao PC (ppm), após drift_min_seconds"""
+        if self.reference is None or self.latest is None:
+            return None
+        host_elapsed = self.latest[1] - self.reference[1]
+        if host_elapsed < self.drift_min_seconds:
+            return None
+        device_elapsed = (self.latest[0] - self.reference[0]) / 1000.0
+        return (device_elapsed - host_elapsed) / host_elapsed * 1e6
+
+    def get_stats(self) -> Dict:
+        rate = self.measured_rate()
+        return {
+            'nominal_rate_hz': self.nominal_rate,
+            'measured_rate_hz': rate,
+            'rate_error_ppm': (rate - self.nominal_rate) / self.nominal_rate * 1e6 if rate else None,
+            'jitter_ms': self.jitter(),
+            'clock_drift_ppm': self.clock_drift_ppm(),
+            'received': self.received,
+            'duplicates': self.duplicates,
+            'out_of_order': self.out_of_order,
+            'gaps': self.gaps,
+            'lost_samples': self.lost_samples,
+            'loss_percent': 100.0 * self.recent_loss()
+        }
+
+
+class UniformResampler:
+    """
+    Reamostragem linear (vetorizada) dos blocos em uma grade uniforme de
+    1/sample_rate na base de tempo do ESP32, contínua entre blocos: a
+    última amostra de cada bloco fica guardada para interpolar a fronteira.
+    Lacunas até `max_fill_ms` são preenchidas por interpolação; maiores
+    reiniciam a grade e são devolvidas como descontinuidade.
+    """
+
+    def __init__(self, sample_rate: float, max_fill_ms: float = 25.0):
+        self.interval = 1000.0 / sample_rate
+        self.max_fill_ms = max_fill_ms
+        self.reset()
+
+    def reset(self):
+        self.next_time: Optional[float] = None
+        self.last_time: Optional[int] = None
+        self.last_values: Optional[np.ndarray] = None
+
+    def process(self, timestamps: np.ndarray,
+                values: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray, bool]]:
+        """
+        Gera (timestamps, valores (canais, k), após_lacuna) para cada trecho
+        contínuo do bloco. Timestamps devem ser estritamente crescentes
+        (ver TimingEstimator.observe).
+        """
+        if len(timestamps) == 0:
+            return
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        # Trechos separados por lacunas longas (raro: normalmente um só)
+        breaks = np.flatnonzero(np.diff(timestamps) > self.max_fill_ms) + 1
+        start = 0
+        for end in [*breaks.tolist(), len(timestamps)]:
+            after_gap = self._continue(int(timestamps[start]))
+            yield (*self._interpolate(timestamps[start:end], values[:, start:end]), after_gap)
+            start = end
+
+    def _continue(self, first: int) -> bool:
+        """Reinicia a grade se o trecho não continua o anterior; True se houve lacuna"""
+        if self.last_time is not None and first - self.last_time <= self.max_fill_ms:
+            return False
+        gap = self.last_time is not None
+        self.next_time = float(first)
+        self.last_time = None
+        self.last_values = None
+        return gap
+
+    def _interpolate(self, timestamps: np.ndarray, values: np.ndarray):
+        if self.last_time is not None:
+            # Amostra anterior como ponto de apoio da fronteira entre blocos
+            times = np.concatenate(([self.last_time], timestamps)).astype(np.float64)
+            values = np.concatenate((self.last_values[:, None], values), axis=1)
+        else:
+            times = timestamps.astype(np.float64)
+
+        self.last_time = int(timestamps[-1])
+        self.last_values = values[:, -1].copy()
+
+        count = int(np.floor((times[-1] - self.next_time) / self.interval)) + 1
+        if count <= 0:
+            return np.empty(0, dtype=np.int64), np.empty((values.shape[0], 0), dtype=np.float32)
+        grid = self.next_time + self.interval * np.arange(count)
+        self.next_time = float(grid[-1] + self.interval)
+
+        if len(times) == 1:
+            return np.rint(grid).astype(np.int64), values.astype(np.float32, copy=True)
+
+        # Interpolação linear dos 6 canais de uma vez (equivale a np.interp por canal)
+        upper = np.clip(np.searchsorted(times, grid, side='right'), 1, len(times) - 1)
+        lower = upper - 1
+        weight = (grid - times[lower]) / (times[upper] - times[lower])
+        left = values[:, lower]
+        resampled = left + (values[:, upper] - left) * weight
+        return np.rint(grid).astype(np.int64), resampled.astype(np.float32)
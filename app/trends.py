@@ -0,0 +1,324 @@
+"""
+HISTÓRICO DE TENDÊNCIAS EM VÁRIAS RESOLUÇÕES (SEGUNDO / MINUTO / HORA)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import os
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+from app.recorder import METRIC_FIELDS, truncate_partial_records
+
+logger = logging.getLogger(__name__)
+
+# Métricas guardadas (mesmos nomes das colunas do gravador de testes)
+TREND_METRICS = tuple(field for field in METRIC_FIELDS if field != 'buffer_usage')
+
+# Camadas: nome e duração do intervalo (s), da mais fina para a mais grossa
+TREND_TIERS = (('second', 1), ('minute', 60), ('hour', 3600))
+
+# Retenção padrão de cada camada (s)
+DEFAULT_RETENTION = {'second': 86400, 'minute': 90 * 86400, 'hour': 5 * 365 * 86400}
+
+AGGREGATES = ('min', 'max', 'mean', 'last')
+
+
+def trend_record_dtype(metrics: int) -> np.dtype:
+    """Registro de um intervalo: início (epoch s), amostras e agregados por métrica"""
+    return np.dtype([
+        ('time', '<i8'),
+        ('count', '<i4'),
+        ('min', '<f4', (metrics,)),
+        ('max', '<f4', (metrics,)),
+        ('mean', '<f4', (metrics,)),
+        ('last', '<f4', (metrics,))
+    ])
+
+
+class _Bucket:
+    """Acumulador de um intervalo ainda aberto"""
+    __slots__ = ('start', 'count', 'min', 'max', 'sum', 'last')
+
+    def __init__(self, start: int, metrics: int):
+        self.start = start
+        self.count = 0
+        self.min = np.full(metrics, np.inf)
+        self.max = np.full(metrics, -np.inf)
+        self.sum = np.zeros(metrics)
+        self.last = np.zeros(metrics)
+
+    def merge(self, count: int, minimum, maximum, mean, last):
+        self.count += count
+        np.minimum(self.min, minimum, out=self.min)
+        np.maximum(self.max, maximum, out=self.max)
+        self.sum += np.asarray(mean, dtype=np.float64) * count
+        self.last[:] = last
+
+    def to_record(self, dtype: np.dtype) -> np.ndarray:
+        record = np.zeros(1, dtype=dtype)
+        record['time'] = self.start
+        record['count'] = self.count
+        record['min'] = self.min
+        record['max'] = self.max
+        record['mean'] = self.sum / self.count
+        record['last'] = self.last
+        return record
+
+
+class TrendTier:
+    """
+    Arquivo de registros de uma camada (<nome>.bin, só acrescentado, em
+    ordem de tempo). Acima da retenção + folga, o arquivo é reescrito só com
+    os registros mais recentes (arquivo temporário + rename).
+    """
+
+    def __init__(self, path: str, name: str, seconds: int, retention: float, dtype: np.dtype):
+        self.path = path
+        self.name = name
+        self.seconds = seconds
+        self.dtype = dtype
+        self.max_records = max(1, int(retention // seconds))
+        self.slack = max(1, self.max_records // 24)
+        self.records = truncate_partial_records(path, dtype.itemsize)
+        self.file = open(path, 'ab')
+
+    def append(self, record: np.ndarray):
+        self.file.write(record.tobytes())
+        self.file.flush()  # Visível para as consultas (memmap) sem fsync
+        self.records += 1
+        if self.records > self.max_records + self.slack:
+            self.compact()
+
+    def compact(self):
+        """Mantém só os max_records registros mais recentes"""
+        self.file.close()
+        keep = self.read_tail(self.max_records)
+        tmp_path = self.path + '.tmp'
+        keep.tofile(tmp_path)
+        os.replace(tmp_path, self.path)
+        self.records = len(keep)
+        self.file = open(self.path, 'ab')
+        logger.debug(f"Tendências '{self.name}': {self.records} registros após compactação")
+
+    def _map(self) -> Optional[np.ndarray]:
+        if self.records == 0:
+            return None
+        return np.memmap(self.path, dtype=self.dtype, mode='r', shape=(self.records,))
+
+    def read_tail(self, count: int) -> np.ndarray:
+        data = self._map()
+        if data is None:
+            return np.zeros(0, dtype=self.dtype)
+        return np.array(data[-count:])
+
+    def read(self, start: float, end: float) -> np.ndarray:
+        """Registros com início em [start, end] (busca binária na coluna de tempo)"""
+        data = self._map()
+        if data is None:
+            return np.zeros(0, dtype=self.dtype)
+        times = data['time']
+        first = np.searchsorted(times, start, side='left')
+        last = np.searchsorted(times, end, side='right')
+        return np.array(data[first:last])
+
+    def bounds(self):
+        """(primeiro, último) início de intervalo gravado, ou None"""
+        data = self._map()
+        if data is None:
+            return None
+        return int(data['time'][0]), int(data['time'][-1])
+
+    def close(self):
+        self.file.close()
+
+
+class TrendStore:
+    """
+    Tendências de longo prazo de um dispositivo.
+
+    add() recebe os valores atuais das métricas (≈5 Hz); cada segundo vira
+    um registro min/max/média/último em second.bin, que alimenta o minuto
+    corrente, que alimenta a hora corrente. Cada camada tem sua retenção.
+    Consultas leem só o trecho pedido da camada mais grossa que atende à
+    resolução, sem reprocessar dados brutos.
+    """
+
+    def __init__(self, directory: str, metrics: Sequence[str] = TREND_METRICS,
+                 retention: Dict[str, float] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.metrics = tuple(metrics)
+        self.dtype = trend_record_dtype(len(self.metrics))
+        retention = {**DEFAULT_RETENTION, **(retention or {})}
+        self.tiers: List[TrendTier] = [
+            TrendTier(os.path.join(directory, f"{name}.bin"), name, seconds,
+                      retention[name], self.dtype)
+            for name, seconds in TREND_TIERS
+        ]
+        self.buckets: List[Optional[_Bucket]] = [None] * len(self.tiers)
+        self.lock = threading.Lock()
+        self._restore()
+
+    def _restore(self):
+        """
+        Reconstrói os intervalos abertos (minuto e hora correntes) a partir
+        dos registros da camada mais fina ainda não consolidados
+        """
+        for level in range(len(self.tiers) - 1, 0, -1):
+            tier = self.tiers[level]
+            bounds = tier.bounds()
+            after = bounds[1] + tier.seconds if bounds else -np.inf
+            for record in self.tiers[level - 1].read(after, np.inf):
+                self._accumulate(level, int(record['time']), int(record['count']),
+                                 record['min'], record['max'], record['mean'], record['last'])
+
+    # ---------- Escrita ----------
+
+    def add(self, wall_time: float, values: Sequence[float]):
+        """Valores atuais das métricas (na ordem de self.metrics)"""
+        values = np.asarray(values, dtype=np.float64)
+        with self.lock:
+            self._accumulate(0, int(wall_time), 1, values, values, values, values)
+
+    def _accumulate(self, level: int, timestamp: int, count: int, minimum, maximum, mean, last):
+        tier = self.tiers[level]
+        start = timestamp - timestamp % tier.seconds
+        bucket = self.buckets[level]
+        if bucket is not None and bucket.start != start:
+            self._close_bucket(level)
+            bucket = None
+        if bucket is None:
+            bucket = self.buckets[level] = _Bucket(start, len(self.metrics))
+        bucket.merge(count, minimum, maximum, mean, last)
+
+    def _close_bucket(self, level: int):
+        """Grava o intervalo fechado e o repassa para a camada seguinte"""
+        record = self.buckets[level].to_record(self.dtype)
+        self.buckets[level] = None
+        self.tiers[level].append(record)
+        if level + 1 < len(self.tiers):
+            row = record[0]
+            self._accumulate(level + 1, int(row['time']), int(row['count']),
+                             row['min'], row['max'], row['mean'], row['last'])
+
+    # ---------- Consulta ----------
+
+    def choose_tier(self, start: float, resolution: float) -> int:
+        """
+        Camada mais grossa com intervalo <= resolução; se a retenção dela
+        já descartou o início pedido (ou está vazia), sobe para a seguinte
+        """
+        level = 0
+        for i, tier in enumerate(self.tiers):
+            if tier.seconds <= resolution:
+                level = i
+        while level + 1 < len(self.tiers):
+            tier = self.tiers[level]
+            bounds = tier.bounds()
+            trimmed = bounds is not None and bounds[0] > start and tier.records >= tier.max_records
+            if not (bounds is None or trimmed) or self.tiers[level + 1].bounds() is None:
+                break
+            level += 1
+        return level
+
+    def query(self, metrics: Sequence[str], start: float, end: float,
+              resolution: float = None, max_points: int = 1000) -> Dict:
+        """
+        Série [start, end] (epoch s) das métricas pedidas. Sem resolução,
+        usa a que gera até max_points pontos. Pontos da camada escolhida são
+        reagrupados (vetorizado) quando a resolução pedida é maior.
+        """
+        unknown = [metric for metric in metrics if metric not in self.metrics]
+        if unknown:
+            raise ValueError(f"Métrica desconhecida: {', '.join(unknown)} "
+                             f"(disponíveis: {', '.join(self.metrics)})")
+        if end <= start:
+            raise ValueError("'to' deve ser maior que 'from'")
+        if resolution is None:
+            resolution = (end - start) / max(1, max_points)
+        resolution = max(1.0, float(resolution))
+
+        with self.lock:
+            level = self.choose_tier(start, resolution)
+            tier = self.tiers[level]
+            records = tier.read(start - tier.seconds + 1, end)
+            bucket = self.buckets[level]
+            if bucket is not None and bucket.count and start - tier.seconds < bucket.start <= end:
+                # Intervalo ainda aberto (dado mais recente)
+                records = np.concatenate((records, bucket.to_record(self.dtype)))
+
+        records = self._regroup(records, start, resolution, tier.seconds)
+        columns = [self.metrics.index(metric) for metric in metrics]
+        return {
+            'tier': tier.name,
+            'tier_seconds': tier.seconds,
+            'resolution': max(resolution, tier.seconds),
+            'time': records['time'].tolist(),
+            'count': records['count'].tolist(),
+            'metrics': {
+                metric: {aggregate: records[aggregate][:, column].tolist()
+                         for aggregate in AGGREGATES}
+                for metric, column in zip(metrics, columns)
+            }
+        }
+
+    def _regroup(self, records: np.ndarray, start: float, resolution: float,
+                 tier_seconds: int) -> np.ndarray:
+        """Agrupa registros em intervalos de `resolution` s (reduceat por grupo)"""
+        if len(records) < 2 or resolution < 1.5 * tier_seconds:
+            return records
+        step = int(resolution)
+        groups = (records['time'] - int(start)) // step
+        first = np.flatnonzero(np.diff(groups, prepend=groups[0] - 1))
+        last = np.append(first[1:], len(records)) - 1
+
+        counts = records['count'].astype(np.float64)
+        weighted = np.add.reduceat(records['mean'] * counts[:, None], first, axis=0)
+        total = np.add.reduceat(counts, first)
+
+        grouped = np.zeros(len(first), dtype=records.dtype)
+        grouped['time'] = int(start) + groups[first] * step
+        grouped['count'] = total
+        grouped['min'] = np.minimum.reduceat(records['min'], first, axis=0)
+        grouped['max'] = np.maximum.reduceat(records['max'], first, axis=0)
+        grouped['mean'] = weighted / total[:, None]
+        grouped['last'] = records['last'][last]
+        return grouped
+
+    def get_status(self) -> Dict:
+        with self.lock:
+            return {
+                tier.name: {
+                    'records': tier.records,
+                    'max_records': tier.max_records,
+                    'bounds': tier.bounds()
+                }
+                for tier in self.tiers
+            }
+
+    def close(self):
+        """Grava o segundo aberto (minuto/hora são refeitos em _restore)"""
+        with self.lock:
+            bucket = self.buckets[0]
+            if bucket is not None and bucket.count:
+                self.tiers[0].append(bucket.to_record(self.dtype))
+                self.buckets[0] = None
+            for tier in self.tiers:
+                tier.close()
+
+
+def sample_metric_values(state: Dict) -> List[float]:
+    """Valores das métricas de tendência (ordem de TREND_METRICS) a partir do estado"""
+    values = {
+        'dominant_freq': state['peaks']['m1']['frequency'],
+        'peak_amplitude': state['peaks']['m1']['amplitude'],
+        'imbalance': state['imbalance'],
+        'noise_level': state['current_noise']
+    }
+    for sensor, prefix in (('m1', 'rms1'), ('m2', 'rms2')):
+        for axis, value in state['rms'][sensor].items():
+            values[f"{prefix}_{axis}"] = value
+    return [values[metric] for metric in TREND_METRICS]
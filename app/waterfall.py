@@ -0,0 +1,303 @@
+"""
+ESPECTROGRAMA (WATERFALL) EM LINHAS QUANTIZADAS COM CACHE DE TILES
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
+
+import time
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+from app.ring_buffer import NUM_CHANNELS, SampleRingBuffer
+from app.spectral import SpectralEngine
+from app.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Níveis de quantização das linhas (uint8)
+LEVELS = 255
+
+
+class TileCache:
+    """
+    Cache LRU de tiles prontos (bytes), limitado pela memória total.
+    Tiles completos nunca mudam: a chave (canal, níveis, índices) basta.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self.tiles: 'OrderedDict[Hashable, Tuple[bytes, Dict]]' = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Dict]]:
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is None:
+                self.misses += 1
+                METRICS.inc('waterfall_tiles', result='miss')
+                return None
+            self.tiles.move_to_end(key)
+            self.hits += 1
+            METRICS.inc('waterfall_tiles', result='hit')
+            return tile
+
+    def put(self, key: Hashable, data: bytes, info: Dict):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.tiles.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[0])
+            self.tiles[key] = (data, info)
+            self.bytes += len(data)
+            while self.bytes > self.max_bytes:
+                _, (old, _) = self.tiles.popitem(last=False)
+                self.bytes -= len(old)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.tiles.clear()
+            self.bytes = 0
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return {
+                'tiles': len(self.tiles),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+class Waterfall:
+    """
+    Histórico do espectrograma dos 6 canais.
+
+    A cada `hop` amostras completadas no buffer, uma FFT de fft_size pontos
+    (mesmo SpectralEngine da análise) vira uma linha: magnitude em dB
+    quantizada em uint8 entre db_min e db_max, guardada em um anel de
+    `capacity` linhas (canais, bins). As linhas têm índice absoluto
+    crescente, então um tile (faixa de linhas × faixa de bins, decimado por
+    máximo em potências de 2) nunca muda depois de completo e fica no
+    TileCache. Navegar e aproximar no histórico só lê linhas prontas, sem
+    recalcular FFTs.
+    """
+
+    def __init__(self, engine: SpectralEngine, hop: int, capacity: int,
+                 db_min: float = -40.0, db_max: float = 60.0, tile_rows: int = 256,
+                 tile_bins: int = 256, cache_bytes: int = 32 * 1024 * 1024):
+        if db_max <= db_min:
+            raise ValueError("db_max deve ser maior que db_min")
+        self.engine = engine
+        self.hop = max(1, int(hop))
+        self.capacity = max(1, int(capacity))
+        self.db_min = float(db_min)
+        self.db_max = float(db_max)
+        self.tile_rows = max(1, int(tile_rows))
+        self.tile_bins = max(1, int(tile_bins))
+        self.bins = engine.num_bins
+
+        self.rows = np.zeros((self.capacity, NUM_CHANNELS, self.bins), dtype=np.uint8)
+        self.row_timestamps = np.zeros(self.capacity, dtype=np.int64)  # ms do ESP32 (fim do segmento)
+        self.row_times = np.zeros(self.capacity, dtype=np.float64)     # epoch s
+        self.next_row = 0  # Índice absoluto da próxima linha
+        self.lock = threading.Lock()
+        self.tiles = TileCache(cache_bytes)
+
+        self.next_segment_end = engine.fft_size  # Em amostras absolutas (total_written)
+        self.last_total = 0
+        self.skipped_segments = 0
+
+    @property
+    def hop_seconds(self) -> float:
+        return self.hop / self.engine.sample_rate
+
+    @property
+    def first_row(self) -> int:
+        return max(0, self.next_row - self.capacity)
+
+    # ---------- Escrita ----------
+
+    def restart(self):
+        """Buffer limpo: recomeça os segmentos (as linhas já gravadas ficam)"""
+        self.next_segment_end = self.engine.fft_size
+        self.last_total = 0
+
+    def mark_discontinuity(self, position: int):
+        """Nenhuma linha atravessa a lacuna em `position` (total_written)"""
+        self.next_segment_end = max(self.next_segment_end, position + self.engine.fft_size)
+
+    def update(self, buffer: SampleRingBuffer, window: str = None) -> int:
+        """FFTs dos segmentos completados desde a última chamada; retorna linhas novas"""
+        total = buffer.total_written
+        if total < self.last_total:
+            self.restart()
+        self.last_total = total
+
+        n = self.engine.fft_size
+        if total < self.next_segment_end:
+            return 0
+
+        # Segmentos pendentes; os que já saíram do buffer são pulados
+        pending = (total - self.next_segment_end) // self.hop + 1
+        first_end = self.next_segment_end
+        self.next_segment_end += pending * self.hop
+        oldest_available = total - len(buffer)
+        if first_end - n < oldest_available:
+            skipped = min(pending, -(-(oldest_available + n - first_end) // self.hop))
+            self.skipped_segments += skipped
+            first_end += skipped * self.hop
+            pending -= skipped
+        if pending == 0:
+            return 0
+
+        # Janelas deslizantes (sem cópia) sobre o trecho do buffer: (canais, k, n)
+        start = first_end - n
+        last_end = first_end + (pending - 1) * self.hop
+        span = buffer.latest(total - start)[:, :last_end - start]
+        timestamps = buffer.latest_timestamps(total - start)[n - 1:last_end - start:self.hop]
+        windows = np.lib.stride_tricks.sliding_window_view(span, n, axis=1)[:, ::self.hop]
+
+        rows = self.quantize(self.engine.magnitude(windows, window)).transpose(1, 0, 2)
+        ends = first_end + self.hop * np.arange(pending)
+        times = time.time() - (total - ends) / self.engine.sample_rate
+        self._store(rows, timestamps, times)
+        return pending
+
+    def quantize(self, magnitude: np.ndarray) -> np.ndarray:
+        """Magnitude → dB → níveis 0-255 (db_min e abaixo = 0)"""
+        db = 20.0 * np.log10(np.maximum(magnitude, 1e-12))
+        levels = (db - self.db_min) * (LEVELS / (self.db_max - self.db_min))
+        return np.clip(np.rint(levels), 0, LEVELS).astype(np.uint8)
+
+    def _store(self, rows: np.ndarray, timestamps: np.ndarray, times: np.ndarray):
+        count = len(rows)
+        if count > self.capacity:
+            rows, timestamps, times = rows[-self.capacity:], timestamps[-self.capacity:], times[-self.capacity:]
+        with self.lock:
+            positions = (self.next_row + count - len(rows) + np.arange(len(rows))) % self.capacity
+            self.rows[positions] = rows
+            self.row_timestamps[positions] = timestamps
+            self.row_times[positions] = times
+            self.next_row += count
+
+    # ---------- Leitura ----------
+
+    def read_rows(self, first: int, last: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Cópia das linhas absolutas [first, last) ainda no histórico: (linhas,
+        timestamps, tempos, primeira linha devolvida)
+        """
+        with self.lock:
+            first = max(first, self.first_row)
+            last = min(last, self.next_row)
+            if last <= first:
+                return (np.zeros((0, NUM_CHANNELS, self.bins), dtype=np.uint8),
+                        np.zeros(0, dtype=np.int64), np.zeros(0), first)
+            positions = np.arange(first, last) % self.capacity
+            return (self.rows[positions], self.row_timestamps[positions],
+                    self.row_times[positions], first)
+
+    def latest(self, count: int = 1) -> Optional[Dict]:
+        """Últimas `count` linhas (canais, bins) para envio incremental"""
+        rows, timestamps, times, first = self.read_rows(self.next_row - count, self.next_row)
+        if len(rows) == 0:
+            return None
+        return {'first_row': first, 'rows': rows, 'timestamps': timestamps, 'times': times}
+
+    def row_at(self, wall_time: float) -> int:
+        """Índice absoluto da primeira linha com tempo >= wall_time"""
+        with self.lock:
+            first, last = self.first_row, self.next_row
+            times = self.row_times[np.arange(first, last) % self.capacity]
+        return first + int(np.searchsorted(times, wall_time, side='left'))
+
+    def tile(self, channel: int, time_level: int, time_index: int,
+             freq_level: int = 0, freq_index: int = 0) -> Tuple[bytes, Dict]:
+        """
+        Tile (tile_rows, tile_bins) em uint8: linhas [time_index × tile_rows ×
+        2^time_level, ...) e bins [freq_index × tile_bins × 2^freq_level, ...),
+        reduzidos pelo máximo de cada grupo 2^level (picos estreitos não somem).
+        Tiles completos vêm do cache; o tile que ainda recebe linhas é
+        recalculado a cada pedido (só leitura de linhas, sem FFT).
+        """
+        if not 0 <= channel < NUM_CHANNELS:
+            raise ValueError(f"Canal inválido: {channel}")
+        if time_level < 0 or freq_level < 0 or time_index < 0 or freq_index < 0:
+            raise ValueError("Níveis e índices do tile devem ser >= 0")
+        time_step, freq_step = 1 << time_level, 1 << freq_level
+        first = time_index * self.tile_rows * time_step
+        last = first + self.tile_rows * time_step
+        first_bin = freq_index * self.tile_bins * freq_step
+        if first_bin >= self.bins:
+            raise ValueError(f"Tile de frequência fora da faixa ({self.bins} bins)")
+
+        key = (channel, time_level, time_index, freq_level, freq_index)
+        cached = self.tiles.get(key)
+        if cached is not None:
+            return cached
+
+        rows, _, times, start = self.read_rows(first, last)
+        tile = np.zeros((self.tile_rows * time_step, self.tile_bins * freq_step), dtype=np.uint8)
+        band = rows[:, channel, first_bin:first_bin + tile.shape[1]]
+        offset = start - first
+        tile[offset:offset + len(band), :band.shape[1]] = band
+        tile = tile.reshape(self.tile_rows, time_step, self.tile_bins, freq_step).max(axis=(1, 3))
+
+        complete = last <= self.next_row
+        bin_width = self.engine.freq_resolution
+        info = {
+            'channel': channel,
+            'rows': self.tile_rows,
+            'bins': self.tile_bins,
+            'first_row': first,
+            'row_step': time_step,
+            'valid_rows': (-(-(offset + len(band)) // time_step) - offset // time_step
+                           if len(band) else 0),
+            'start_time': float(times[0]) if len(times) else None,
+            'end_time': float(times[-1]) if len(times) else None,
+            'start_freq': first_bin * bin_width,
+            'freq_step': bin_width * freq_step,
+            'db_min': self.db_min,
+            'db_max': self.db_max,
+            'complete': complete
+        }
+        data = tile.tobytes()
+        if complete:
+            self.tiles.put(key, data, info)
+        return data, info
+
+    def get_info(self) -> Dict:
+        """Faixa de linhas disponível e parâmetros para montar os tiles"""
+        with self.lock:
+            first, last = self.first_row, self.next_row
+            first_time = float(self.row_times[first % self.capacity]) if last > first else None
+            last_time = float(self.row_times[(last - 1) % self.capacity]) if last > first else None
+        return {
+            'first_row': first,
+            'next_row': last,
+            'first_time': first_time,
+            'last_time': last_time,
+            'capacity': self.capacity,
+            'hop': self.hop,
+            'hop_seconds': self.hop_seconds,
+            'bins': self.bins,
+            'bin_width': self.engine.freq_resolution,
+            'tile_rows': self.tile_rows,
+            'tile_bins': self.tile_bins,
+            'db_min': self.db_min,
+            'db_max': self.db_max,
+            'skipped_segments': self.skipped_segments,
+            'memory_bytes': self.rows.nbytes,
+            'tile_cache': self.tiles.get_stats()
+        }
@@ -0,0 +1,5 @@
+"""
+BENCHMARKS DO PIPELINE (INGESTÃO → ANÁLISE → EMISSÃO)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+"""
@@ -0,0 +1,334 @@
+"""
+BENCHMARKS DO PIPELINE (INGESTÃO → ANÁLISE → EMISSÃO)
+Desenvolvido por: Marlon Biagi Parangaba
+Email: eng.parangaba@gmail.com
+
+Uso (na raiz do projeto):
+    python -m benchmarks.run_benchmarks                      # matriz padrão
+    python -m benchmarks.run_benchmarks --full -o base.json  # matriz completa
+    python -m benchmarks.run_benchmarks --compare base.json --threshold 0.15
+
+Cada etapa é medida com sinais sintéticos (app.sources.SignalGenerator) e
+reporta amostras/s, latência p50/p99 por chamada e pico de memória alocada
+(tracemalloc). Com --compare, sai com código 1 se alguma etapa ficar mais
+lenta que a referência além do limiar.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.data_processor import DataProcessor, SystemConfig
+from app.serial_reader import SerialReader
+from app.protocol import parse_csv_lines
+from app.emitter import EmissionScheduler
+from app.payload import encode_payload
+from app.sources import SignalGenerator, SignalConfig
+
+BENCHMARK_FORMAT_VERSION = 1
+
+# Matriz de casos: (taxa de amostragem Hz, FFT, buffer)
+DEFAULT_CASES = [
+    (200, 2048, 4096),      # Configuração de produção
+    (200, 256, 4096),
+    (1000, 4096, 8192),
+    (4000, 16384, 32768)
+]
+FULL_SAMPLE_RATES = (200, 1000, 4000)
+FULL_FFT_SIZES = (256, 1024, 2048, 4096, 8192, 16384)
+FULL_BUFFER_FACTORS = (1, 2, 4)  # buffer = FFT × fator
+
+
+class FakeSocketIO:
+    """Socket.IO em memória: confirma (ACK) na hora e conta bytes serializados"""
+
+    def __init__(self):
+        self.emitted = 0
+        self.bytes = 0
+
+    def emit(self, event, payload, to=None, callback=None):
+        self.emitted += 1
+        if 'fft_binary' in payload:
+            self.bytes += len(payload['fft_binary']) + len(payload['time_binary'])
+            payload = {k: v for k, v in payload.items() if not isinstance(v, bytes)}
+        self.bytes += len(json.dumps(payload))
+        if callback is not None:
+            callback()
+
+
+def measure(func: Callable[[], int], repeat: int, warmup: int = 2) -> Dict:
+    """
+    Executa func `repeat` vezes; func retorna quantas amostras processou.
+    Retorna amostras/s, latência p50/p99/máx (ms) e pico de memória (KiB).
+    O pico vem de uma chamada extra com tracemalloc, fora da cronometragem
+    (o rastreamento deixa as alocações bem mais lentas).
+    """
+    for _ in range(warmup):
+        func()
+    gc.collect()
+
+    timings = np.empty(repeat)
+    samples = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        samples += func() or 0
+        timings[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = timings.sum()
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000.0
+    return {
+        'calls': repeat,
+        'samples': samples,
+        'samples_per_s': samples / total if samples and total > 0 else None,
+        'p50_ms': float(p50),
+        'p99_ms': float(p99),
+        'max_ms': float(timings.max() * 1000.0),
+        'peak_kib': peak / 1024.0
+    }
+
+
+def make_processor(sample_rate: int, fft_size: int, buffer_size: int) -> DataProcessor:
+    return DataProcessor(SystemConfig(sample_rate=sample_rate, fft_size=fft_size,
+                                      buffer_size=buffer_size))
+
+
+def run_case(sample_rate: int, fft_size: int, buffer_size: int, scale: float = 1.0) -> Dict:
+    """Mede todas as etapas para uma combinação taxa/FFT/buffer"""
+    generator = SignalGenerator(SignalConfig(sample_rate=sample_rate, seed=42,
+                                             tones=((sample_rate * 0.1465, 100.0),)))
+    block = max(1, sample_rate // 20)  # 50 ms de amostras por bloco
+    repeat = max(5, int(50 * scale))
+    stages = {}
+
+    # Linhas CSV no formato do firmware
+    def csv_lines(timestamps, values):
+        return [f"{ts},{v[0]:.1f},{v[1]:.1f},{v[2]:.1f},{v[3]:.1f},{v[4]:.1f},{v[5]:.1f}"
+                for ts, v in zip(timestamps.tolist(), values.T.tolist())]
+    lines = csv_lines(*generator.next_block(block * 10))
+    raw_lines = [line.encode() for line in lines]
+    reader = SerialReader()
+
+    # ---- Ingestão ----
+    stages['parse_data_line'] = measure(
+        lambda: sum(1 for line in lines if reader.parse_data_line(line)), repeat)
+    stages['parse_csv_lines'] = measure(
+        lambda: len(parse_csv_lines(raw_lines)[0]), repeat)
+
+    processor = make_processor(sample_rate, fft_size, buffer_size)
+    # Um lote novo por chamada (aquecimento, repetições e tracemalloc): repetir
+    # os mesmos timestamps mediria só o descarte de duplicatas do timing
+    batches = iter([[reader.parse_data_line(line)
+                     for line in csv_lines(*generator.next_block(block * 10))]
+                    for _ in range(repeat + 3)])
+
+    def add_data():
+        parsed = next(batches)
+        for point in parsed:
+            processor.add_data(point)
+        return len(parsed)
+    stages['add_data'] = measure(add_data, repeat)
+
+    def add_block():
+        ts, vals = generator.next_block(block)
+        processor.add_block(ts, vals)
+        return block
+    stages['add_block'] = measure(add_block, repeat)
+
+    # Encher o buffer para as etapas de análise
+    while len(processor.data_buffer) < buffer_size:
+        processor.add_block(*generator.next_block(min(4096, buffer_size)))
+
+    # ---- Análise ----
+    signal = processor.extract_signal('m1', 'x')
+    stages['calculate_fft'] = measure(lambda: len(processor.calculate_fft(signal)) and fft_size, repeat)
+    # Sem o cache por versão: medir as FFTs, não a cópia do resultado
+    stages['calculate_spectra'] = measure(lambda: processor.cache.invalidate('spectra')
+                                          or processor.calculate_spectra().shape[0] * fft_size,
+                                          repeat)
+
+    # Banda de alta resolução (demodulação + decimação) em torno do tom, sem o cache da análise
+    zoom_center = sample_rate * 0.1465
+    processor.update_config(zoom_center=zoom_center,
+                            zoom_span=min(10.0, zoom_center, sample_rate / 2 - zoom_center))
+
+    def band_zoom():
+        processor.add_block(*generator.next_block(block))
+        processor.band_spectra()
+        return block
+    stages['band_zoom'] = measure(band_zoom, repeat)
+
+    tracker = processor.get_order_tracker()
+    order_block = generator.next_block(block)[1]
+
+    def order_tracking():
+        tracker.update(order_block)
+        return block
+    stages['order_tracking'] = measure(order_tracking, repeat)
+
+    spectrum = processor.calculate_fft(signal)
+    fundamental = float(processor.find_peaks(spectrum)[0])
+    spectra = processor.calculate_spectra()
+    stages['spectral_peaks'] = measure(lambda: processor.detect_peaks(spectra) and 0, repeat)
+    stages['find_harmonics'] = measure(lambda: processor.find_harmonics(fundamental, spectrum) and 0,
+                                       repeat)
+
+    def realtime(func):
+        def run():
+            processor.add_block(*generator.next_block(block))
+            func()
+            return block
+        return run
+    stages['build_realtime_state'] = measure(realtime(processor.build_realtime_state), repeat)
+    stages['process_realtime_update'] = measure(realtime(processor.process_realtime_update), repeat)
+
+    # ---- Emissão (agendador + serialização, 4 clientes em formatos diferentes) ----
+    state = processor.build_realtime_state()
+    for mode in ('json', 'binary'):
+        stages[f'encode_{mode}'] = measure(lambda: encode_payload(state, mode) and 0, repeat)
+
+    socketio = FakeSocketIO()
+    scheduler = EmissionScheduler(socketio, build_update=processor.build_realtime_state,
+                                  get_version=lambda: processor.version, max_fps=1000)
+    for i, (mode, encoding) in enumerate([('json', 'float32'), ('binary', 'float32'),
+                                          ('binary', 'int16'), ('binary', 'float32')]):
+        sid = f"bench{i}"
+        scheduler.set_rate(sid, 1000)
+        scheduler.set_payload_mode(sid, mode, encoding)
+        if i == 3:
+            scheduler.set_display(sid, points=800)
+
+    def emit_tick():
+        processor.add_block(*generator.next_block(block))
+        for client in scheduler.clients.values():
+            client.next_due = 0.0
+        scheduler.tick()
+        return block
+    stages['emit_tick'] = measure(emit_tick, repeat)
+    stages['emit_tick']['bytes_per_update'] = socketio.bytes / max(1, socketio.emitted)
+
+    return {
+        'sample_rate': sample_rate,
+        'fft_size': fft_size,
+        'buffer_size': buffer_size,
+        'stages': stages
+    }
+
+
+def build_cases(full: bool) -> List[tuple]:
+    if not full:
+        return DEFAULT_CASES
+    return [
+        (rate, fft, fft * factor)
+        for rate in FULL_SAMPLE_RATES
+        for fft in FULL_FFT_SIZES
+        for factor in FULL_BUFFER_FACTORS
+    ]
+
+
+def case_key(case: Dict) -> str:
+    return f"{case['sample_rate']}Hz/fft{case['fft_size']}/buf{case['buffer_size']}"
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Etapas com p50 mais lento que a referência além do limiar (fração)"""
+    regressions = []
+    reference = {case_key(case): case for case in baseline.get('cases', [])}
+    for case in current['cases']:
+        base = reference.get(case_key(case))
+        if base is None:
+            continue
+        for stage, result in case['stages'].items():
+            base_result = base['stages'].get(stage)
+            if not base_result or base_result['p50_ms'] <= 0:
+                continue
+            ratio = result['p50_ms'] / base_result['p50_ms'] - 1.0
+            if ratio > threshold:
+                regressions.append(f"{case_key(case)} {stage}: p50 {base_result['p50_ms']:.3f} → "
+                                   f"{result['p50_ms']:.3f} ms (+{ratio * 100:.0f}%)")
+    return regressions
+
+
+def print_case(case: Dict):
+    print(f"\n=== {case_key(case)} ===")
+    print(f"{'etapa':<26}{'amostras/s':>14}{'p50 ms':>10}{'p99 ms':>10}{'pico KiB':>11}")
+    for stage, result in case['stages'].items():
+        rate = result['samples_per_s']
+        rate_text = f"{rate:,.0f}" if rate else '-'
+        print(f"{stage:<26}{rate_text:>14}{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+              f"{result['peak_kib']:>11.1f}")
+
+
+def peak_rss_kib() -> Optional[float]:
+    """Pico de memória residente do processo (Linux/macOS)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024.0 if sys.platform == 'darwin' else float(peak)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline de vibração")
+    parser.add_argument('--full', action='store_true', help="matriz completa de casos")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="multiplica o número de repetições (0.2 = rápido)")
+    parser.add_argument('-o', '--output', help="salvar resultados em JSON")
+    parser.add_argument('--compare', help="JSON de referência para detectar regressões")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="regressão tolerada no p50 (fração, padrão 0.15)")
+    args = parser.parse_args(argv)
+
+    results = {
+        'format_version': BENCHMARK_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'numpy': np.__version__
+        },
+        'cases': []
+    }
+
+    for sample_rate, fft_size, buffer_size in build_cases(args.full):
+        case = run_case(sample_rate, fft_size, buffer_size, args.scale)
+        results['cases'].append(case)
+        print_case(case)
+    results['peak_rss_kib'] = peak_rss_kib()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados salvos em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões) acima de {args.threshold * 100:.0f}%:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\n✅ Sem regressões acima de {args.threshold * 100:.0f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
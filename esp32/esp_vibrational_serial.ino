@@ -38,6 +38,20 @@ unsigned long last_sample = 0;
 unsigned long sample_count = 0;
 unsigned long start_time = 0;
 
+// Formato de saída (negociado pelo PC com os comandos BINARIO / CSV)
+bool binary_mode = false;
+uint16_t frame_seq = 0;
+
+// Quadro binário (little-endian, 34 bytes) - ver app/protocol.py
+#define FRAME_SYNC 0xA55A
+struct __attribute__((packed)) BinaryFrame {
+    uint16_t sync;
+    uint16_t seq;
+    uint32_t timestamp;
+    float samples[6];
+    uint16_t crc;
+};
+
 // ========== FUNÇÕES AUXILIARES ==========
 
 /**
@@ -144,6 +158,35 @@ bool readAndFilterSensor(Adafruit_MPU6050 &mpu, uint8_t channel,
     return true;
 }
 
+/**
+ * CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)
+ */
+uint16_t crc16(const uint8_t* data, size_t length) {
+    uint16_t crc = 0xFFFF;
+    for (size_t i = 0; i < length; i++) {
+        crc ^= (uint16_t)data[i] << 8;
+        for (int b = 0; b < 8; b++) {
+            crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+        }
+    }
+    return crc;
+}
+
+/**
+ * Envia uma amostra como quadro binário
+ */
+void sendBinaryFrame(unsigned long timestamp, float x1, float y1, float z1,
+                     float x2, float y2, float z2) {
+    BinaryFrame frame;
+    frame.sync = FRAME_SYNC;
+    frame.seq = frame_seq++;
+    frame.timestamp = (uint32_t)timestamp;
+    frame.samples[0] = x1; frame.samples[1] = y1; frame.samples[2] = z1;
+    frame.samples[3] = x2; frame.samples[4] = y2; frame.samples[5] = z2;
+    frame.crc = crc16((const uint8_t*)&frame, sizeof(frame) - sizeof(frame.crc));
+    Serial.write((const uint8_t*)&frame, sizeof(frame));
+}
+
 // ========== SETUP ==========
 
 void setup() {
@@ -218,10 +261,14 @@ void loop() {
             x2 = y2 = z2 = 0;
         }
         
-        // Enviar dados via Serial (formato CSV)
+        // Enviar dados via Serial (binário ou CSV)
         unsigned long timestamp = millis() - start_time;
-        Serial.printf("%lu,%.1f,%.1f,%.1f,%.1f,%.1f,%.1f\n",
-                     timestamp, x1, y1, z1, x2, y2, z2);
+        if (binary_mode) {
+            sendBinaryFrame(timestamp, x1, y1, z1, x2, y2, z2);
+        } else {
+            Serial.printf("%lu,%.1f,%.1f,%.1f,%.1f,%.1f,%.1f\n",
+                         timestamp, x1, y1, z1, x2, y2, z2);
+        }
         
         // Status periódico (a cada 1000 amostras = 5 segundos)
         if (sample_count % 1000 == 0) {
@@ -254,6 +301,15 @@ void loop() {
         else if (command == "VERSION") {
             Serial.println("#VERSION: Sistema Vibracional v2.0 - Marlon Biagi Parangaba");
         }
+        else if (command == "BINARIO") {
+            Serial.println("#FORMATO: BINARIO");
+            frame_seq = 0;
+            binary_mode = true;
+        }
+        else if (command == "CSV") {
+            binary_mode = false;
+            Serial.println("#FORMATO: CSV");
+        }
     }
     
     // Pequena pausa para não sobrecarregar
@@ -13,7 +13,11 @@ const CONFIG = {
     motorFrequency: 20,
     noiseThreshold: 50,
     fftRange: 100,           // Aumentado para 100 Hz
-    mainAxis: 'x'
+    mainAxis: 'x',
+    refreshRate: 10,         // Atualizações por segundo pedidas ao servidor
+    payloadMode: 'binary',   // 'binary' (typed arrays) ou 'json'
+    payloadEncoding: 'float32', // 'float32' ou 'int16' (escalado)
+    zoomSpan: 10             // Largura (Hz) do zoom com duplo clique na FFT
 };
 
 // Estado do sistema
@@ -32,7 +36,11 @@ const STATE = {
     currentNoise: 0,
     collectionTime: 0,
     dataRate: 0,
-    updateCount: 0
+    updateCount: 0,
+    fftInfo: null,           // Forma do espectro recebido (início, passo, pontos)
+    zoom: null,              // Espectro em resolução total (duplo clique)
+    deviceId: 'default',     // Bancada acompanhada por este painel
+    devices: []              // Bancadas registradas no servidor
 };
 
 // Dados dos gráficos
@@ -63,6 +71,15 @@ let charts = {
 // Socket.IO connection
 let socket = null;
 
+// Espectrograma: imagem rolada uma linha (pixel) por espectro novo
+const WATERFALL = {
+    context: null,
+    image: null,
+    info: null,              // Parâmetros do servidor (bins, bin_width, tiles...)
+    lastRow: -1,             // Índice absoluto da linha mais recente desenhada
+    lut: null                // Cores dos níveis 0-255
+};
+
 // Fatores de conversão RPM (dados reais)
 const RPM_FACTORS = {
     10: 28.3,
@@ -86,6 +103,7 @@ function initSystem() {
     
     // Inicializar gráficos
     initCharts();
+    initWaterfall();
     
     // Conectar ao WebSocket
     connectWebSocket();
@@ -327,9 +345,232 @@ function initCharts() {
         }
     });
     
+    // Duplo clique na FFT: zoom em resolução total (novo duplo clique sai)
+    [charts.fft1, charts.fft2].forEach(chart => {
+        chart.canvas.addEventListener('dblclick', (event) => {
+            if (STATE.zoom) {
+                clearZoom();
+                return;
+            }
+            const index = Math.round(chart.scales.x.getValueForPixel(event.offsetX));
+            const label = chart.data.labels[index];
+            if (label !== undefined) {
+                requestZoom(parseFloat(label), CONFIG.zoomSpan);
+            }
+        });
+    });
+    
+    // Largura dos gráficos mudou: pedir nova quantidade de pontos
+    let resizeTimer = null;
+    window.addEventListener('resize', () => {
+        clearTimeout(resizeTimer);
+        resizeTimer = setTimeout(sendDisplaySettings, 300);
+    });
+    
     console.log('📊 Gráficos inicializados com 2048 pontos FFT');
 }
 
+/**
+ * Labels (Hz) a partir da forma do espectro informada pelo servidor
+ */
+function fftLabelsFromInfo(info) {
+    return Array.from({length: info.points}, (_, i) =>
+        (info.start_freq + i * info.step).toFixed(2)
+    );
+}
+
+/**
+ * Substitui os labels dos dois gráficos FFT
+ */
+function setFftLabels(labels) {
+    [charts.fft1, charts.fft2].forEach(chart => {
+        if (chart) {
+            chart.data.labels = labels;
+            chart.update('none');
+        }
+    });
+}
+
+/**
+ * Informa ao servidor a largura do gráfico FFT (pixels) e a faixa exibida,
+ * para que o espectro chegue já recortado e decimado (preservando picos)
+ */
+function sendDisplaySettings() {
+    if (!socket || !charts.fft1) return;
+    socket.emit('set_display', {
+        points: Math.round(charts.fft1.canvas.clientWidth),
+        max_freq: CONFIG.fftRange
+    });
+}
+
+/**
+ * Pede ao servidor os bins em resolução total em torno de uma frequência
+ */
+function requestZoom(center, span) {
+    if (!socket) return;
+    socket.emit('request_zoom', { center: center, span: span, axis: CONFIG.mainAxis });
+}
+
+/**
+ * Volta à visão geral do espectro
+ */
+function clearZoom() {
+    STATE.zoom = null;
+    if (STATE.fftInfo) {
+        setFftLabels(fftLabelsFromInfo(STATE.fftInfo));
+    }
+}
+
+/**
+ * Exibe o espectro em resolução total recebido do servidor
+ */
+function handleZoomSpectrum(data) {
+    if (!data.success) {
+        showNotification(`Zoom indisponível: ${data.error}`);
+        return;
+    }
+    STATE.zoom = data;
+    setFftLabels(fftLabelsFromInfo(data.fft_info));
+    console.log(`🔍 Zoom: ${data.fft_info.start_freq.toFixed(2)} Hz, ${data.fft_info.points} bins de ${data.fft_info.step.toFixed(4)} Hz`);
+}
+
+// ========== ESPECTROGRAMA (WATERFALL) ==========
+
+/**
+ * Prepara o canvas e a tabela de cores (azul → ciano → amarelo → vermelho)
+ */
+function initWaterfall() {
+    const canvas = document.getElementById('waterfallCanvas');
+    if (!canvas) return;
+    WATERFALL.context = canvas.getContext('2d');
+    WATERFALL.image = WATERFALL.context.createImageData(canvas.width, canvas.height);
+    
+    const stops = [[0, 0, 0], [0, 40, 160], [0, 180, 216], [253, 203, 110], [233, 69, 96], [255, 255, 255]];
+    WATERFALL.lut = new Uint8ClampedArray(256 * 3);
+    for (let level = 0; level < 256; level++) {
+        const position = level / 255 * (stops.length - 1);
+        const i = Math.min(Math.floor(position), stops.length - 2);
+        const t = position - i;
+        for (let c = 0; c < 3; c++) {
+            WATERFALL.lut[level * 3 + c] = stops[i][c] + (stops[i + 1][c] - stops[i][c]) * t;
+        }
+    }
+}
+
+/**
+ * Pede ao servidor as linhas novas do espectrograma da bancada atual
+ */
+function subscribeWaterfall() {
+    if (socket && WATERFALL.context) {
+        socket.emit('subscribe_waterfall', { enabled: true });
+    }
+}
+
+/**
+ * Canal exibido: mancal 1 no eixo principal (ordem m1 x/y/z, m2 x/y/z)
+ */
+function waterfallChannel() {
+    return Math.max(0, ['x', 'y', 'z'].indexOf(CONFIG.mainAxis));
+}
+
+/**
+ * Desenha uma linha (níveis 0-255, `step` Hz por ponto) na altura y,
+ * com o máximo dos pontos que caem em cada coluna (picos não somem)
+ */
+function drawWaterfallRow(levels, step, y) {
+    const image = WATERFALL.image;
+    if (y < 0 || y >= image.height) return;
+    const width = image.width;
+    const points = Math.min(levels.length, Math.ceil(CONFIG.fftRange / step));
+    const lut = WATERFALL.lut;
+    let offset = y * width * 4;
+    for (let x = 0; x < width; x++) {
+        const first = Math.floor(x * points / width);
+        const last = Math.max(first + 1, Math.floor((x + 1) * points / width));
+        let level = 0;
+        for (let i = first; i < last; i++) {
+            if (levels[i] > level) level = levels[i];
+        }
+        image.data[offset] = lut[level * 3];
+        image.data[offset + 1] = lut[level * 3 + 1];
+        image.data[offset + 2] = lut[level * 3 + 2];
+        image.data[offset + 3] = 255;
+        offset += 4;
+    }
+}
+
+/**
+ * Recebe só as linhas novas (uint8: linhas × canais × bins) e rola a imagem
+ */
+function handleWaterfallRow(data) {
+    if (!WATERFALL.info || data.device_id !== STATE.deviceId) return;
+    const image = WATERFALL.image;
+    const bytes = new Uint8Array(data.data);
+    const channels = data.channels.length;
+    const channel = waterfallChannel();
+    
+    for (let r = 0; r < data.rows; r++) {
+        const row = data.first_row + r;
+        if (row <= WATERFALL.lastRow) continue;
+        const shift = Math.min(image.height, row - WATERFALL.lastRow);
+        image.data.copyWithin(0, shift * image.width * 4);
+        image.data.fill(0, (image.height - shift) * image.width * 4);
+        drawWaterfallRow(bytes.subarray((r * channels + channel) * data.bins, (r * channels + channel + 1) * data.bins),
+                         WATERFALL.info.bin_width, image.height - 1);
+        WATERFALL.lastRow = row;
+    }
+    WATERFALL.context.putImageData(image, 0, 0);
+    
+    const seconds = image.height * WATERFALL.info.hop_seconds;
+    document.getElementById('waterfallInfo').textContent =
+        `0-${CONFIG.fftRange} Hz, últimos ${Math.round(seconds)} s`;
+}
+
+/**
+ * Preenche a tela com o histórico recente lido em tiles (sem FFT no servidor)
+ */
+async function loadWaterfallHistory(info) {
+    const image = WATERFALL.image;
+    image.data.fill(0);
+    WATERFALL.info = info;
+    WATERFALL.lastRow = info.next_row - 1;
+    if (info.next_row === info.first_row) return;
+    
+    // Tile de frequência único cobrindo a faixa exibida (decimado por máximo)
+    const shownBins = Math.min(info.bins, Math.ceil(CONFIG.fftRange / info.bin_width));
+    const freqLevel = Math.max(0, Math.ceil(Math.log2(shownBins / info.tile_bins)));
+    const firstRow = Math.max(info.first_row, info.next_row - image.height);
+    const channel = `m1.${['x', 'y', 'z'][waterfallChannel()]}`;
+    let failed = 0;
+    let lastError = '';
+    
+    for (let t = Math.floor(firstRow / info.tile_rows); t <= Math.floor((info.next_row - 1) / info.tile_rows); t++) {
+        try {
+            const response = await fetch(deviceUrl(`waterfall/tile?channel=${channel}&tz=0&t=${t}&fz=${freqLevel}&f=0`));
+            if (!response.ok) {
+                const body = await response.json().catch(() => ({}));
+                throw new Error(body.error || `HTTP ${response.status}`);
+            }
+            const tile = JSON.parse(response.headers.get('X-Waterfall-Tile'));
+            const levels = new Uint8Array(await response.arrayBuffer());
+            for (let r = 0; r < tile.rows; r++) {
+                const row = tile.first_row + r;
+                if (row < firstRow || row >= info.next_row) continue;
+                drawWaterfallRow(levels.subarray(r * tile.bins, (r + 1) * tile.bins), tile.freq_step,
+                                 image.height - 1 - (WATERFALL.lastRow - row));
+            }
+        } catch (error) {
+            failed++;
+            lastError = error.message;
+            console.error('❌ Erro ao carregar o espectrograma:', error);
+        }
+    }
+    WATERFALL.context.putImageData(image, 0, 0);
+    if (failed) {
+        showNotification(`Histórico do espectrograma incompleto (${failed} tiles): ${lastError}`);
+    }
+}
+
 // ========== COMUNICAÇÃO WEBSOCKET ==========
 
 /**
@@ -341,6 +582,14 @@ function connectWebSocket() {
     socket.on('connect', () => {
         console.log('🔗 Conectado ao servidor WebSocket');
         updateConnectionStatus(true, 'Conectado ao servidor');
+        
+        // Informar a taxa de atualização e o formato de payload desejados
+        socket.emit('set_refresh_rate', { fps: CONFIG.refreshRate });
+        socket.emit('set_payload_mode', {
+            mode: CONFIG.payloadMode,
+            encoding: CONFIG.payloadEncoding
+        });
+        sendDisplaySettings();
     });
     
     socket.on('disconnect', () => {
@@ -350,10 +599,57 @@ function connectWebSocket() {
     
     socket.on('connected', (data) => {
         console.log('✅ Conectado:', data.message);
+        renderDeviceOptions(data.devices || []);
+        
+        // Reconexão: voltar à bancada que estava selecionada
+        if (STATE.deviceId !== data.device_id) {
+            socket.emit('select_device', { device_id: STATE.deviceId });
+        } else {
+            subscribeWaterfall();
+        }
+    });
+    
+    socket.on('devices_update', (data) => {
+        renderDeviceOptions(data.devices);
+    });
+    
+    socket.on('device_selected', (data) => {
+        if (!data.success) {
+            showNotification(`Bancada indisponível: ${data.error}`);
+            return;
+        }
+        STATE.fftInfo = null;
+        STATE.zoom = null;
+        showNotification(`Acompanhando ${data.name}`);
+        updateSystemStatus();
+        subscribeWaterfall();
     });
     
-    socket.on('data_update', (data) => {
+    socket.on('data_update', (data, ack) => {
         handleDataUpdate(data);
+        
+        // Confirmar recebimento: o servidor só envia a próxima após o ACK
+        if (typeof ack === 'function') ack();
+    });
+    
+    socket.on('zoom_spectrum', (data) => {
+        handleZoomSpectrum(data);
+    });
+    
+    socket.on('waterfall_subscription', (data) => {
+        if (data.success) {
+            loadWaterfallHistory(data);
+        } else {
+            console.log(`🌊 Espectrograma indisponível: ${data.error}`);
+        }
+    });
+    
+    socket.on('waterfall_row', (data) => {
+        handleWaterfallRow(data);
+    });
+    
+    socket.on('refresh_rate', (data) => {
+        console.log(`🔄 Taxa de atualização: ${data.fps.toFixed(1)} Hz`);
     });
     
     socket.on('status_message', (data) => {
@@ -391,6 +687,44 @@ function updateConnectionStatus(connected, message = '') {
     }
 }
 
+// ========== BANCADAS (VÁRIOS ESP32) ==========
+
+/**
+ * URL de uma rota da bancada selecionada (/api/devices/<id>/...)
+ */
+function deviceUrl(path) {
+    return `/api/devices/${encodeURIComponent(STATE.deviceId)}/${path}`;
+}
+
+/**
+ * Atualiza a lista de bancadas no seletor
+ */
+function renderDeviceOptions(devices) {
+    STATE.devices = devices;
+    const select = document.getElementById('deviceSelect');
+    if (!select) return;
+    
+    select.innerHTML = '';
+    devices.forEach(device => {
+        const option = document.createElement('option');
+        option.value = device.device_id;
+        option.textContent = `${device.name}${device.connected ? ' ●' : ''}`;
+        select.appendChild(option);
+    });
+    select.value = STATE.deviceId;
+}
+
+/**
+ * Passa a acompanhar outra bancada (dados, status e comandos)
+ */
+function selectDevice(deviceId) {
+    if (!deviceId || deviceId === STATE.deviceId) return;
+    STATE.deviceId = deviceId;
+    if (socket) {
+        socket.emit('select_device', { device_id: deviceId });
+    }
+}
+
 // ========== COMUNICAÇÃO SERIAL ==========
 
 /**
@@ -439,7 +773,7 @@ async function connectSerial() {
     try {
         showNotification(`Conectando à porta ${port}...`);
         
-        const response = await fetch('/api/connect', {
+        const response = await fetch(deviceUrl('connect'), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ port: port })
@@ -472,7 +806,7 @@ async function connectSerial() {
  */
 async function disconnectSerial() {
     try {
-        const response = await fetch('/api/disconnect');
+        const response = await fetch(deviceUrl('disconnect'));
         const result = await response.json();
         
         if (result.success) {
@@ -505,7 +839,7 @@ async function recalibrateSensors() {
             STATE.calibrating = true;
             showNotification('Recalibrando sensores...');
             
-            const response = await fetch('/api/calibrate');
+            const response = await fetch(deviceUrl('calibrate'));
             const result = await response.json();
             
             if (result.success) {
@@ -528,6 +862,11 @@ async function recalibrateSensors() {
  * Processa atualização de dados recebida do servidor
  */
 function handleDataUpdate(data) {
+    // Payload binário: decodificar anexos para o mesmo formato do JSON
+    if (data && data.binary_header) {
+        decodeBinaryPayload(data);
+    }
+    
     if (!data || !data.fft) return;
     
     STATE.lastUpdate = Date.now();
@@ -550,20 +889,37 @@ function handleDataUpdate(data) {
     STATE.lastDataTime = now;
     
     // Atualizar dados FFT
-    const freqResolution = CONFIG.sampleRate / CONFIG.fftSize;
-    const numPoints = Math.min(1024, Math.floor(CONFIG.fftRange / freqResolution));
-    
-    // Garantir que temos dados suficientes
-    if (data.fft.m1 && data.fft.m1.length >= numPoints) {
-        CHART_DATA.fft1 = data.fft.m1.slice(0, numPoints);
-    }
-    
-    if (data.fft.m2 && data.fft.m2.length >= numPoints) {
-        CHART_DATA.fft2 = data.fft.m2.slice(0, numPoints);
+    if (data.fft_info) {
+        // Espectro já recortado/decimado pelo servidor: labels vêm do cabeçalho
+        const info = data.fft_info;
+        const previous = STATE.fftInfo;
+        if (!previous || previous.points !== info.points || previous.step !== info.step ||
+            previous.start_freq !== info.start_freq) {
+            STATE.fftInfo = info;
+            if (!STATE.zoom) setFftLabels(fftLabelsFromInfo(info));
+        }
+        CHART_DATA.fft1 = data.fft.m1 || CHART_DATA.fft1;
+        CHART_DATA.fft2 = data.fft.m2 || CHART_DATA.fft2;
+    } else {
+        const freqResolution = CONFIG.sampleRate / CONFIG.fftSize;
+        const numPoints = Math.min(1024, Math.floor(CONFIG.fftRange / freqResolution));
+        
+        // Garantir que temos dados suficientes
+        if (data.fft.m1 && data.fft.m1.length >= numPoints) {
+            CHART_DATA.fft1 = data.fft.m1.slice(0, numPoints);
+        }
+        
+        if (data.fft.m2 && data.fft.m2.length >= numPoints) {
+            CHART_DATA.fft2 = data.fft.m2.slice(0, numPoints);
+        }
     }
     
     // Atualizar dados temporais
-    if (data.time_data && data.time_data.length > 0) {
+    if (data.time_signals) {
+        const axis = CONFIG.mainAxis;
+        CHART_DATA.time1 = data.time_signals[`m1.${axis}`] || CHART_DATA.time1;
+        CHART_DATA.time2 = data.time_signals[`m2.${axis}`] || CHART_DATA.time2;
+    } else if (data.time_data && data.time_data.length > 0) {
         const axis = CONFIG.mainAxis;
         CHART_DATA.time1 = data.time_data.map(d => d.m1[axis] || 0);
         CHART_DATA.time2 = data.time_data.map(d => d.m2[axis] || 0);
@@ -618,6 +974,43 @@ function handleDataUpdate(data) {
     }
 }
 
+/**
+ * Converte um anexo binário (ArrayBuffer little-endian) em Float32Array
+ */
+function decodeTypedArray(buffer, dtype, scale) {
+    if (dtype === 'int16') {
+        const raw = new Int16Array(buffer);
+        const values = new Float32Array(raw.length);
+        for (let i = 0; i < raw.length; i++) {
+            values[i] = raw[i] * scale;
+        }
+        return values;
+    }
+    return new Float32Array(buffer);
+}
+
+/**
+ * Decodifica espectros e formas de onda enviados como anexos binários
+ */
+function decodeBinaryPayload(data) {
+    const header = data.binary_header;
+    
+    // Espectros: (sensores, bins)
+    const fft = decodeTypedArray(data.fft_binary, header.dtype, header.fft_scale);
+    data.fft = {};
+    header.fft_channels.forEach((sensor, i) => {
+        data.fft[sensor] = Array.from(fft.subarray(i * header.bins, (i + 1) * header.bins));
+    });
+    
+    // Formas de onda: (6 canais, amostras)
+    const time = decodeTypedArray(data.time_binary, header.dtype, header.time_scale);
+    const n = header.time_samples;
+    data.time_signals = {};
+    header.time_channels.forEach((channel, i) => {
+        data.time_signals[channel] = Array.from(time.subarray(i * n, (i + 1) * n));
+    });
+}
+
 /**
  * Atualiza configurações do sistema
  */
@@ -680,7 +1073,7 @@ function applySettings() {
     if (socket) {
         socket.emit('set_motor_freq', { frequency: motorFreq });
         
-        fetch('/api/config', {
+        fetch(deviceUrl('config'), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -702,6 +1095,11 @@ function applySettings() {
     document.getElementById('noiseThresholdValue').textContent = noiseThresh;
     document.getElementById('noiseLimit').textContent = noiseThresh;
     
+    // Servidor passa a recortar o espectro na nova faixa
+    STATE.fftInfo = null;
+    STATE.zoom = null;
+    sendDisplaySettings();
+    
     // Atualizar gráficos FFT com nova faixa
     const freqResolution = CONFIG.sampleRate / CONFIG.fftSize;
     const numPoints = Math.min(1024, Math.floor(CONFIG.fftRange / freqResolution));
@@ -726,13 +1124,18 @@ function applySettings() {
  * Atualiza a interface periodicamente
  */
 function updateInterface() {
+    // Pontos exibidos: zoom, forma informada pelo servidor ou faixa local
+    const freqResolution = CONFIG.sampleRate / CONFIG.fftSize;
+    const info = STATE.zoom ? STATE.zoom.fft_info : STATE.fftInfo;
+    const numPoints = info ? info.points :
+        Math.min(1024, Math.floor(CONFIG.fftRange / freqResolution));
+    const fft1 = STATE.zoom ? STATE.zoom.fft.m1 : CHART_DATA.fft1;
+    const fft2 = STATE.zoom ? STATE.zoom.fft.m2 : CHART_DATA.fft2;
+    
     // Atualizar gráficos FFT
     if (charts.fft1 && charts.fft1.data && charts.fft1.data.datasets[0]) {
-        const freqResolution = CONFIG.sampleRate / CONFIG.fftSize;
-        const numPoints = Math.min(1024, Math.floor(CONFIG.fftRange / freqResolution));
-        
         // Garantir que temos dados suficientes
-        const dataToShow = CHART_DATA.fft1.slice(0, numPoints);
+        const dataToShow = fft1.slice(0, numPoints);
         if (dataToShow.length === numPoints) {
             charts.fft1.data.datasets[0].data = dataToShow;
             charts.fft1.update('none');
@@ -740,10 +1143,7 @@ function updateInterface() {
     }
     
     if (charts.fft2 && charts.fft2.data && charts.fft2.data.datasets[0]) {
-        const freqResolution = CONFIG.sampleRate / CONFIG.fftSize;
-        const numPoints = Math.min(1024, Math.floor(CONFIG.fftRange / freqResolution));
-        
-        const dataToShow = CHART_DATA.fft2.slice(0, numPoints);
+        const dataToShow = fft2.slice(0, numPoints);
         if (dataToShow.length === numPoints) {
             charts.fft2.data.datasets[0].data = dataToShow;
             charts.fft2.update('none');
@@ -904,7 +1304,7 @@ function updateHarmonicsDisplay() {
  */
 async function updateSystemStatus() {
     try {
-        const response = await fetch('/api/status');
+        const response = await fetch(deviceUrl('status'));
         const status = await response.json();
         
         // Atualizar algumas informações
@@ -952,7 +1352,7 @@ function startTest() {
     STATE.testInterval = setInterval(updateTestTimer, 100);
     
     // Enviar comando para servidor
-    fetch('/api/start_test', {
+    fetch(deviceUrl('start_test'), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' }
     });
@@ -1010,7 +1410,7 @@ function stopTest() {
     }
     
     // Enviar comando para servidor
-    fetch('/api/stop_test', {
+    fetch(deviceUrl('stop_test'), {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' }
     });
@@ -1079,7 +1479,7 @@ async function exportTest() {
     try {
         showNotification('Exportando dados...');
         
-        const response = await fetch('/api/export_test', {
+        const response = await fetch(deviceUrl('export_test'), {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ testData: STATE.testData })
@@ -1175,7 +1575,7 @@ async function exportAllData() {
         showNotification('Exportando todos os dados...');
         
         // Obter dados do servidor
-        const response = await fetch('/api/status');
+        const response = await fetch(deviceUrl('status'));
         const status = await response.json();
         
         // Criar CSV
@@ -1213,7 +1613,7 @@ async function exportAllData() {
 async function clearStorage() {
     if (confirm('Tem certeza que deseja limpar todos os dados armazenados?')) {
         try {
-            const response = await fetch('/api/clear_data');
+            const response = await fetch(deviceUrl('clear_data'));
             const result = await response.json();
             
             if (result.success) {